@@ -0,0 +1,104 @@
+# ============================================================================
+# 📡 API LOCAL /api/integration/cdr/all (SUSTITUTO PARA BENCHMARKS)
+# ============================================================================
+# Sirve páginas sintéticas con la misma forma que la API real
+# ({'data', 'total', 'totalPages'}). Cada página se genera a partir de su
+# número, así que dos ejecuciones con los mismos parámetros ven exactamente
+# los mismos registros sin guardar nada en memoria. Las páginas van de la
+# llamada más nueva a la más vieja y cubren los últimos DIAS_VENTANA días
+# (dentro de la ventana de 30 días de la primera carga de los scripts).
+
+import json
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+RUTA_API = "/api/integration/cdr/all"
+TAMANO_PAGINA = 1000
+LATENCIA_MS = 50
+DIAS_VENTANA = 29
+
+# Valores que se repiten de forma cíclica (incluye algo de lo que filtra cdr_merge)
+CONTEXTOS = ['from-internal', 'from-trunk', 'ext-queues', 'from-internal', 'HangupCall']
+APLICACIONES = ['Dial', 'Dial', 'Queue', 'Playback', 'Congestion']
+DISPOSICIONES = ['ANSWERED', 'ANSWERED', 'NO ANSWER', 'BUSY', 'FAILED']
+CANALES = ['SIP/Nebula_World-0000', 'SIP/3001-0000', 'PJSIP/3002-0000', 'SIP/3003-0000']
+CANALES_DESTINO = ['SIP/Nebula_Loqui-0000', 'SIP/3004-0000', '', 'PJSIP/3005-0000']
+
+def registro(i, fin, paso):
+    """Registro i (0 = el más nuevo) de la API sintética"""
+    fecha = fin - timedelta(seconds=i * paso)
+    extension = 3000 + i % 200
+    destino = f"09{(i * 7919) % 100000000:08d}"
+    return {
+        'calldate': fecha.strftime('%Y-%m-%d %H:%M:%S'),
+        'clid': f'"Agente {extension}" <{extension}>',
+        'src': str(extension),
+        'dst': destino,
+        'dcontext': CONTEXTOS[i % len(CONTEXTOS)],
+        'channel': f"{CANALES[i % len(CANALES)]}{i % 65536:04x}",
+        'dstchannel': f"{CANALES_DESTINO[i % len(CANALES_DESTINO)]}{(i + 1) % 65536:04x}",
+        'lastapp': APLICACIONES[i % len(APLICACIONES)],
+        'lastdata': f"SIP/troncal/{destino},60",
+        'duration': (i * 37) % 900,
+        'billsec': (i * 37) % 900 // 2,
+        'disposition': DISPOSICIONES[i % len(DISPOSICIONES)],
+        'amaflags': 3,
+        'accountcode': '',
+        'uniqueid': f"{1700000000 + i // 10}.{i}",
+        'userfield': '',
+        'recordingfile': f"out-{destino}-{extension}-{i}.wav" if i % 3 == 0 else '',
+    }
+
+class ManejadorApi(BaseHTTPRequestHandler):
+    """GET RUTA_API?page=N; acepta cualquier autenticación"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != RUTA_API:
+            self.send_error(404)
+            return
+        servidor = self.server
+        try:
+            pagina = int(parse_qs(url.query).get('page', ['1'])[0])
+        except ValueError:
+            pagina = 1
+
+        if servidor.latencia:
+            time.sleep(servidor.latencia)
+
+        inicio = (pagina - 1) * servidor.tamano_pagina
+        fin = min(inicio + servidor.tamano_pagina, servidor.total)
+        cuerpo = json.dumps({
+            'data': [registro(i, servidor.fin, servidor.paso) for i in range(max(inicio, 0), fin)],
+            'total': servidor.total,
+            'totalPages': servidor.total_paginas,
+        }).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+def crear_servidor(total, tamano_pagina=TAMANO_PAGINA, latencia_ms=LATENCIA_MS, fin=None, puerto=0):
+    """Servidor HTTP con total registros en páginas de tamano_pagina"""
+    servidor = ThreadingHTTPServer(('127.0.0.1', puerto), ManejadorApi)
+    servidor.daemon_threads = True
+    servidor.total = total
+    servidor.tamano_pagina = tamano_pagina
+    servidor.total_paginas = max(-(-total // tamano_pagina), 1)
+    servidor.latencia = latencia_ms / 1000
+    servidor.fin = (fin or datetime.now()).replace(microsecond=0)
+    servidor.paso = DIAS_VENTANA * 86400 / max(total, 1)
+    return servidor
+
+def servir(total, tamano_pagina, latencia_ms, fin, listo):
+    """Punto de entrada del proceso del servidor: publica el puerto en listo (una Queue)"""
+    servidor = crear_servidor(total, tamano_pagina, latencia_ms, fin)
+    listo.put(servidor.server_port)
+    servidor.serve_forever()
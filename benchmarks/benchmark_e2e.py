@@ -0,0 +1,224 @@
+# ============================================================================
+# SCRIPT: BENCHMARK DE PUNTA A PUNTA CON API, ORACLE Y OBJECT STORAGE LOCALES
+# ============================================================================
+# Uso: python benchmarks/benchmark_e2e.py [filas,filas,...]
+#      (por defecto 100000,1000000,10000000)
+#
+# Para cada tamaño levanta una API local con ese número de registros, una
+# base SQLite con la forma de Oracle y un Object Storage en disco, y corre
+# los cuatro scripts reales en orden: cdr_merge, cdr_to_parquet,
+# merge_oikost_crudo y parquet_oikost_crudo. Cada etapa corre en su propio
+# proceso y reporta tiempo de pared, filas por segundo y memoria pico, con
+# el desglose por etapa interna que mide metricas.py.
+#
+# Los sustitutos corren en la misma máquina (la API y el Object Storage en
+# procesos aparte, SQLite dentro del proceso de la etapa), así que los
+# números sirven para comparar cambios entre sí, no como tiempos de
+# producción. La API local genera unos 40-50 mil registros por segundo en un
+# solo proceso: con muchos workers ese es el techo de la descarga.
+#
+# Variables de entorno:
+#   BENCH_FILAS           tamaños separados por coma (si no se pasan por argumento)
+#   BENCH_ETAPAS          etapas a correr (por defecto las cuatro)
+#   BENCH_TAMANO_PAGINA   registros por página de la API local (1000)
+#   BENCH_LATENCIA_MS     latencia agregada a cada página (50)
+#   BENCH_MAX_RPS         límite de peticiones/s de los scripts (0 = sin límite)
+#   BENCH_DIRECTORIO      dónde quedan bases, objetos, logs y resultados.json
+
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+DIRECTORIO_BENCH = os.path.dirname(os.path.abspath(__file__))
+DIRECTORIO_SCRIPTS = os.path.join(os.path.dirname(DIRECTORIO_BENCH), 'scripts')
+sys.path[:0] = [DIRECTORIO_BENCH, DIRECTORIO_SCRIPTS]
+
+import api_local
+import objetos_local
+
+FILAS_DEFECTO = (100000, 1000000, 10000000)
+
+# Etapa -> tabla Oracle que lee o escribe
+ETAPAS = {
+    'cdr_merge': 'CDR_LLAMADAS',
+    'cdr_to_parquet': 'CDR_LLAMADAS',
+    'merge_oikost_crudo': 'CDR_OIKOST_CRUDO',
+    'parquet_oikost_crudo': 'CDR_OIKOST_CRUDO',
+}
+
+# ============================================================================
+# 🧪 UNA ETAPA (PROCESO HIJO)
+# ============================================================================
+
+def ejecutar_etapa(etapa, ruta_db, api_url, oci_url, ruta_clave, ruta_resultado):
+    """Corre el main() del script con los sustitutos instalados y guarda sus métricas"""
+    import oracle_local
+
+    base = oracle_local.BaseLocal(ruta_db)
+    oracle_local.instalar(base)
+
+    inicio = time.perf_counter()
+    modulo = __import__(etapa)
+    importacion = time.perf_counter() - inicio
+
+    modulo.inicializar()
+    if hasattr(modulo, 'API_URL'):
+        modulo.API_URL = api_url
+    if hasattr(modulo, 'OBJECT_STORAGE_CLIENT'):
+        modulo.OBJECT_STORAGE_CLIENT = objetos_local.crear_cliente(oci_url, ruta_clave)
+
+    error = None
+    inicio = time.perf_counter()
+    try:
+        modulo.main()
+    except SystemExit as e:
+        error = f"sys.exit({e.code})" if e.code else None
+    except Exception as e:
+        error = repr(e)
+    finally:
+        modulo.cerrar_pool()
+    tiempo = time.perf_counter() - inicio
+
+    import metricas
+    import pyarrow as pa
+
+    resultado = {
+        'etapa': etapa,
+        'filas': base.contar(ETAPAS[etapa]),
+        'importacion': importacion,
+        'tiempo': tiempo,
+        'rss_pico_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'arrow_pico_mb': pa.default_memory_pool().max_memory() / (1024 * 1024),
+        'error': error,
+        'etapas': metricas.etapas(),
+    }
+    base.cerrar()
+    with open(ruta_resultado, 'w') as archivo:
+        json.dump(resultado, archivo)
+
+# ============================================================================
+# 🎛️ ORQUESTACIÓN (PROCESO PRINCIPAL)
+# ============================================================================
+
+def _arrancar(objetivo, *args):
+    """Arranca un servidor en otro proceso y devuelve (proceso, puerto)"""
+    contexto = multiprocessing.get_context('spawn')
+    listo = contexto.Queue()
+    proceso = contexto.Process(target=objetivo, args=(*args, listo), daemon=True)
+    proceso.start()
+    return proceso, listo.get(timeout=30)
+
+def correr_tamano(filas, etapas, directorio, tamano_pagina, latencia_ms, max_rps):
+    """Corre las etapas contra una API de filas registros; devuelve sus métricas"""
+    carpeta = os.path.join(directorio, f"filas_{filas}")
+    os.makedirs(carpeta, exist_ok=True)
+    ruta_db = os.path.join(carpeta, 'oracle.db')
+    for sufijo in ('', '-wal', '-shm'):
+        if os.path.exists(ruta_db + sufijo):
+            os.remove(ruta_db + sufijo)
+
+    ruta_clave = os.path.join(carpeta, 'clave.pem')
+    clave = objetos_local.generar_clave()
+    with open(ruta_clave, 'w') as archivo:
+        archivo.write(clave)
+
+    api, puerto_api = _arrancar(api_local.servir, filas, tamano_pagina, latencia_ms, datetime.now())
+    objetos, puerto_oci = _arrancar(objetos_local.servir, os.path.join(carpeta, 'objetos'))
+    api_url = f"http://127.0.0.1:{puerto_api}{api_local.RUTA_API}"
+    oci_url = f"http://127.0.0.1:{puerto_oci}"
+
+    # Credenciales ficticias: los scripts solo verifican que existan
+    entorno = dict(
+        os.environ,
+        ORACLE_USER='benchmark', ORACLE_PASSWORD='benchmark', ORACLE_DSN='local',
+        API_PASSWORD='benchmark', OIKOST_TOKEN='Basic benchmark',
+        OCI_USER_OCID=objetos_local.CONFIG_LOCAL['user'],
+        OCI_TENANCY_OCID=objetos_local.CONFIG_LOCAL['tenancy'],
+        OCI_KEY_FINGERPRINT=objetos_local.CONFIG_LOCAL['fingerprint'],
+        OCI_PRIVATE_KEY=clave,
+        API_MAX_RPS=str(max_rps), OIKOST_MAX_RPS=str(max_rps),
+        METRICAS_DIR=os.path.join(carpeta, 'metricas'),
+        PYTHONUNBUFFERED='1',
+    )
+
+    resultados = []
+    try:
+        for etapa in etapas:
+            ruta_log = os.path.join(carpeta, f"{etapa}.log")
+            ruta_resultado = os.path.join(carpeta, f"{etapa}.json")
+            print(f"   ▶️ {etapa} ({filas:,} registros en la API)... ", end='', flush=True)
+            inicio = time.perf_counter()
+            with open(ruta_log, 'w') as log:
+                subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--etapa', etapa,
+                     ruta_db, api_url, oci_url, ruta_clave, ruta_resultado],
+                    stdout=log, stderr=subprocess.STDOUT, env=entorno, cwd=carpeta
+                )
+            if os.path.exists(ruta_resultado):
+                with open(ruta_resultado) as archivo:
+                    resultado = json.load(archivo)
+            else:
+                resultado = {'etapa': etapa, 'filas': 0, 'importacion': 0.0, 'tiempo': 0.0,
+                             'rss_pico_mb': 0.0, 'arrow_pico_mb': 0.0, 'error': 'sin resultado'}
+            resultado['pared'] = time.perf_counter() - inicio
+            resultado['filas_api'] = filas
+            resultado['log'] = ruta_log
+            resultados.append(resultado)
+            print(f"{resultado['tiempo']:.2f}s" + (f" ❌ {resultado['error']}" if resultado['error'] else ''))
+    finally:
+        api.terminate()
+        objetos.terminate()
+    return resultados
+
+def imprimir_resultados(resultados):
+    print(f"\n{'filas API':>11}  {'etapa':<22}{'filas':>11}{'tiempo':>10}{'filas/s':>11}"
+          f"{'import':>8}{'RSS pico':>11}{'Arrow pico':>12}")
+    for r in resultados:
+        por_segundo = r['filas'] / r['tiempo'] if r['tiempo'] else 0
+        print(f"{r['filas_api']:>11,}  {r['etapa']:<22}{r['filas']:>11,}{r['tiempo']:>9.2f}s"
+              f"{por_segundo:>11,.0f}{r['importacion']:>7.2f}s{r['rss_pico_mb']:>9.0f}MB"
+              f"{r['arrow_pico_mb']:>10.0f}MB" + ('  ❌' if r['error'] else ''))
+        for e in r.get('etapas', []):
+            filas = f"{e['filas']:>11,}" if e['filas'] is not None else f"{'-':>11}"
+            print(f"{'':>13}  · {e['etapa']:<20}{filas}{e['pared_s']:>9.2f}s"
+                  f"   cpu {e['cpu_s']:.2f}s" + (f"   {e['bytes'] / (1024 * 1024):.1f} MB" if e['bytes'] else ''))
+
+def main(tamanos):
+    etapas = [e.strip() for e in os.environ.get('BENCH_ETAPAS', ','.join(ETAPAS)).split(',') if e.strip()]
+    desconocidas = [e for e in etapas if e not in ETAPAS]
+    if desconocidas:
+        print(f"❌ Etapas desconocidas: {desconocidas} (opciones: {', '.join(ETAPAS)})")
+        sys.exit(1)
+    directorio = os.environ.get('BENCH_DIRECTORIO') or tempfile.mkdtemp(prefix='benchmark_cdr_')
+    tamano_pagina = int(os.environ.get('BENCH_TAMANO_PAGINA', str(api_local.TAMANO_PAGINA)))
+    latencia_ms = float(os.environ.get('BENCH_LATENCIA_MS', str(api_local.LATENCIA_MS)))
+    max_rps = float(os.environ.get('BENCH_MAX_RPS', '0'))
+
+    print(f"📂 Directorio: {directorio}")
+    print(f"⚙️ Página: {tamano_pagina} registros | Latencia: {latencia_ms:.0f} ms | "
+          f"Límite: {max_rps or 'sin límite'} peticiones/s\n")
+
+    resultados = []
+    for filas in tamanos:
+        print(f"📊 {filas:,} registros")
+        resultados += correr_tamano(filas, etapas, directorio, tamano_pagina, latencia_ms, max_rps)
+
+    imprimir_resultados(resultados)
+    ruta = os.path.join(directorio, 'resultados.json')
+    with open(ruta, 'w') as archivo:
+        json.dump(resultados, archivo, indent=2)
+    print(f"\n💾 Resultados: {ruta}")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 8 and sys.argv[1] == '--etapa':
+        ejecutar_etapa(*sys.argv[2:])
+    else:
+        texto = sys.argv[1] if len(sys.argv) > 1 else os.environ.get('BENCH_FILAS', '')
+        tamanos = [int(t.replace('_', '')) for t in texto.split(',') if t.strip()] or list(FILAS_DEFECTO)
+        main(tamanos)
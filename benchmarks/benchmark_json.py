@@ -0,0 +1,123 @@
+# ============================================================================
+# SCRIPT: BENCHMARK DE DECODIFICACIÓN DE PÁGINAS DE LA API
+# ============================================================================
+# Uso: python benchmarks/benchmark_json.py [registros_por_pagina,...]
+#      (por defecto 1000,5000)
+#
+# Compara, para una página sintética de la API local, el camino anterior
+# (response.json() + pd.DataFrame de la lista de dicts) con el de
+# descarga_api (orjson + columnas + pd.DataFrame de las columnas), y la
+# variante intermedia con json de la librería estándar y columnas para
+# separar cuánto aporta cada parte. Verifica que los tres DataFrames sean
+# iguales. También muestra el tamaño de la página sin comprimir, con gzip y
+# con br, y lo que cuesta descomprimirla.
+#
+# Variables de entorno:
+#   BENCH_REPETICIONES   veces que se decodifica cada página (50)
+
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+DIRECTORIO_BENCH = os.path.dirname(os.path.abspath(__file__))
+DIRECTORIO_SCRIPTS = os.path.join(os.path.dirname(DIRECTORIO_BENCH), 'scripts')
+sys.path[:0] = [DIRECTORIO_BENCH, DIRECTORIO_SCRIPTS]
+
+import pandas as pd
+import requests
+
+import api_local
+import descarga_api
+
+try:
+    import brotli
+except ImportError:  # sin brotli: solo gzip
+    brotli = None
+
+TAMANOS_DEFECTO = (1000, 5000)
+
+def pagina_sintetica(registros):
+    """Cuerpo JSON (bytes) de una página con la forma de la API"""
+    fin = datetime.now()
+    return json.dumps({
+        'data': [api_local.registro(i, fin, 2.5) for i in range(registros)],
+        'total': registros * 100,
+        'totalPages': 100,
+    }).encode()
+
+def respuesta(cuerpo):
+    """Response de requests con el cuerpo ya leído (lo que ve pedir_pagina)"""
+    response = requests.Response()
+    response.status_code = 200
+    response._content = cuerpo
+    return response
+
+# ============================================================================
+# 🛤️ CAMINOS A COMPARAR
+# ============================================================================
+
+def camino_anterior(cuerpo):
+    return pd.DataFrame(respuesta(cuerpo).json().get('data', []))
+
+def camino_json_columnas(cuerpo):
+    return pd.DataFrame(descarga_api.a_columnas(json.loads(cuerpo).get('data') or []))
+
+def camino_nuevo(cuerpo):
+    datos = descarga_api.decodificar(respuesta(cuerpo).content)
+    return pd.DataFrame(descarga_api.a_columnas(datos.get('data') or []))
+
+CAMINOS = [
+    ('response.json() + registros', camino_anterior),
+    ('json + columnas', camino_json_columnas),
+    ('orjson + columnas' if descarga_api.orjson else 'json + columnas (sin orjson)', camino_nuevo),
+]
+
+def medir(funcion, argumento, repeticiones):
+    """Milisegundos por llamada (la mejor de tres tandas)"""
+    mejores = []
+    for _ in range(3):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            funcion(argumento)
+        mejores.append((time.perf_counter() - inicio) / repeticiones * 1000)
+    return min(mejores)
+
+# ============================================================================
+# 🎯 PRINCIPAL
+# ============================================================================
+
+def main(tamanos):
+    repeticiones = int(os.environ.get('BENCH_REPETICIONES', '50'))
+    print(f"⚙️ orjson: {'sí' if descarga_api.orjson else 'no'} | brotli: {'sí' if brotli else 'no'} | "
+          f"Accept-Encoding: {descarga_api.ACCEPT_ENCODING} | {repeticiones} repeticiones")
+
+    for registros in tamanos:
+        cuerpo = pagina_sintetica(registros)
+        print(f"\n📄 Página de {registros:,} registros ({len(cuerpo) / 1024:,.0f} KB)")
+
+        referencia = camino_anterior(cuerpo)
+        for nombre, funcion in CAMINOS[1:]:
+            pd.testing.assert_frame_equal(funcion(cuerpo), referencia)
+
+        base = None
+        for nombre, funcion in CAMINOS:
+            ms = medir(funcion, cuerpo, repeticiones)
+            base = base or ms
+            print(f"   {nombre:<30}{ms:>8.2f} ms{registros / ms * 1000:>12,.0f} registros/s"
+                  f"{base / ms:>8.2f}x")
+
+        comprimidos = [('gzip', gzip.compress(cuerpo), gzip.decompress)]
+        if brotli:
+            comprimidos.append(('br', brotli.compress(cuerpo, quality=5), brotli.decompress))
+        for nombre, datos, descomprimir in comprimidos:
+            ms = medir(descomprimir, datos, repeticiones)
+            print(f"   {nombre:<30}{len(datos) / 1024:>8,.0f} KB ({len(datos) / len(cuerpo):.0%})"
+                  f"   descomprimir {ms:.2f} ms")
+
+if __name__ == "__main__":
+    texto = sys.argv[1] if len(sys.argv) > 1 else ''
+    tamanos = [int(t.replace('_', '')) for t in texto.split(',') if t.strip()] or list(TAMANOS_DEFECTO)
+    main(tamanos)
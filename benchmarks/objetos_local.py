@@ -0,0 +1,275 @@
+# ============================================================================
+# ☁️ OBJECT STORAGE LOCAL SOBRE EL DISCO (SUSTITUTO PARA BENCHMARKS)
+# ============================================================================
+# Servidor HTTP con las rutas de OCI Object Storage que usa subida_oci.py y
+# el dataset particionado (put/get/head, multiparte, versiones y borrado por
+# versión). Los objetos se guardan en un directorio, una carpeta por objeto
+# y un archivo por versión, así que los scripts se prueban con el
+# ObjectStorageClient real (firma, reintentos, UploadManager) sin red.
+
+import base64
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+VERSIONES_POR_PAGINA = 1000
+TAMANO_BLOQUE = 1024 * 1024
+
+def _carpeta_objeto(raiz, bucket, nombre):
+    return os.path.join(raiz, quote(bucket, safe=''), quote(nombre, safe=''))
+
+def _fecha_oci(segundos):
+    return datetime.fromtimestamp(segundos, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+class ManejadorObjetos(BaseHTTPRequestHandler):
+    """Rutas /n/{namespace}/b/{bucket}/o|u|objectversions de Object Storage"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    # --- Utilidades ---
+
+    def _ruta(self):
+        url = urlparse(self.path)
+        partes = url.path.split('/', 6)  # ['', 'n', ns, 'b', bucket, tipo, nombre]
+        tipo = partes[5] if len(partes) > 5 else ''
+        nombre = unquote(partes[6]) if len(partes) > 6 else ''
+        return unquote(partes[4]), tipo, nombre, parse_qs(url.query)
+
+    def _responder(self, codigo, cuerpo=b'', cabeceras=None):
+        if isinstance(cuerpo, dict):
+            cuerpo = json.dumps(cuerpo).encode()
+        self.send_response(codigo)
+        for clave, valor in (cabeceras or {}).items():
+            self.send_header(clave, valor)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(cuerpo)
+
+    def _no_existe(self):
+        self._responder(404, {'code': 'ObjectNotFound', 'message': 'No existe'})
+
+    def _guardar_cuerpo(self, destino):
+        """Copia el cuerpo de la petición a destino por bloques; devuelve el MD5 en base64"""
+        md5 = hashlib.md5()
+        with open(destino, 'wb') as archivo:
+            if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+                while True:
+                    tamano = int(self.rfile.readline().strip(), 16)
+                    if tamano == 0:
+                        self.rfile.readline()
+                        break
+                    trozo = self.rfile.read(tamano)
+                    self.rfile.readline()
+                    md5.update(trozo)
+                    archivo.write(trozo)
+            else:
+                pendiente = int(self.headers.get('Content-Length') or 0)
+                while pendiente:
+                    trozo = self.rfile.read(min(pendiente, TAMANO_BLOQUE))
+                    if not trozo:
+                        break
+                    pendiente -= len(trozo)
+                    md5.update(trozo)
+                    archivo.write(trozo)
+        return base64.b64encode(md5.digest()).decode()
+
+    def _versiones(self, carpeta):
+        """Versiones de un objeto, de la más nueva a la más vieja"""
+        if not os.path.isdir(carpeta):
+            return []
+        ids = [n[:-4] for n in os.listdir(carpeta) if n.endswith('.bin')]
+        return sorted(ids, reverse=True)
+
+    def _publicar(self, carpeta, origen, metadata):
+        """Deja origen como la versión más nueva del objeto"""
+        os.makedirs(carpeta, exist_ok=True)
+        version = f"{time.time_ns():020d}"
+        os.replace(origen, os.path.join(carpeta, f"{version}.bin"))
+        with open(os.path.join(carpeta, f"{version}.json"), 'w') as archivo:
+            json.dump(metadata, archivo)
+        return version
+
+    def _metadata_cabeceras(self):
+        return {k.lower()[len('opc-meta-'):]: v for k, v in self.headers.items()
+                if k.lower().startswith('opc-meta-')}
+
+    # --- Métodos HTTP ---
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        bucket, tipo, nombre, consulta = self._ruta()
+        raiz = self.server.raiz
+
+        if tipo == 'objectversions':
+            prefijo = consulta.get('prefix', [''])[0]
+            carpeta_bucket = os.path.join(raiz, quote(bucket, safe=''))
+            items = []
+            for carpeta in sorted(os.listdir(carpeta_bucket)) if os.path.isdir(carpeta_bucket) else []:
+                nombre_objeto = unquote(carpeta)
+                if not nombre_objeto.startswith(prefijo):
+                    continue
+                for version in self._versiones(os.path.join(carpeta_bucket, carpeta)):
+                    ruta = os.path.join(carpeta_bucket, carpeta, f"{version}.bin")
+                    items.append({
+                        'name': nombre_objeto,
+                        'versionId': version,
+                        'size': os.path.getsize(ruta),
+                        'timeCreated': _fecha_oci(int(version) / 1e9),
+                        'isDeleteMarker': False,
+                    })
+            inicio = int(consulta.get('page', ['0'])[0])
+            cabeceras = {}
+            if inicio + VERSIONES_POR_PAGINA < len(items):
+                cabeceras['opc-next-page'] = str(inicio + VERSIONES_POR_PAGINA)
+            self._responder(200, {'items': items[inicio:inicio + VERSIONES_POR_PAGINA]}, cabeceras)
+            return
+
+        carpeta = _carpeta_objeto(raiz, bucket, nombre)
+        versiones = self._versiones(carpeta)
+        if tipo != 'o' or not versiones:
+            self._no_existe()
+            return
+        ruta = os.path.join(carpeta, f"{versiones[0]}.bin")
+        with open(os.path.join(carpeta, f"{versiones[0]}.json")) as archivo:
+            metadata = json.load(archivo)
+        cabeceras = {f"opc-meta-{k}": v for k, v in metadata.items()}
+        cabeceras['version-id'] = versiones[0]
+        cabeceras['etag'] = versiones[0]
+        if self.command == 'HEAD':
+            cabeceras['Content-Length'] = str(os.path.getsize(ruta))
+            self.send_response(200)
+            for clave, valor in cabeceras.items():
+                self.send_header(clave, valor)
+            self.end_headers()
+            return
+        with open(ruta, 'rb') as archivo:
+            self._responder(200, archivo.read(), cabeceras)
+
+    def do_PUT(self):
+        bucket, tipo, nombre, consulta = self._ruta()
+        raiz = self.server.raiz
+        temporal = tempfile.NamedTemporaryFile(dir=self.server.temporales, delete=False).name
+
+        if tipo == 'u':
+            # Parte de una subida multiparte
+            id_subida = consulta['uploadId'][0]
+            numero = int(consulta['uploadPartNum'][0])
+            md5 = self._guardar_cuerpo(temporal)
+            os.replace(temporal, os.path.join(self.server.temporales, id_subida, f"{numero:05d}.part"))
+            self._responder(200, cabeceras={'etag': f"{id_subida}-{numero}", 'opc-content-md5': md5})
+            return
+
+        md5 = self._guardar_cuerpo(temporal)
+        version = self._publicar(_carpeta_objeto(raiz, bucket, nombre), temporal, self._metadata_cabeceras())
+        self._responder(200, cabeceras={'etag': version, 'opc-content-md5': md5, 'version-id': version})
+
+    def do_POST(self):
+        bucket, tipo, nombre, consulta = self._ruta()
+        largo = int(self.headers.get('Content-Length') or 0)
+        cuerpo = json.loads(self.rfile.read(largo) or b'{}')
+
+        if tipo == 'u' and not nombre:
+            # Crear subida multiparte
+            id_subida = f"subida-{time.time_ns()}"
+            os.makedirs(os.path.join(self.server.temporales, id_subida))
+            with open(os.path.join(self.server.temporales, id_subida, 'metadata.json'), 'w') as archivo:
+                json.dump(cuerpo.get('metadata') or {}, archivo)
+            self._responder(200, {
+                'uploadId': id_subida, 'namespace': 'local', 'bucket': bucket,
+                'object': cuerpo['object'], 'timeCreated': _fecha_oci(time.time()),
+            })
+            return
+
+        if tipo == 'u' and 'uploadId' in consulta:
+            # Confirmar subida multiparte: las partes se concatenan en orden
+            carpeta_subida = os.path.join(self.server.temporales, consulta['uploadId'][0])
+            with open(os.path.join(carpeta_subida, 'metadata.json')) as archivo:
+                metadata = json.load(archivo)
+            numeros = sorted(p['partNum'] for p in cuerpo.get('partsToCommit', []))
+            temporal = tempfile.NamedTemporaryFile(dir=self.server.temporales, delete=False).name
+            with open(temporal, 'wb') as destino:
+                for numero in numeros:
+                    with open(os.path.join(carpeta_subida, f"{numero:05d}.part"), 'rb') as parte:
+                        shutil.copyfileobj(parte, destino, TAMANO_BLOQUE)
+            shutil.rmtree(carpeta_subida, ignore_errors=True)
+            version = self._publicar(_carpeta_objeto(self.server.raiz, bucket, nombre), temporal, metadata)
+            self._responder(200, cabeceras={'etag': version, 'version-id': version})
+            return
+
+        self._responder(400, {'code': 'InvalidParameter', 'message': 'Ruta no soportada'})
+
+    def do_DELETE(self):
+        bucket, tipo, nombre, consulta = self._ruta()
+        if tipo == 'u':
+            shutil.rmtree(os.path.join(self.server.temporales, consulta['uploadId'][0]), ignore_errors=True)
+            self._responder(204)
+            return
+
+        carpeta = _carpeta_objeto(self.server.raiz, bucket, nombre)
+        versiones = self._versiones(carpeta)
+        version = consulta.get('versionId', [versiones[0] if versiones else None])[0]
+        if version not in versiones:
+            self._no_existe()
+            return
+        for extension in ('.bin', '.json'):
+            os.remove(os.path.join(carpeta, f"{version}{extension}"))
+        self._responder(204)
+
+def crear_servidor(raiz, puerto=0):
+    """Servidor que guarda los objetos bajo raiz/{bucket}/{objeto}/{versión}.bin"""
+    os.makedirs(raiz, exist_ok=True)
+    servidor = ThreadingHTTPServer(('127.0.0.1', puerto), ManejadorObjetos)
+    servidor.daemon_threads = True
+    servidor.raiz = raiz
+    servidor.temporales = os.path.join(raiz, '.subidas')
+    os.makedirs(servidor.temporales, exist_ok=True)
+    return servidor
+
+def servir(raiz, listo):
+    """Punto de entrada del proceso del servidor: publica el puerto en listo (una Queue)"""
+    servidor = crear_servidor(raiz)
+    listo.put(servidor.server_port)
+    servidor.serve_forever()
+
+# ============================================================================
+# 🔑 CLIENTE OCI APUNTANDO AL SERVIDOR LOCAL
+# ============================================================================
+
+def generar_clave():
+    """Clave RSA en PEM (el cliente OCI firma igual cada petición aunque nadie la verifique)"""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    clave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return clave.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.TraditionalOpenSSL,
+        serialization.NoEncryption()
+    ).decode()
+
+# Identificadores con el formato que valida el SDK
+CONFIG_LOCAL = {
+    'user': 'ocid1.user.oc1..benchmarklocal',
+    'tenancy': 'ocid1.tenancy.oc1..benchmarklocal',
+    'fingerprint': ':'.join(['00'] * 16),
+    'region': 'us-ashburn-1',
+}
+
+def crear_cliente(endpoint, ruta_clave):
+    """ObjectStorageClient real cuyo endpoint es el servidor local"""
+    from oci.object_storage import ObjectStorageClient
+
+    return ObjectStorageClient(dict(CONFIG_LOCAL, key_file=ruta_clave), service_endpoint=endpoint)
@@ -0,0 +1,327 @@
+# ============================================================================
+# 🗄️ ORACLE LOCAL SOBRE SQLITE (SUSTITUTO PARA BENCHMARKS)
+# ============================================================================
+# Imita lo que los scripts usan de python-oracledb (pool, cursor, executemany,
+# fetch_df_batches) sobre un archivo SQLite. No es un traductor general de
+# Oracle: reescribe solo las sentencias que los scripts ejecutan (catálogo
+# ALL_/USER_TABLES, tablas temporales globales, MERGE con DECODE, binds :N).
+# Todas las conexiones comparten una sola conexión SQLite, así que las
+# tablas de staging y las transacciones se ven igual que en el pool real.
+
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+import pyarrow as pa
+
+sqlite3.register_adapter(datetime, lambda valor: valor.isoformat(' '))
+sqlite3.register_converter('DATE', lambda valor: datetime.fromisoformat(valor.decode()))
+sqlite3.register_converter('TIMESTAMP', lambda valor: datetime.fromisoformat(valor.decode()))
+
+# Tipo declarado en SQLite -> tipo Arrow que entregaría python-oracledb (fetch_decimals=False)
+TIPOS_ARROW = {
+    'DATE': pa.timestamp('s'),
+    'TIMESTAMP': pa.timestamp('us'),
+    'INTEGER': pa.int64(),
+    'NUMERIC': pa.float64(),
+    'TEXT': pa.large_string(),
+}
+
+# ============================================================================
+# 🔁 TRADUCCIÓN DE LAS SENTENCIAS DE LOS SCRIPTS
+# ============================================================================
+
+_TIPOS_DDL = [
+    (re.compile(r'\bVARCHAR2\s*\(\s*\d+\s*\)', re.I), 'TEXT'),
+    (re.compile(r'\bNUMBER\s*\(\s*\d+\s*\)', re.I), 'INTEGER'),
+    (re.compile(r'\bNUMBER\b', re.I), 'NUMERIC'),
+    (re.compile(r'\bSYSTIMESTAMP\b', re.I), 'CURRENT_TIMESTAMP'),
+]
+
+_CATALOGO_TABLAS = re.compile(
+    r"^SELECT COUNT\(\*\) FROM (?:ALL|USER)_TABLES WHERE TABLE_NAME = UPPER\(:1\)$", re.I)
+_CATALOGO_COLUMNAS = re.compile(
+    r"^SELECT (COUNT\(\*\)|COLUMN_NAME(?:, DATA_TYPE, DATA_LENGTH)?) FROM (?:ALL|USER)_TAB_COLUMNS "
+    r"WHERE TABLE_NAME = UPPER\(:1\)(?: AND COLUMN_NAME = '(\w+)')?$", re.I)
+_TABLA_TEMPORAL = re.compile(
+    r'^CREATE GLOBAL TEMPORARY TABLE (\w+) \((.*)\) ON COMMIT DELETE ROWS$', re.I)
+_AGREGAR_COLUMNAS = re.compile(r'^ALTER TABLE (\w+) ADD \((.*)\)$', re.I)
+_MODIFICAR_COLUMNAS = re.compile(r'^ALTER TABLE (\w+) MODIFY \((.*)\)$', re.I)
+_BORRAR_TABLA = re.compile(r'^DROP TABLE (\w+)$', re.I)
+_MAXIMO = re.compile(r'^SELECT MAX\(("?)(\w+)\1\) FROM ("?)(\w+)\3$', re.I)
+_MERGE = re.compile(
+    r'^MERGE INTO (\w+) T USING (\w+) S ON \(T\.("?\w+"?) = S\.\3\) '
+    r'WHEN MATCHED THEN UPDATE SET (.*?)(?: WHERE (.*?))? '
+    r'WHEN NOT MATCHED THEN INSERT \((.*?)\) VALUES \((.*?)\)$', re.I)
+_DECODE = re.compile(r'DECODE\(T\.("?\w+"?), S\.\1, 0, 1\) = 1', re.I)
+_BIND = re.compile(r'(?<![\w:]):(\d+)\b')
+_SYSTIMESTAMP = re.compile(r'\bSYSTIMESTAMP\b', re.I)
+# Largos en bytes de la migración de esquema
+_LENGTHB = re.compile(r'\bLENGTHB\(', re.I)
+_TABLA_ORIGEN = re.compile(r'\bFROM ("?)(\w+)\1', re.I)
+
+def _plano(sql):
+    """Sentencia en una sola línea con espacios simples"""
+    return ' '.join(sql.split()).strip().rstrip(';')
+
+def _tipos_ddl(definiciones):
+    for patron, reemplazo in _TIPOS_DDL:
+        definiciones = patron.sub(reemplazo, definiciones)
+    return definiciones
+
+def _separar_definiciones(definiciones):
+    """'a TEXT, b NUMBER(10, 2)' -> ['a TEXT', 'b NUMBER(10, 2)'] (comas de primer nivel)"""
+    partes, nivel, actual = [], 0, ''
+    for caracter in definiciones:
+        if caracter == ',' and nivel == 0:
+            partes.append(actual.strip())
+            actual = ''
+            continue
+        nivel += (caracter == '(') - (caracter == ')')
+        actual += caracter
+    if actual.strip():
+        partes.append(actual.strip())
+    return partes
+
+def _traducir_merge(m):
+    """MERGE ... USING staging -> INSERT ... SELECT ... ON CONFLICT DO UPDATE (upsert de SQLite)"""
+    destino, origen, llave, asignaciones, condicion, columnas, valores = m.groups()
+    asignaciones = re.sub(r'\bT\.("?\w+"?) =', r'\1 =', asignaciones)
+    asignaciones = re.sub(r'\bS\.', 'excluded.', asignaciones)
+    asignaciones = re.sub(r'\bSYSTIMESTAMP\b', 'CURRENT_TIMESTAMP', asignaciones, flags=re.I)
+    sql = (f"INSERT INTO {destino} AS T ({columnas}) SELECT {valores} FROM {origen} S WHERE true "
+           f"ON CONFLICT ({llave}) DO UPDATE SET {asignaciones}")
+    if condicion:
+        sql += " WHERE " + _DECODE.sub(r'T.\1 IS NOT excluded.\1', condicion)
+    return sql
+
+# ============================================================================
+# 🗄️ BASE LOCAL
+# ============================================================================
+
+class BaseLocal:
+    """Archivo SQLite compartido por todas las conexiones del pool local"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.sqlite = sqlite3.connect(ruta, check_same_thread=False,
+                                      detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+        self.sqlite.execute("PRAGMA journal_mode = WAL")
+        self.sqlite.execute("PRAGMA synchronous = NORMAL")
+        self.sqlite.create_function(
+            'TRUNC', 1, lambda valor: valor[:10] if isinstance(valor, str) else valor, deterministic=True)
+        self.sqlite.execute("CREATE TABLE IF NOT EXISTS DUAL (DUMMY TEXT)")
+        if self.sqlite.execute("SELECT COUNT(*) FROM DUAL").fetchone()[0] == 0:
+            self.sqlite.execute("INSERT INTO DUAL VALUES ('X')")
+        self.sqlite.execute("CREATE TABLE IF NOT EXISTS _TEMPORALES (TABLA TEXT PRIMARY KEY)")
+        self.sqlite.commit()
+        self.lock = threading.RLock()
+        self._traducciones = {}
+
+    # --- Catálogo ---
+
+    def tipos_columnas(self, tabla):
+        """{columna: tipo declarado} de la tabla (vacío si no existe)"""
+        filas = self.sqlite.execute("SELECT name, type FROM pragma_table_info(?)", [tabla]).fetchall()
+        return {nombre: tipo.upper() for nombre, tipo in filas}
+
+    def contar(self, tabla):
+        """Filas de la tabla (0 si no existe)"""
+        if not self.tipos_columnas(tabla):
+            return 0
+        return self.sqlite.execute(f'SELECT COUNT(*) FROM "{tabla}"').fetchone()[0]
+
+    def temporales(self):
+        return [fila[0] for fila in self.sqlite.execute("SELECT TABLA FROM _TEMPORALES")]
+
+    # --- Traducción ---
+
+    def traducir(self, sql):
+        """Lista de sentencias SQLite equivalentes a sql (con caché por texto)"""
+        if sql not in self._traducciones:
+            self._traducciones[sql] = self._traducir(_plano(sql))
+        return self._traducciones[sql]
+
+    def _traducir(self, sql):
+        if _CATALOGO_TABLAS.match(sql):
+            return ["SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND upper(name) = upper(?1)"]
+
+        m = _CATALOGO_COLUMNAS.match(sql)
+        if m:
+            seleccion = 'COUNT(*)' if m.group(1).upper().startswith('COUNT') else 'name'
+            if 'DATA_TYPE' in m.group(1).upper():
+                # Tipo declarado en SQLite -> DATA_TYPE de Oracle (VARCHAR2 sin largo: 4000)
+                seleccion = ("name, CASE upper(type) WHEN 'TEXT' THEN 'VARCHAR2' WHEN 'INTEGER' THEN 'NUMBER' "
+                             "WHEN 'NUMERIC' THEN 'NUMBER' ELSE upper(type) END, "
+                             "CASE upper(type) WHEN 'TEXT' THEN 4000 END")
+            filtro = f" WHERE upper(name) = '{m.group(2).upper()}'" if m.group(2) else ''
+            return [f"SELECT {seleccion} FROM pragma_table_info(upper(?1)){filtro}"]
+
+        m = _TABLA_TEMPORAL.match(sql)
+        if m:
+            # Tabla normal registrada: sus filas se borran en cada commit/rollback
+            return [f"CREATE TABLE {m.group(1)} ({_tipos_ddl(m.group(2))})",
+                    f"INSERT INTO _TEMPORALES VALUES ('{m.group(1).upper()}')"]
+
+        m = _AGREGAR_COLUMNAS.match(sql)
+        if m:
+            return [f"ALTER TABLE {m.group(1)} ADD COLUMN {definicion}"
+                    for definicion in _separar_definiciones(_tipos_ddl(m.group(2)))]
+
+        if _MODIFICAR_COLUMNAS.match(sql):
+            # SQLite no aplica largos: ampliar un VARCHAR2 no cambia nada
+            return []
+
+        m = _BORRAR_TABLA.match(sql)
+        if m:
+            return [f"DROP TABLE {m.group(1)}",
+                    f"DELETE FROM _TEMPORALES WHERE TABLA = '{m.group(1).upper()}'"]
+
+        m = _MERGE.match(sql)
+        if m:
+            return [_traducir_merge(m)]
+
+        m = _MAXIMO.match(sql)
+        if m:
+            # El agregado pierde el tipo declarado: se recupera con el alias "max [TIPO]"
+            tipo = self.tipos_columnas(m.group(4)).get(m.group(2), '')
+            alias = f' AS "max [{tipo}]"' if tipo in ('DATE', 'TIMESTAMP') else ''
+            comillas, columna, comillas_tabla, tabla = m.groups()
+            return [f'SELECT MAX({comillas}{columna}{comillas}){alias} '
+                    f'FROM {comillas_tabla}{tabla}{comillas_tabla}']
+
+        if sql.upper().startswith('CREATE TABLE'):
+            return [_tipos_ddl(sql)]
+
+        # Resto (INSERT, UPDATE, DELETE, SELECT): binds, SYSTIMESTAMP y LENGTHB
+        sql = _SYSTIMESTAMP.sub('CURRENT_TIMESTAMP', sql)
+        sql = _LENGTHB.sub('length(', sql)
+        return [_BIND.sub(r'?\1', sql)]
+
+    def tipos_arrow(self, sql, nombres):
+        """Tipo Arrow de cada columna del resultado (None = inferir)"""
+        m = _TABLA_ORIGEN.search(_plano(sql))
+        declarados = self.tipos_columnas(m.group(2)) if m else {}
+        return [TIPOS_ARROW.get(declarados.get(nombre, '')) for nombre in nombres]
+
+    def crear_engine(self):
+        """Engine SQLAlchemy sobre la misma conexión SQLite (COUNT/MAX de los scripts Parquet)"""
+        from sqlalchemy import create_engine
+        from sqlalchemy.pool import StaticPool
+
+        return create_engine("sqlite://", creator=lambda: self.sqlite, poolclass=StaticPool)
+
+    def cerrar(self):
+        self.sqlite.close()
+
+# ============================================================================
+# 🔌 POOL, CONEXIÓN Y CURSOR CON LA FORMA DE PYTHON-ORACLEDB
+# ============================================================================
+
+class CursorLocal:
+    def __init__(self, base):
+        self._base = base
+        self._cursor = base.sqlite.cursor()
+        self.arraysize = 5000
+
+    def execute(self, sql, parametros=None):
+        with self._base.lock:
+            for sentencia in self._base.traducir(sql):
+                self._cursor.execute(sentencia, parametros if '?' in sentencia else ())
+        return self
+
+    def executemany(self, sql, filas):
+        sentencia, = self._base.traducir(sql)
+        with self._base.lock:
+            self._cursor.executemany(sentencia, filas)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self.arraysize)
+
+    def close(self):
+        self._cursor.close()
+
+class LoteLocal:
+    """Lote de fetch_df_batches: num_rows() y la interfaz de flujo Arrow"""
+
+    def __init__(self, tabla):
+        self._tabla = tabla
+
+    def num_rows(self):
+        return self._tabla.num_rows
+
+    def __arrow_c_stream__(self, requested_schema=None):
+        return self._tabla.__arrow_c_stream__(requested_schema)
+
+class ConexionLocal:
+    def __init__(self, base):
+        self._base = base
+
+    def cursor(self):
+        return CursorLocal(self._base)
+
+    def _vaciar_temporales(self):
+        for tabla in self._base.temporales():
+            self._base.sqlite.execute(f"DELETE FROM {tabla}")
+
+    def commit(self):
+        # ON COMMIT DELETE ROWS: el staging se vacía en la misma transacción
+        with self._base.lock:
+            self._vaciar_temporales()
+            self._base.sqlite.commit()
+
+    def rollback(self):
+        with self._base.lock:
+            self._base.sqlite.rollback()
+            self._vaciar_temporales()
+            self._base.sqlite.commit()
+
+    def fetch_df_batches(self, statement, parameters=None, size=None, fetch_decimals=False):
+        cursor = self.cursor().execute(statement, parameters)
+        nombres = [columna[0] for columna in cursor.description]
+        tipos = self._base.tipos_arrow(statement, nombres)
+        while True:
+            filas = cursor.fetchmany(size)
+            if not filas:
+                break
+            columnas = list(zip(*filas))
+            yield LoteLocal(pa.table(
+                [pa.array(valores, type=tipo) for valores, tipo in zip(columnas, tipos)],
+                names=nombres
+            ))
+        cursor.close()
+
+    def close(self):
+        pass
+
+class PoolLocal:
+    def __init__(self, base):
+        self._base = base
+
+    def acquire(self):
+        return ConexionLocal(self._base)
+
+    def close(self, force=False):
+        pass
+
+def instalar(base):
+    """Reemplaza el pool y el engine de conexion_oracle (antes de importar los scripts)"""
+    import conexion_oracle
+
+    conexion_oracle._POOL = PoolLocal(base)
+    conexion_oracle.crear_engine = base.crear_engine
@@ -0,0 +1,107 @@
+# ============================================================================
+# SCRIPT: VERIFICACIÓN DE clasificar_llamadas CONTRA get_calltype
+# ============================================================================
+# Uso: python benchmarks/verificar_calltype.py [filas]
+#      (por defecto 100000)
+#
+# Corre sobre el mismo DataFrame la clasificación anterior fila por fila
+# (get_calltype con df.apply, copiada tal cual estaba en procesar_datos) y
+# cdr_merge.clasificar_llamadas, y verifica que las etiquetas coincidan en
+# todas las filas. El DataFrame mezcla canales reales con NaN, None,
+# números, textos vacíos y los dos nombres en la misma fila; también se
+# prueba sin la columna channel, sin dstchannel y sin ninguna de las dos.
+# Sale con código 1 si algún caso no coincide. Muestra lo que tarda cada una.
+#
+# Variables de entorno:
+#   BENCH_SEMILLA   semilla del generador aleatorio (0)
+
+import os
+import sys
+import time
+
+DIRECTORIO_BENCH = os.path.dirname(os.path.abspath(__file__))
+DIRECTORIO_SCRIPTS = os.path.join(os.path.dirname(DIRECTORIO_BENCH), 'scripts')
+sys.path[:0] = [DIRECTORIO_BENCH, DIRECTORIO_SCRIPTS]
+
+import numpy as np
+import pandas as pd
+
+import cdr_merge
+
+FILAS_DEFECTO = 100_000
+
+# Valores de channel / dstchannel: los que trae la API y los bordes
+VALORES = [
+    'SIP/Nebula_World-0000a1b2', 'SIP/Nebula_Loqui-0000c3d4', 'SIP/1001-0000e5f6',
+    'Local/Nebula_World@from-trunk', 'PJSIP/Nebula_Loqui', 'nebula_world', 'Nebula_Loqu',
+    'Nebula_World Nebula_Loqui', '', ' ', np.nan, None, 0, 1001, 3.5, float('inf'), True,
+]
+
+def get_calltype(row):
+    """Clasificación anterior, fila por fila (procesar_datos antes de clasificar_llamadas)"""
+    channel = str(row.get('channel', ''))
+    dstchannel = str(row.get('dstchannel', ''))
+
+    if 'Nebula_World' in channel:
+        return 'ENTRANTE'
+    elif 'Nebula_Loqui' in dstchannel or 'Nebula_Loqui' in channel:
+        return 'SALIENTE'
+    return 'INTERNO'
+
+def frame_de_prueba(filas, semilla):
+    """Todas las combinaciones de VALORES y luego filas al azar"""
+    rng = np.random.default_rng(semilla)
+    combinaciones = [(c, d) for c in VALORES for d in VALORES]
+    indices = rng.integers(0, len(VALORES), size=(filas, 2))
+    pares = combinaciones + [(VALORES[i], VALORES[j]) for i, j in indices]
+    return pd.DataFrame({
+        'channel': pd.Series([c for c, _ in pares], dtype=object),
+        'dstchannel': pd.Series([d for _, d in pares], dtype=object),
+        'uniqueid': [str(i) for i in range(len(pares))],
+    })
+
+def casos(df):
+    """(nombre, DataFrame): completo, con tipos propios de pandas y sin columnas"""
+    yield 'completo', df
+    yield 'columnas string', df.astype({'channel': 'string', 'dstchannel': 'string'})
+    yield 'sin channel', df.drop(columns=['channel'])
+    yield 'sin dstchannel', df.drop(columns=['dstchannel'])
+    yield 'sin channel ni dstchannel', df.drop(columns=['channel', 'dstchannel'])
+    yield 'vacío', df.iloc[0:0]
+
+def medir(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return resultado, time.perf_counter() - inicio
+
+def main(filas):
+    semilla = int(os.environ.get('BENCH_SEMILLA', '0'))
+    df = frame_de_prueba(filas, semilla)
+    print(f"📋 {len(df):,} filas ({len(VALORES) ** 2} combinaciones fijas + {filas:,} al azar, semilla {semilla})")
+
+    fallidos = 0
+    for nombre, datos in casos(df):
+        anterior, t_anterior = medir(lambda: datos.apply(get_calltype, axis=1))
+        nuevo, t_nuevo = medir(lambda: cdr_merge.clasificar_llamadas(datos))
+        if datos.empty:
+            # apply sobre un DataFrame vacío no devuelve etiquetas: basta con el largo
+            iguales = len(nuevo) == 0
+        else:
+            iguales = nuevo.index.equals(anterior.index) and nuevo.tolist() == anterior.tolist()
+        if iguales:
+            print(f"   ✅ {nombre:<28}{t_anterior:>8.3f}s -> {t_nuevo:.3f}s")
+            continue
+        fallidos += 1
+        distintas = datos[nuevo.astype(object).ne(anterior.astype(object))]
+        print(f"   ❌ {nombre}: {len(distintas):,} filas distintas, por ejemplo:")
+        for indice, fila in distintas.head(5).iterrows():
+            print(f"      {fila.to_dict()} -> antes {anterior[indice]}, ahora {nuevo[indice]}")
+
+    if fallidos:
+        print(f"\n❌ {fallidos} casos no coinciden")
+        sys.exit(1)
+    print("\n✅ clasificar_llamadas coincide con get_calltype en todos los casos")
+
+if __name__ == "__main__":
+    texto = sys.argv[1] if len(sys.argv) > 1 else ''
+    main(int(texto.replace('_', '')) if texto.strip() else FILAS_DEFECTO)
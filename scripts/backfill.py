@@ -0,0 +1,651 @@
+# ============================================================================
+# 🧱 BACKFILL PARALELO - CDR_LLAMADAS Y CDR_OIKOST_CRUDO
+# ============================================================================
+# Reconstruye meses de historia de una tabla (la carga diaria solo mira los
+# últimos días). Uso:
+#
+#   BACKFILL_DESTINO=cdr BACKFILL_DESDE=2025-01-01 BACKFILL_HASTA=2025-06-30 python scripts/backfill.py
+#   BACKFILL_DESTINO=oikost BACKFILL_PAGINAS=1-4000 python scripts/backfill.py
+#
+# 1. Plan: con el rango de fechas se buscan por bisección las páginas que lo
+#    cubren (requiere páginas ordenadas por calldate; si no, se recorren
+#    todas). El rango de páginas se parte en shards de BACKFILL_TAMANO_SHARD
+#    páginas y el plan queda en CDR_BACKFILL / CDR_BACKFILL_SHARDS.
+# 2. Descarga y transformación: cada shard va a un proceso del pool con sus
+#    propios hilos y su ControladorTasa (el ritmo total se reparte entre los
+#    procesos). Se aplican las mismas conversiones que la carga diaria, para
+#    que LLAVE_UNICA / uniqueid coincidan con lo que ya está en la tabla.
+# 3. Carga: el proceso principal carga un shard a la vez en el staging (la
+#    tabla temporal global de cada script) y de ahí con INSERT /*+ APPEND */
+#    (direct-path) solo las llaves que no existen. El shard se marca OK en
+#    la misma transacción: si el proceso se cae, la siguiente ejecución con
+#    el mismo BACKFILL_ID retoma los shards que no quedaron OK.
+#
+# No sobrescribe filas existentes (eso lo hace el MERGE diario). Si llegan
+# llamadas nuevas entre ejecuciones y las páginas van de la más nueva a la
+# más vieja, los números de página se corren: cada shard compara el total
+# de la API con el del plan y corre su rango.
+#
+# Variables de entorno:
+#   BACKFILL_DESTINO        cdr (CDR_LLAMADAS) u oikost (CDR_OIKOST_CRUDO)
+#   BACKFILL_DESDE          primer día (YYYY-MM-DD, calldate del destino)
+#   BACKFILL_HASTA          último día, incluido (por defecto hoy)
+#   BACKFILL_PAGINAS        rango de páginas "inicio-fin" en vez de (o además de) fechas
+#   BACKFILL_TAMANO_SHARD   páginas por shard (50)
+#   BACKFILL_PROCESOS       procesos del pool (4)
+#   BACKFILL_HILOS          hilos de descarga por proceso (2)
+#   BACKFILL_MAX_RPS        peticiones/s entre todos los procesos (0 = las del script destino)
+#   BACKFILL_ID             identificador para retomar (por defecto sale de los parámetros)
+#   BACKFILL_REINICIAR      1 = descartar el progreso guardado y planificar de nuevo
+
+import importlib
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from descarga_api import (ControladorTasa, crear_sesion, pedir_pagina, contar_filas,
+                          detectar_orden, paginas_entre)
+from conexion_oracle import conectar, cerrar_pool
+from esquema_crudo import asegurar_esquema, preparar_filas
+from metricas import etapa, guardar_metricas
+
+# ============================================================================
+# 🛠️ CONFIGURACIÓN CON VARIABLES DE ENTORNO
+# ============================================================================
+
+BACKFILL_DESTINO = os.environ.get('BACKFILL_DESTINO') or 'cdr'
+BACKFILL_DESDE = os.environ.get('BACKFILL_DESDE')
+BACKFILL_HASTA = os.environ.get('BACKFILL_HASTA')
+BACKFILL_PAGINAS = os.environ.get('BACKFILL_PAGINAS')
+BACKFILL_TAMANO_SHARD = int(os.environ.get('BACKFILL_TAMANO_SHARD') or 50)
+BACKFILL_PROCESOS = int(os.environ.get('BACKFILL_PROCESOS') or 4)
+BACKFILL_HILOS = int(os.environ.get('BACKFILL_HILOS') or 2)
+BACKFILL_MAX_RPS = float(os.environ.get('BACKFILL_MAX_RPS') or 0)
+BACKFILL_ID = os.environ.get('BACKFILL_ID')
+BACKFILL_REINICIAR = os.environ.get('BACKFILL_REINICIAR', '0') == '1'
+
+# Destino -> script que aporta URL, credenciales, conversiones y staging
+DESTINOS = {
+    'cdr': {
+        'modulo': 'cdr_merge',
+        'llave': 'LLAVE_UNICA',
+        'a_fecha': 'calldate_local',
+        'max_rps': 'API_MAX_RPS',
+        'adaptativo': 'API_ADAPTATIVO',
+        'reintentos': 'API_REINTENTOS',
+        'timeout': 30,
+    },
+    'oikost': {
+        'modulo': 'merge_oikost_crudo',
+        'llave': 'uniqueid',
+        'a_fecha': 'calldate_api',
+        'max_rps': 'OIKOST_MAX_RPS',
+        'adaptativo': 'OIKOST_ADAPTATIVO',
+        'reintentos': 'OIKOST_REINTENTOS',
+        'timeout': 60,
+    },
+}
+
+TABLA_BACKFILL = "CDR_BACKFILL"
+TABLA_SHARDS = f"{TABLA_BACKFILL}_SHARDS"
+
+# Filas por executemany al staging
+LOTE_STAGING = 5000
+
+# ============================================================================
+# 🧱 TABLAS DE CONTROL
+# ============================================================================
+
+def _existe_tabla(cursor, tabla):
+    cursor.execute("""
+        SELECT COUNT(*) FROM USER_TABLES
+        WHERE TABLE_NAME = UPPER(:1)
+    """, [tabla])
+    return cursor.fetchone()[0] > 0
+
+def asegurar_tablas_control(cursor):
+    """Crea las tablas del plan y del progreso por shard la primera vez"""
+    if not _existe_tabla(cursor, TABLA_BACKFILL):
+        print(f"   🏗️ Creando tabla de control {TABLA_BACKFILL}...")
+        cursor.execute(f"""
+            CREATE TABLE {TABLA_BACKFILL} (
+                BACKFILL_ID VARCHAR2(100) PRIMARY KEY,
+                DESTINO VARCHAR2(20),
+                DESDE VARCHAR2(20),
+                HASTA VARCHAR2(20),
+                PAGINA_INICIO NUMBER(10),
+                PAGINA_FIN NUMBER(10),
+                TOTAL_API NUMBER(12),
+                TOTAL_PAGINAS NUMBER(10),
+                TAMANO_PAGINA NUMBER(10),
+                ORDEN VARCHAR2(20),
+                SHARDS NUMBER(10),
+                FECHA_CREACION TIMESTAMP DEFAULT SYSTIMESTAMP
+            )
+        """)
+
+    if not _existe_tabla(cursor, TABLA_SHARDS):
+        print(f"   🏗️ Creando tabla de control {TABLA_SHARDS}...")
+        cursor.execute(f"""
+            CREATE TABLE {TABLA_SHARDS} (
+                BACKFILL_ID VARCHAR2(100),
+                SHARD NUMBER(10),
+                PAGINA_INICIO NUMBER(10),
+                PAGINA_FIN NUMBER(10),
+                ESTADO VARCHAR2(20),
+                INTENTOS NUMBER(5),
+                REGISTROS_API NUMBER(12),
+                REGISTROS NUMBER(12),
+                INSERTADOS NUMBER(12),
+                ERROR VARCHAR2(4000),
+                FECHA_ACTUALIZACION TIMESTAMP DEFAULT SYSTIMESTAMP,
+                PRIMARY KEY (BACKFILL_ID, SHARD)
+            )
+        """)
+
+def leer_plan(cursor, backfill_id):
+    """Plan guardado (dict con sus shards) o None"""
+    cursor.execute(f"""
+        SELECT DESTINO, DESDE, HASTA, PAGINA_INICIO, PAGINA_FIN, TOTAL_API,
+               TOTAL_PAGINAS, TAMANO_PAGINA, ORDEN
+        FROM {TABLA_BACKFILL}
+        WHERE BACKFILL_ID = :1
+    """, [backfill_id])
+    fila = cursor.fetchone()
+    if fila is None:
+        return None
+    plan = dict(zip(['destino', 'desde', 'hasta', 'pagina_inicio', 'pagina_fin', 'total',
+                     'total_paginas', 'tamano_pagina', 'orden'], fila))
+    cursor.execute(f"""
+        SELECT SHARD, PAGINA_INICIO, PAGINA_FIN, ESTADO, INTENTOS
+        FROM {TABLA_SHARDS}
+        WHERE BACKFILL_ID = :1
+        ORDER BY SHARD
+    """, [backfill_id])
+    plan['shards'] = [
+        dict(zip(['shard', 'pagina_inicio', 'pagina_fin', 'estado', 'intentos'], f))
+        for f in cursor.fetchall()
+    ]
+    return plan
+
+def guardar_plan(connection, backfill_id, plan):
+    """Reemplaza el plan y sus shards (todos PENDIENTE)"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"DELETE FROM {TABLA_SHARDS} WHERE BACKFILL_ID = :1", [backfill_id])
+        cursor.execute(f"DELETE FROM {TABLA_BACKFILL} WHERE BACKFILL_ID = :1", [backfill_id])
+        cursor.execute(f"""
+            INSERT INTO {TABLA_BACKFILL} (
+                BACKFILL_ID, DESTINO, DESDE, HASTA, PAGINA_INICIO, PAGINA_FIN,
+                TOTAL_API, TOTAL_PAGINAS, TAMANO_PAGINA, ORDEN, SHARDS
+            ) VALUES (:1, :2, :3, :4, :5, :6, :7, :8, :9, :10, :11)
+        """, [backfill_id, plan['destino'], plan['desde'], plan['hasta'], plan['pagina_inicio'],
+              plan['pagina_fin'], plan['total'], plan['total_paginas'], plan['tamano_pagina'],
+              plan['orden'], len(plan['shards'])])
+        cursor.executemany(f"""
+            INSERT INTO {TABLA_SHARDS} (
+                BACKFILL_ID, SHARD, PAGINA_INICIO, PAGINA_FIN, ESTADO, INTENTOS
+            ) VALUES (:1, :2, :3, :4, 'PENDIENTE', 0)
+        """, [(backfill_id, s['shard'], s['pagina_inicio'], s['pagina_fin']) for s in plan['shards']])
+        connection.commit()
+    finally:
+        cursor.close()
+
+def marcar_shard(cursor, backfill_id, shard, estado, registros_api=None, registros=None,
+                 insertados=None, error=None):
+    """Actualiza el estado de un shard (sin commit: va en la transacción de su carga)"""
+    cursor.execute(f"""
+        UPDATE {TABLA_SHARDS}
+        SET ESTADO = :1, INTENTOS = INTENTOS + 1, REGISTROS_API = :2, REGISTROS = :3,
+            INSERTADOS = :4, ERROR = :5, FECHA_ACTUALIZACION = SYSTIMESTAMP
+        WHERE BACKFILL_ID = :6 AND SHARD = :7
+    """, [estado, registros_api, registros, insertados,
+          str(error)[:4000] if error else None, backfill_id, shard])
+
+# ============================================================================
+# 🗺️ PLAN: PÁGINAS Y SHARDS
+# ============================================================================
+
+def id_por_defecto(destino, desde, hasta, paginas):
+    """BACKFILL_ID derivado de los parámetros: la misma invocación retoma el mismo backfill"""
+    partes = [destino]
+    if desde:
+        partes.append(f"{desde}_{hasta}")
+    if paginas:
+        partes.append(f"p{paginas}")
+    return "_".join(partes)
+
+def leer_rango_paginas(texto):
+    """'inicio-fin' -> (inicio, fin)"""
+    try:
+        inicio, fin = (int(p) for p in texto.split('-'))
+    except ValueError:
+        raise ValueError(f"BACKFILL_PAGINAS debe ser 'inicio-fin' (recibido: {texto!r})")
+    if inicio < 1 or fin < inicio:
+        raise ValueError(f"BACKFILL_PAGINAS fuera de rango: {texto!r}")
+    return inicio, fin
+
+def partir_en_shards(inicio, fin, tamano):
+    """Shards consecutivos de tamano páginas entre inicio y fin (incluidos)"""
+    tamano = max(tamano, 1)
+    return [
+        {'shard': n, 'pagina_inicio': a, 'pagina_fin': min(a + tamano - 1, fin),
+         'estado': 'PENDIENTE', 'intentos': 0}
+        for n, a in enumerate(range(inicio, fin + 1, tamano), 1)
+    ]
+
+def planificar(destino, modulo, headers, desde, hasta, paginas, max_rps):
+    """Lee el total de la API y arma el plan (rango de páginas, orden y shards)"""
+    config = DESTINOS[destino]
+    a_fecha = getattr(modulo, config['a_fecha'])
+    session = crear_sesion(headers, 1)
+    limitador = ControladorTasa(max_rps, 1, getattr(modulo, config['adaptativo']))
+    reintentos = getattr(modulo, config['reintentos'])
+
+    sondeadas = {}
+
+    def obtener(pagina):
+        # Una página que falla no debe confundirse con páginas desordenadas
+        if pagina not in sondeadas:
+            datos, _ = pedir_pagina(session, modulo.API_URL, pagina, config['timeout'],
+                                    limitador, reintentos)
+            if datos is None:
+                raise RuntimeError(f"no se pudo leer la página {pagina} para planificar")
+            sondeadas[pagina] = datos
+        return sondeadas[pagina].get('data') or {}
+
+    obtener(1)
+    total = sondeadas[1].get('total', 0)
+    total_paginas = sondeadas[1].get('totalPages', 1)
+    tamano_pagina = contar_filas(obtener(1))
+    print(f"✅ API tiene {total:,} registros totales en {total_paginas} páginas de {tamano_pagina:,}")
+
+    if paginas:
+        inicio, fin = leer_rango_paginas(paginas)
+        fin = min(fin, total_paginas)
+        orden = detectar_orden(obtener, total_paginas, a_fecha)
+    else:
+        resultado = paginas_entre(obtener, total_paginas, desde, hasta, a_fecha)
+        if resultado:
+            rango, orden = resultado
+            inicio, fin = rango.start, rango.stop - 1
+            print(f"   🔎 Páginas en orden {orden}: el rango de fechas está en {inicio}-{fin} "
+                  f"({len(sondeadas)} sondeos)")
+        else:
+            print(f"   ⚠️ Las páginas no están ordenadas por calldate: se recorren todas")
+            inicio, fin = 1, total_paginas
+            orden = detectar_orden(obtener, total_paginas, a_fecha)
+
+    if orden is None:
+        print(f"   ⚠️ Orden de las páginas desconocido: si llegan llamadas nuevas no se corrigen los números")
+
+    return {
+        'destino': destino,
+        'desde': f"{desde:%Y-%m-%d}" if desde is not None else None,
+        'hasta': f"{hasta - timedelta(days=1):%Y-%m-%d}" if desde is not None else None,
+        'pagina_inicio': inicio,
+        'pagina_fin': fin,
+        'total': total,
+        'total_paginas': total_paginas,
+        'tamano_pagina': tamano_pagina,
+        'orden': orden,
+        'shards': partir_en_shards(inicio, fin, BACKFILL_TAMANO_SHARD) if fin >= inicio else [],
+    }
+
+def paginas_del_shard(shard, plan, total_actual):
+    """
+    Páginas que hoy tienen los registros que el plan ubicó en el shard.
+    En orden descendente los registros nuevos empujan a los viejos hacia
+    páginas más altas: el rango se corre y, si el corrimiento no es
+    múltiplo del tamaño de página, se alarga una página.
+    """
+    inicio, fin = shard['pagina_inicio'], shard['pagina_fin']
+    corrimiento = (total_actual or 0) - (plan['total'] or 0)
+    if plan['orden'] != 'descendente' or corrimiento <= 0 or not plan['tamano_pagina']:
+        return range(inicio, fin + 1)
+    return range(inicio + corrimiento // plan['tamano_pagina'],
+                 fin + 1 - (-corrimiento // plan['tamano_pagina']))
+
+# ============================================================================
+# ⚙️ DESCARGA Y TRANSFORMACIÓN DE UN SHARD (PROCESO DEL POOL)
+# ============================================================================
+
+def _transformar(destino, modulo, df, desde, hasta):
+    """Mismas conversiones que la carga diaria del destino, con la ventana [desde, hasta)"""
+    if destino == 'cdr':
+        # Igual que descargar_ultimos_3_dias + procesar_datos: LLAVE_UNICA coincide con la diaria
+        df['calldate'] = pd.to_datetime(df['calldate'])
+        df['calldate'] = df['calldate'] - pd.Timedelta(hours=5)
+        df['calldate'] = df['calldate'].dt.tz_localize(None)
+        if desde is not None:
+            df = df[(df['calldate'] >= desde) & (df['calldate'] < hasta)]
+        return modulo.procesar_datos(df)
+
+    if desde is not None:
+        calldate_dt = pd.to_datetime(df['calldate'], errors='coerce')
+        df = df[(calldate_dt >= desde) & (calldate_dt < hasta)]
+    return df.drop_duplicates(subset=['uniqueid'], keep='last')
+
+def procesar_shard(destino, shard, plan, parametros):
+    """
+    Descarga las páginas de un shard y las deja con la forma de la tabla
+    destino. Corre en un proceso del pool: devuelve un dict con el
+    DataFrame (vacío si el shard falló) y los conteos.
+    """
+    import urllib3
+
+    urllib3.disable_warnings()
+    config = DESTINOS[destino]
+    modulo = importlib.import_module(config['modulo'])
+    inicio = time.perf_counter()
+    resultado = {'shard': shard['shard'], 'estado': 'FALLIDO', 'datos': None,
+                 'registros_api': 0, 'paginas': None, 'error': None, 'segundos': 0.0}
+
+    hilos = max(parametros['hilos'], 1)
+    session = crear_sesion(parametros['headers'], hilos)
+    limitador = ControladorTasa(parametros['max_rps'], hilos, parametros['adaptativo'])
+
+    def _pedir(pagina):
+        datos, _ = pedir_pagina(session, parametros['api_url'], pagina, config['timeout'],
+                                limitador, parametros['reintentos'])
+        return pagina, datos
+
+    # La primera página del shard trae el total de hoy para corregir el rango
+    _, primera = _pedir(shard['pagina_inicio'])
+    if primera is None:
+        resultado['error'] = f"página {shard['pagina_inicio']} fallida"
+        resultado['segundos'] = time.perf_counter() - inicio
+        return resultado
+    paginas = paginas_del_shard(shard, plan, primera.get('total'))
+    resultado['paginas'] = (paginas.start, paginas.stop - 1)
+
+    columnas = {}
+    if shard['pagina_inicio'] in paginas:
+        columnas[shard['pagina_inicio']] = primera.get('data') or {}
+    fallidas = []
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        for pagina, datos in pool.map(_pedir, [p for p in paginas if p not in columnas]):
+            if datos is None:
+                fallidas.append(pagina)
+            else:
+                columnas[pagina] = datos.get('data') or {}
+
+    if fallidas:
+        resultado['error'] = f"páginas fallidas: {fallidas}"
+        resultado['segundos'] = time.perf_counter() - inicio
+        return resultado
+
+    trozos = [pd.DataFrame(columnas[p]) for p in sorted(columnas)]
+    trozos = [t for t in trozos if not t.empty]
+    df = pd.concat(trozos, ignore_index=True) if trozos else pd.DataFrame()
+    resultado['registros_api'] = len(df)
+    if not df.empty:
+        desde = pd.Timestamp(plan['desde']) if plan['desde'] else None
+        hasta = pd.Timestamp(plan['hasta']) + pd.Timedelta(days=1) if plan['hasta'] else None
+        df = _transformar(destino, modulo, df, desde, hasta)
+    resultado.update(estado='OK', datos=df, segundos=time.perf_counter() - inicio)
+    return resultado
+
+# ============================================================================
+# 🚚 CARGA DIRECT-PATH DE UN SHARD (PROCESO PRINCIPAL)
+# ============================================================================
+
+def preparar_tabla_destino(destino, modulo):
+    """
+    cdr crea la tabla o le agrega LLAVE_UNICA como cdr_merge.main; la de
+    oikost la crea asegurar_esquema con el primer shard.
+    """
+    if destino == 'cdr':
+        ultima_fecha, tiene_llave = modulo.obtener_ultima_fecha_oracle()
+        if ultima_fecha is None and not tiene_llave:
+            modulo.crear_tabla_oracle()
+        elif not tiene_llave:
+            modulo.agregar_llave_unica_a_tabla_existente()
+
+def preparar_staging(destino, modulo, connection, cursor, df):
+    """Staging listo y (columnas, filas para executemany) con la forma del destino"""
+    if destino == 'cdr':
+        modulo.asegurar_tabla_staging(cursor)
+        return modulo.COLUMNAS_INSERT, modulo.preparar_binds(df)
+    tipos = asegurar_esquema(connection, modulo.TABLE_NAME, df, modulo.STAGING_TABLE)
+    modulo.asegurar_tabla_staging(cursor, tipos)
+    columnas = list(df.columns)
+    return columnas, preparar_filas(df, columnas, tipos)
+
+def cargar_shard(destino, modulo, backfill_id, resultado):
+    """
+    Staging + INSERT /*+ APPEND */ de las llaves que faltan y el shard
+    marcado OK, todo en un commit. Devuelve las filas insertadas.
+    """
+    import oracledb
+
+    df = resultado['datos']
+    llave = DESTINOS[destino]['llave']
+    connection = conectar()
+    cursor = connection.cursor()
+    try:
+        insertados = 0
+        if df is not None and not df.empty:
+            columnas, filas = preparar_staging(destino, modulo, connection, cursor, df)
+
+            cols = ", ".join(f'"{col}"' for col in columnas)
+            cols_s = ", ".join(f'S."{col}"' for col in columnas)
+            placeholders = ", ".join(f':{i+1}' for i in range(len(columnas)))
+            with etapa('insercion_staging') as m:
+                insert_sql = f"INSERT INTO {modulo.STAGING_TABLE} ({cols}) VALUES ({placeholders})"
+                for i in range(0, len(filas), LOTE_STAGING):
+                    cursor.executemany(insert_sql, filas[i:i + LOTE_STAGING])
+                m['filas'] = len(filas)
+
+            # Direct-path: bloquea la tabla hasta el commit, por eso se carga un shard a la vez
+            with etapa('insercion_directa') as m:
+                cursor.execute(f"""
+                    INSERT /*+ APPEND */ INTO {modulo.TABLE_NAME} ({cols})
+                    SELECT {cols_s} FROM {modulo.STAGING_TABLE} S
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM {modulo.TABLE_NAME} T WHERE T."{llave}" = S."{llave}"
+                    )
+                """)
+                insertados = cursor.rowcount
+                m['filas'] = insertados
+
+        marcar_shard(cursor, backfill_id, resultado['shard'], 'OK', resultado['registros_api'],
+                     0 if df is None else len(df), insertados)
+        connection.commit()
+        return insertados
+    except Exception:
+        try:
+            connection.rollback()
+        except oracledb.Error:
+            pass
+        raise
+    finally:
+        cursor.close()
+        connection.close()
+
+def registrar_fallo(backfill_id, resultado):
+    """Deja el shard FALLIDO con su error para la próxima ejecución"""
+    connection = conectar()
+    cursor = connection.cursor()
+    try:
+        marcar_shard(cursor, backfill_id, resultado['shard'], 'FALLIDO',
+                     resultado['registros_api'], error=resultado['error'])
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+
+# ============================================================================
+# 🎯 FUNCIÓN PRINCIPAL
+# ============================================================================
+
+def main():
+    inicio_total = time.time()
+
+    if BACKFILL_DESTINO not in DESTINOS:
+        print(f"❌ BACKFILL_DESTINO desconocido: {BACKFILL_DESTINO!r} (opciones: {', '.join(DESTINOS)})")
+        sys.exit(1)
+    if not BACKFILL_DESDE and not BACKFILL_PAGINAS:
+        print("❌ Indica BACKFILL_DESDE (y BACKFILL_HASTA) o BACKFILL_PAGINAS")
+        sys.exit(1)
+
+    destino = BACKFILL_DESTINO
+    config = DESTINOS[destino]
+    modulo = importlib.import_module(config['modulo'])
+    modulo.inicializar()
+
+    # hasta se usa como cota exclusiva: el día siguiente al último pedido
+    desde = hasta = ultimo_dia = None
+    if BACKFILL_DESDE:
+        ultimo_dia = BACKFILL_HASTA or f"{datetime.now():%Y-%m-%d}"
+        desde = pd.Timestamp(BACKFILL_DESDE)
+        hasta = pd.Timestamp(ultimo_dia) + timedelta(days=1)
+    backfill_id = BACKFILL_ID or id_por_defecto(destino, BACKFILL_DESDE, ultimo_dia, BACKFILL_PAGINAS)
+    max_rps = BACKFILL_MAX_RPS or getattr(modulo, config['max_rps'])
+    procesos = max(BACKFILL_PROCESOS, 1)
+
+    print(f"\n{'='*60}")
+    print(f"🧱 BACKFILL {backfill_id} -> {modulo.TABLE_NAME}")
+    print(f"{'='*60}")
+    print(f"   ⚙️ Procesos: {procesos} × {BACKFILL_HILOS} hilos | {max_rps:g} peticiones/s en total | "
+          f"Shards de {BACKFILL_TAMANO_SHARD} páginas")
+
+    # 1. Tabla destino y tablas de control
+    preparar_tabla_destino(destino, modulo)
+    connection = conectar()
+    cursor = connection.cursor()
+    try:
+        asegurar_tablas_control(cursor)
+        plan = None if BACKFILL_REINICIAR else leer_plan(cursor, backfill_id)
+    finally:
+        cursor.close()
+        connection.close()
+
+    # 2. Plan nuevo o retomado
+    if plan is None:
+        try:
+            with etapa('planificacion') as m:
+                plan = planificar(destino, modulo, modulo.headers, desde, hasta, BACKFILL_PAGINAS, max_rps)
+                m['filas'] = len(plan['shards'])
+        except (RuntimeError, ValueError) as e:
+            print(f"❌ No se pudo planificar el backfill: {e}")
+            sys.exit(1)
+        connection = conectar()
+        try:
+            guardar_plan(connection, backfill_id, plan)
+        finally:
+            connection.close()
+        print(f"🗺️ Plan: páginas {plan['pagina_inicio']}-{plan['pagina_fin']} en {len(plan['shards'])} shards")
+    else:
+        completos = sum(s['estado'] == 'OK' for s in plan['shards'])
+        print(f"⏯️ Retomando: {completos} de {len(plan['shards'])} shards completos "
+              f"(páginas {plan['pagina_inicio']}-{plan['pagina_fin']})")
+        if plan['destino'] != destino:
+            print(f"❌ El backfill {backfill_id} es de {plan['destino']}, no de {destino}")
+            sys.exit(1)
+
+    pendientes = [s for s in plan['shards'] if s['estado'] != 'OK']
+    if not pendientes:
+        print("✅ Todos los shards ya están cargados")
+        return
+
+    # 3. Descarga en el pool de procesos; carga en este proceso, un shard a la vez
+    parametros = {
+        'api_url': modulo.API_URL,
+        'headers': modulo.headers,
+        'hilos': BACKFILL_HILOS,
+        'max_rps': max_rps / procesos,
+        'adaptativo': getattr(modulo, config['adaptativo']),
+        'reintentos': getattr(modulo, config['reintentos']),
+    }
+    totales = {'ok': 0, 'fallidos': 0, 'registros_api': 0, 'registros': 0, 'insertados': 0}
+    por_lanzar = iter(pendientes)
+    en_vuelo = {}
+
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+        def lanzar():
+            # Como mucho dos shards por proceso esperando: acota la memoria del principal
+            for shard in por_lanzar:
+                try:
+                    en_vuelo[pool.submit(procesar_shard, destino, shard, plan, parametros)] = shard
+                except BrokenProcessPool:
+                    # Un proceso murió: los shards sin lanzar quedan PENDIENTE para la próxima
+                    return
+                if len(en_vuelo) >= 2 * procesos:
+                    break
+
+        lanzar()
+        while en_vuelo:
+            hechos, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                shard = en_vuelo.pop(futuro)
+                try:
+                    resultado = futuro.result()
+                except Exception as e:
+                    resultado = {'shard': shard['shard'], 'estado': 'FALLIDO', 'datos': None,
+                                 'registros_api': 0, 'paginas': None, 'error': repr(e), 'segundos': 0.0}
+
+                rango = resultado['paginas'] or (shard['pagina_inicio'], shard['pagina_fin'])
+                etiqueta = f"Shard {shard['shard']}/{len(plan['shards'])} (páginas {rango[0]}-{rango[1]})"
+                if resultado['estado'] == 'OK':
+                    try:
+                        insertados = cargar_shard(destino, modulo, backfill_id, resultado)
+                    except Exception as e:
+                        resultado['error'] = f"carga: {e}"
+                    else:
+                        registros = len(resultado['datos']) if resultado['datos'] is not None else 0
+                        totales['ok'] += 1
+                        totales['registros_api'] += resultado['registros_api']
+                        totales['registros'] += registros
+                        totales['insertados'] += insertados
+                        print(f"✅ {etiqueta}: {registros:,} registros, {insertados:,} insertados "
+                              f"(descarga {resultado['segundos']:.1f}s)")
+                        continue
+
+                totales['fallidos'] += 1
+                print(f"❌ {etiqueta}: {resultado['error']}")
+                try:
+                    registrar_fallo(backfill_id, resultado)
+                except Exception as e:
+                    print(f"⚠️ No se pudo registrar el fallo del shard: {e}")
+            lanzar()
+
+    incompleto = totales['ok'] < len(pendientes)
+
+    # Tiempo total
+    tiempo_total = time.time() - inicio_total
+    minutos = int(tiempo_total // 60)
+    segundos = int(tiempo_total % 60)
+
+    print(f"\n{'='*60}")
+    print(f"{'⚠️ BACKFILL INCOMPLETO' if incompleto else '✅ BACKFILL COMPLETADO'}")
+    print(f"   Shards: {totales['ok']:,} OK, {totales['fallidos']:,} fallidos "
+          f"(de {len(pendientes):,} pendientes)")
+    print(f"   Registros de la API: {totales['registros_api']:,} | en el rango: {totales['registros']:,} | "
+          f"insertados: {totales['insertados']:,}")
+    print(f"⏱️  Tiempo total: {minutos} minutos {segundos} segundos")
+    if incompleto:
+        print(f"   ⏯️ Vuelve a correr con BACKFILL_ID={backfill_id} para retomar los shards pendientes")
+    print(f"{'='*60}")
+    if incompleto:
+        sys.exit(1)
+
+# ============================================================================
+# 🏃 EJECUTAR
+# ============================================================================
+
+if __name__ == "__main__":
+    estado = 'error'
+    try:
+        main()
+        estado = 'ok'
+    finally:
+        cerrar_pool()
+        guardar_metricas(f'backfill_{BACKFILL_DESTINO}', estado)
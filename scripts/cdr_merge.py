@@ -2,24 +2,18 @@
 # 📞 CDR LLAMADAS - VERSIÓN DEFINITIVA CON LLAVE ÚNICA
 # ============================================================================
 
-import requests
 import pandas as pd
 import base64
-from sqlalchemy import create_engine, text
 from datetime import datetime, timedelta
-from tqdm import tqdm
 import urllib3
 import time
 import numpy as np
-import oracledb
 import os
 import sys
-
-urllib3.disable_warnings()
-
-print("=" * 80)
-print("🚀 INICIANDO PROCESO DE ACTUALIZACIÓN CDR")
-print("=" * 80)
+from descarga_api import crear_sesion, descargar_paginas, WORKERS_DEFECTO, MAX_RPS_DEFECTO, REINTENTOS_DEFECTO
+from conexion_oracle import conectar, cerrar_pool
+from punto_control import leer_punto_control, guardar_punto_control
+from metricas import etapa, guardar_metricas
 
 # ============================================================================
 # 🛠️ CONFIGURACIÓN CON VARIABLES DE ENTORNO
@@ -36,22 +30,57 @@ API_USER = os.environ.get('API_USER', 'oikosadm')
 API_PASSWORD = os.environ.get('API_PASSWORD')
 
 TABLE_NAME = "CDR_LLAMADAS"
+# Tabla temporal global permanente (ON COMMIT DELETE ROWS) usada como staging del MERGE
+STAGING_TABLE = f"{TABLE_NAME}_STG"
+# MERGE que solo actualiza filas cuyo contenido cambió (0 = reescribir todas las coincidentes)
+MERGE_DETECTAR_CAMBIOS = os.environ.get('MERGE_DETECTAR_CAMBIOS', '1') == '1'
+
+# --- Descarga concurrente (workers y límite de peticiones por segundo) ---
+API_WORKERS = int(os.environ.get('API_WORKERS', WORKERS_DEFECTO))
+API_MAX_RPS = float(os.environ.get('API_MAX_RPS', MAX_RPS_DEFECTO))
+# Control adaptativo (AIMD): API_MAX_RPS es el ritmo inicial y sube hasta API_TOPE_RPS
+# (0 = 4 veces el inicial) mientras la API responde bien; API_ADAPTATIVO=0 lo deja fijo
+API_ADAPTATIVO = os.environ.get('API_ADAPTATIVO', '1') == '1'
+API_TOPE_RPS = float(os.environ.get('API_TOPE_RPS', 0))
+# Reintentos por página (con espera exponencial) antes de darla por fallida
+API_REINTENTOS = int(os.environ.get('API_REINTENTOS', REINTENTOS_DEFECTO))
+# Buscar por bisección la primera página con fecha_limite (requiere páginas ordenadas por calldate)
+API_BUSQUEDA_LIMITE = os.environ.get('API_BUSQUEDA_LIMITE', '0') == '1'
+
+# Cabeceras con Basic Auth: las arma inicializar()
+headers = None
+
+# ============================================================================
+# 🔧 INICIALIZACIÓN
+# ============================================================================
+# Importar el módulo no imprime ni verifica credenciales: lo hace
+# inicializar() desde el bloque de ejecución.
 
-# Verificar que todas las credenciales están presentes
-if not all([ORACLE_USER, ORACLE_PASSWORD, ORACLE_DSN, API_USER, API_PASSWORD]):
-    print("❌ Error: Faltan credenciales en las variables de entorno")
-    sys.exit(1)
+def inicializar():
+    """Verifica las credenciales y arma las cabeceras de la API (sale con código 1 si faltan)"""
+    global headers
 
-# --- Basic Auth ---
-basic_token = base64.b64encode(f"{API_USER}:{API_PASSWORD}".encode()).decode()
-headers = {
-    'Authorization': f'Basic {basic_token}',
-    'Content-Type': 'application/json'
-}
+    urllib3.disable_warnings()
 
-print(f"🔌 Configuración:")
-print(f"   URL: {API_URL}")
-print(f"   Usuario: {API_USER}")
+    print("=" * 80)
+    print("🚀 INICIANDO PROCESO DE ACTUALIZACIÓN CDR")
+    print("=" * 80)
+
+    # Verificar que todas las credenciales están presentes
+    if not all([ORACLE_USER, ORACLE_PASSWORD, ORACLE_DSN, API_USER, API_PASSWORD]):
+        print("❌ Error: Faltan credenciales en las variables de entorno")
+        sys.exit(1)
+
+    # --- Basic Auth ---
+    basic_token = base64.b64encode(f"{API_USER}:{API_PASSWORD}".encode()).decode()
+    headers = {
+        'Authorization': f'Basic {basic_token}',
+        'Content-Type': 'application/json'
+    }
+
+    print(f"🔌 Configuración:")
+    print(f"   URL: {API_URL}")
+    print(f"   Usuario: {API_USER}")
 
 # ============================================================================
 # 📅 FUNCIÓN PARA OBTENER ÚLTIMA FECHA EN ORACLE
@@ -60,11 +89,7 @@ print(f"   Usuario: {API_USER}")
 def obtener_ultima_fecha_oracle():
     """Obtiene la última fecha en Oracle"""
     try:
-        connection = oracledb.connect(
-            user=ORACLE_USER,
-            password=ORACLE_PASSWORD,
-            dsn=ORACLE_DSN
-        )
+        connection = conectar()
         cursor = connection.cursor()
         
         # Verificar si la tabla existe
@@ -111,63 +136,65 @@ def obtener_ultima_fecha_oracle():
         return None, False
 
 # ============================================================================
-# 🧹 FUNCIÓN PARA LIMPIAR TABLAS TEMPORALES HUÉRFANAS
+# 🧱 FUNCIÓN PARA ASEGURAR LA TABLA DE STAGING (GLOBAL TEMPORARY)
 # ============================================================================
 
-def limpiar_tablas_temporales():
-    """Elimina todas las tablas temporales huérfanas"""
-    print(f"\n🧹 Limpiando tablas temporales huérfanas...")
+def asegurar_tabla_staging(cursor):
+    """
+    Crea una sola vez la tabla temporal global de staging.
+    Sus filas desaparecen en el commit, así que no quedan tablas huérfanas.
+    """
+    cursor.execute("""
+        SELECT COUNT(*) 
+        FROM USER_TABLES 
+        WHERE TABLE_NAME = UPPER(:1)
+    """, [STAGING_TABLE])
     
-    try:
-        connection = oracledb.connect(
-            user=ORACLE_USER,
-            password=ORACLE_PASSWORD,
-            dsn=ORACLE_DSN
-        )
-        cursor = connection.cursor()
-        
-        # Buscar todas las tablas temporales
-        cursor.execute("""
-            SELECT TABLE_NAME 
-            FROM ALL_TABLES 
-            WHERE TABLE_NAME LIKE 'CDR_LLAMADAS_TEMP_%'
-        """)
-        
-        tablas_temp = cursor.fetchall()
-        
-        if tablas_temp:
-            print(f"   🔍 Encontradas {len(tablas_temp)} tablas temporales")
-            
-            for (tabla,) in tablas_temp:
-                try:
-                    cursor.execute(f"DROP TABLE {tabla}")
-                    print(f"   ✅ Eliminada: {tabla}")
-                except Exception as e:
-                    print(f"   ❌ Error eliminando {tabla}: {e}")
-            
-            connection.commit()
-        else:
-            print(f"   ✅ No hay tablas temporales huérfanas")
-        
-        cursor.close()
-        connection.close()
-        
-    except Exception as e:
-        print(f"❌ Error limpiando tablas temporales: {e}")
+    if cursor.fetchone()[0] > 0:
+        return
+    
+    print(f"   🏗️ Creando tabla de staging {STAGING_TABLE} (GLOBAL TEMPORARY)...")
+    cursor.execute(f"""
+        CREATE GLOBAL TEMPORARY TABLE {STAGING_TABLE} (
+            CALLLATE DATE,
+            CALLHOUR VARCHAR2(20),
+            CLID VARCHAR2(255),
+            SRC VARCHAR2(100),
+            DST VARCHAR2(100),
+            DCONTEXT VARCHAR2(100),
+            CHANNEL VARCHAR2(255),
+            DSTCHANNEL VARCHAR2(255),
+            LASTAPP VARCHAR2(100),
+            DURATION NUMBER(10),
+            DISPOSITION VARCHAR2(50),
+            UNIQUEID VARCHAR2(100),
+            CALLTYPE VARCHAR2(50),
+            LLAVE_UNICA VARCHAR2(100)
+        ) ON COMMIT DELETE ROWS
+    """)
 
 # ============================================================================
 # 📥 FUNCIÓN PARA DESCARGAR Y FILTRAR ÚLTIMOS 3 DÍAS
 # ============================================================================
 
-def descargar_ultimos_3_dias(ultima_fecha):
+def calldate_local(valor):
+    """Convierte un calldate crudo de la API a hora local sin zona (None si no es válido)"""
+    fecha = pd.to_datetime(valor, errors='coerce')
+    if pd.isna(fecha):
+        return None
+    fecha = fecha - pd.Timedelta(hours=5)
+    return fecha.tz_localize(None) if fecha.tzinfo else fecha
+
+def descargar_ultimos_3_dias(ultima_fecha, pendiente=None):
     """
-    Descarga todo y filtra localmente SOLO los últimos 3 días
+    Descarga en streaming y filtra cada página al llegar: SOLO los últimos 3 días.
+    Con pendiente (calldate desde el que quedaron páginas fallidas en el punto
+    de control) la ventana baja hasta ahí y esos registros no se descartan.
+    Devuelve (DataFrame filtrado, info de la descarga o None si falló).
     """
     print(f"\n🚀 Descargando datos para filtrar últimos 3 días...")
     
-    session = requests.Session()
-    session.verify = False
-    session.headers.update(headers)
+    session = crear_sesion(headers, API_WORKERS)
     
     # Calcular fecha límite (últimos 3 días)
     if ultima_fecha:
@@ -179,80 +206,127 @@ def descargar_ultimos_3_dias(ultima_fecha):
         fecha_limite = datetime.now() - timedelta(days=30)
         print(f"📅 Primera carga: desde {fecha_limite}")
     
-    todos_datos = []
+    if pendiente is not None and pendiente < fecha_limite:
+        fecha_limite = pendiente
+        print(f"⏪ Retomando páginas fallidas: desde {fecha_limite}")
     
-    try:
-        # Descargar primera página
-        response = session.get(f"{API_URL}?page=1", timeout=30)
-        
-        if response.status_code == 200:
-            data = response.json()
-            total_api = data.get('total', 0)
-            total_paginas = data.get('totalPages', 1)
-            print(f"✅ API tiene {total_api:,} registros totales en {total_paginas} páginas")
-            
-            # Descargar todas las páginas
-            pbar = tqdm(total=total_paginas, desc="Descargando páginas")
-            
-            for pagina in range(1, total_paginas + 1):
-                response = session.get(f"{API_URL}?page={pagina}", timeout=30)
-                if response.status_code == 200:
-                    data = response.json()
-                    todos_datos.extend(data.get('data', []))
-                pbar.update(1)
+    def filtrar_pagina(columnas):
+        """Convierte una página (en columnas) en DataFrame y conserva solo calldate >= fecha_limite"""
+        with etapa('filtro') as m:
+            df_pagina = pd.DataFrame(columnas)
+            if df_pagina.empty:
+                return df_pagina
             
-            pbar.close()
+            # Convertir y ajustar zona horaria
+            df_pagina['calldate'] = pd.to_datetime(df_pagina['calldate'])
+            df_pagina['calldate'] = df_pagina['calldate'] - pd.Timedelta(hours=5)
+            df_pagina['calldate'] = df_pagina['calldate'].dt.tz_localize(None)  # Quitar zona horaria
             
-            print(f"✅ Descargados {len(todos_datos):,} registros crudos")
-            
-            # FILTRADO LOCAL por fecha
-            if todos_datos:
-                df_temp = pd.DataFrame(todos_datos)
-                
-                # Convertir y ajustar zona horaria
-                df_temp['calldate'] = pd.to_datetime(df_temp['calldate'])
-                df_temp['calldate'] = df_temp['calldate'] - pd.Timedelta(hours=5)
-                df_temp['calldate'] = df_temp['calldate'].dt.tz_localize(None)  # Quitar zona horaria
-                
-                # Filtrar por fecha límite
-                df_filtrado = df_temp[df_temp['calldate'] >= fecha_limite]
-                
-                print(f"🔍 Después de filtrar por fecha >= {fecha_limite}: {len(df_filtrado):,} registros")
-                
-                # Si ya hay datos en BD, filtrar solo los más nuevos
-                if ultima_fecha:
-                    df_filtrado = df_filtrado[df_filtrado['calldate'] > ultima_fecha]
-                    print(f"🔍 Después de filtrar > última fecha: {len(df_filtrado):,} registros realmente nuevos")
-                
-                return df_filtrado.to_dict('records')
-            
-        else:
-            print(f"❌ Error API: {response.status_code}")
-            return []
+            df_pagina = df_pagina[df_pagina['calldate'] >= fecha_limite]
+            m['filas'] = len(df_pagina)
+            return df_pagina
+    
+    try:
+        # Descargar las páginas en paralelo; cada una se filtra al llegar
+        with etapa('descarga') as m:
+            trozos, info = descargar_paginas(
+                session, API_URL,
+                workers=API_WORKERS,
+                max_rps=API_MAX_RPS,
+                timeout=30,
+                reintentos=API_REINTENTOS,
+                adaptativo=API_ADAPTATIVO,
+                tope_rps=API_TOPE_RPS or None,
+                fecha_limite=fecha_limite if API_BUSQUEDA_LIMITE else None,
+                a_fecha=calldate_local,
+                al_llegar=filtrar_pagina
+            )
+            m['filas'] = info['registros_descargados']
+        
+        if 1 in info['paginas_fallidas']:
+            print(f"❌ Error API: no se pudo leer la primera página")
+            return pd.DataFrame(), None
+        
+        if info['paginas_fallidas']:
+            print(f"⚠️ Páginas fallidas (quedan en el punto de control): {info['paginas_fallidas']}")
+        
+        print(f"✅ Descargados {info['registros_descargados']:,} registros crudos")
+        
+        trozos = [t for t in trozos if not t.empty]
+        if not trozos:
+            return pd.DataFrame(), info
+        
+        df_filtrado = pd.concat(trozos, ignore_index=True)
+        print(f"🔍 Después de filtrar por fecha >= {fecha_limite}: {len(df_filtrado):,} registros")
+        
+        # Si ya hay datos en BD, filtrar solo los más nuevos
+        if ultima_fecha:
+            nuevos = df_filtrado['calldate'] > ultima_fecha
+            if pendiente is not None:
+                nuevos |= df_filtrado['calldate'] >= pendiente
+            df_filtrado = df_filtrado[nuevos]
+            print(f"🔍 Después de filtrar > última fecha: {len(df_filtrado):,} registros realmente nuevos")
+        
+        return df_filtrado, info
             
     except Exception as e:
         print(f"❌ Error: {e}")
-        return []
-    
-    return []
+        return pd.DataFrame(), None
 
 # ============================================================================
 # 🔑 FUNCIÓN PARA GENERAR LLAVE ÚNICA
 # ============================================================================
 
-def generar_llave_unica(row):
-    """Genera llave única: YYYY-MM-DD_UNIQUEID"""
-    calldate_str = row['calldate'].strftime('%Y-%m-%d')
-    uniqueid = str(row['uniqueid'])
-    return f"{calldate_str}_{uniqueid}"
+def generar_llaves_unicas(df):
+    """
+    Genera llave única: YYYY-MM-DD_UNIQUEID (columnas completas, sin recorrer filas).
+    Un calldate vacío no tiene llave: falla (ValueError) en vez de mandar NULL al MERGE.
+    """
+    sin_fecha = df['calldate'].isna()
+    if sin_fecha.any():
+        ejemplos = df.loc[sin_fecha, 'uniqueid'].head(5).tolist()
+        raise ValueError(f"{int(sin_fecha.sum()):,} registros sin calldate no pueden tener "
+                         f"LLAVE_UNICA (uniqueid: {ejemplos})")
+    calldate_str = df['calldate'].dt.strftime('%Y-%m-%d')
+    # str() por valor, como la versión por fila: un uniqueid vacío queda 'None' / 'nan', no NULL
+    uniqueid = df['uniqueid'].map(str)
+    return calldate_str + '_' + uniqueid
+
+# ============================================================================
+# 📞 FUNCIÓN PARA CLASIFICAR LLAMADAS
+# ============================================================================
+
+def clasificar_llamadas(df):
+    """
+    Clasifica ENTRANTE / SALIENTE / INTERNO sobre columnas completas.
+    Nebula_World en channel => ENTRANTE; Nebula_Loqui en dstchannel o channel => SALIENTE.
+    """
+    def _columna(nombre):
+        if nombre in df.columns:
+            return df[nombre].astype(str)
+        return pd.Series('', index=df.index)
+    
+    channel = _columna('channel')
+    dstchannel = _columna('dstchannel')
+    
+    entrante = channel.str.contains('Nebula_World', regex=False, na=False)
+    saliente = (
+        dstchannel.str.contains('Nebula_Loqui', regex=False, na=False) |
+        channel.str.contains('Nebula_Loqui', regex=False, na=False)
+    )
+    
+    return pd.Series(
+        np.select([entrante, saliente], ['ENTRANTE', 'SALIENTE'], default='INTERNO'),
+        index=df.index
+    )
 
 # ============================================================================
 # 🔄 PROCESAR DATOS
 # ============================================================================
 
 def procesar_datos(datos):
-    """Procesa los datos y genera llave única"""
-    if not datos:
+    """Procesa los datos (DataFrame o lista de registros) y genera llave única"""
+    if len(datos) == 0:
         return pd.DataFrame()
     
     df = pd.DataFrame(datos)
@@ -283,20 +357,10 @@ def procesar_datos(datos):
     df['callhour'] = df['calldate'].dt.strftime('%H:%M:%S')
     
     # 5. Clasificar llamadas
-    def get_calltype(row):
-        channel = str(row.get('channel', ''))
-        dstchannel = str(row.get('dstchannel', ''))
-        
-        if 'Nebula_World' in channel:
-            return 'ENTRANTE'
-        elif 'Nebula_Loqui' in dstchannel or 'Nebula_Loqui' in channel:
-            return 'SALIENTE'
-        return 'INTERNO'
-    
-    df['calltype'] = df.apply(get_calltype, axis=1)
+    df['calltype'] = clasificar_llamadas(df)
     
     # 6. GENERAR LLAVE ÚNICA
-    df['llave_unica'] = df.apply(generar_llave_unica, axis=1)
+    df['llave_unica'] = generar_llaves_unicas(df)
     
     # 7. Columnas finales
     columnas = {
@@ -331,11 +395,7 @@ def crear_tabla_oracle():
     """Crea la tabla en Oracle con LLAVE_UNICA incluida"""
     print(f"\n🏗️ Creando tabla {TABLE_NAME}...")
     
-    connection = oracledb.connect(
-        user=ORACLE_USER,
-        password=ORACLE_PASSWORD,
-        dsn=ORACLE_DSN
-    )
+    connection = conectar()
     cursor = connection.cursor()
     
     cursor.execute(f"""
@@ -371,11 +431,7 @@ def agregar_llave_unica_a_tabla_existente():
     """Agrega la columna LLAVE_UNICA a una tabla existente"""
     print(f"\n🔧 Agregando columna LLAVE_UNICA a tabla existente...")
     
-    connection = oracledb.connect(
-        user=ORACLE_USER,
-        password=ORACLE_PASSWORD,
-        dsn=ORACLE_DSN
-    )
+    connection = conectar()
     cursor = connection.cursor()
     
     try:
@@ -409,149 +465,155 @@ def agregar_llave_unica_a_tabla_existente():
         connection.close()
 
 # ============================================================================
-# 🚀 FUNCIÓN DE MERGE EXPRESS - CON LIMPIEZA DE TEMPS
+# 📦 FUNCIÓN PARA PREPARAR BINDS POR COLUMNAS
+# ============================================================================
+
+COLUMNAS_INSERT = [
+    'CALLLATE', 'CALLHOUR', 'CLID', 'SRC', 'DST', 'DCONTEXT',
+    'CHANNEL', 'DSTCHANNEL', 'LASTAPP', 'DURATION', 'DISPOSITION',
+    'UNIQUEID', 'CALLTYPE', 'LLAVE_UNICA'
+]
+
+# Columnas que el MERGE actualiza en las filas coincidentes
+COLUMNAS_ACTUALIZABLES = [c for c in COLUMNAS_INSERT if c not in ('UNIQUEID', 'LLAVE_UNICA')]
+
+def preparar_binds(df):
+    """
+    Convierte el DataFrame en filas para executemany columna a columna.
+    CALLLATE va como datetime (DATE nativo, sin TO_DATE) y DURATION como int.
+    """
+    columnas = []
+    for col in COLUMNAS_INSERT:
+        if col == 'CALLLATE':
+            valores = list(pd.to_datetime(df[col]).dt.normalize().dt.to_pydatetime())
+        elif col == 'DURATION':
+            valores = df[col].astype(int).tolist()
+        else:
+            valores = df[col].tolist()
+        columnas.append(valores)
+    return list(zip(*columnas))
+
+# ============================================================================
+# 🚀 FUNCIÓN DE MERGE EXPRESS - CON STAGING GLOBAL TEMPORARY
 # ============================================================================
 
 def merge_express_oracle(df, tiene_llave):
-    """Hace MERGE de los datos en Oracle - CON LIMPIEZA DE TEMPS"""
+    """Hace MERGE de los datos en Oracle vía la tabla de staging - UN SOLO COMMIT"""
+    import oracledb
     
     if df.empty:
         print(f"⚠️ No hay datos para procesar")
-        return 0
+        return {'nuevos': 0, 'actualizados': 0, 'sin_cambios': 0}
     
     print(f"\n⚡ MERGE EXPRESS ⚡")
     print(f"   Procesando {len(df):,} registros...")
     
     inicio_merge = time.time()
-    temp_table = f"{TABLE_NAME}_TEMP_{int(time.time())}"
     
     connection = None
     cursor = None
     
     try:
-        connection = oracledb.connect(
-            user=ORACLE_USER,
-            password=ORACLE_PASSWORD,
-            dsn=ORACLE_DSN
-        )
+        connection = conectar()
         cursor = connection.cursor()
         
         # Si la tabla no tiene la columna LLAVE_UNICA, agregarla
         if not tiene_llave:
             agregar_llave_unica_a_tabla_existente()
         
-        # Crear tabla temporal (asegurar que no existe)
-        print(f"   🏗️ Creando tabla temporal {temp_table}...")
-        cursor.execute(f"BEGIN EXECUTE IMMEDIATE 'DROP TABLE {temp_table}'; EXCEPTION WHEN OTHERS THEN NULL; END;")
-        cursor.execute(f"""
-            CREATE TABLE {temp_table} AS 
-            SELECT * FROM {TABLE_NAME} WHERE 1=0
-        """)
+        # Tabla de staging (DDL solo la primera vez)
+        asegurar_tabla_staging(cursor)
         
-        # Preparar datos CON FECHAS EN FORMATO CORRECTO
+        # Preparar binds por columnas (fechas como DATE nativo)
         print(f"   📦 Preparando {len(df)} registros...")
-        datos_para_insert = []
+        # Etapa propia: 'transformacion' es procesar_datos, medida en main
+        with etapa('preparacion_binds') as m:
+            datos_para_insert = preparar_binds(df)
+            m['filas'] = len(datos_para_insert)
         
-        for _, row in df.iterrows():
-            # CONVERTIR FECHA A STRING EN FORMATO YYYY-MM-DD
-            fecha_str = row['CALLLATE'].strftime('%Y-%m-%d')
-            
-            datos_para_insert.append((
-                fecha_str,  # Fecha como string
-                row['CALLHOUR'],
-                row['CLID'],
-                row['SRC'],
-                row['DST'],
-                row['DCONTEXT'],
-                row['CHANNEL'],
-                row['DSTCHANNEL'],
-                row['LASTAPP'],
-                int(row['DURATION']),
-                row['DISPOSITION'],
-                row['UNIQUEID'],
-                row['CALLTYPE'],
-                row['LLAVE_UNICA']
-            ))
-        
-        # Insertar en temporal por lotes
-        print(f"   📦 Insertando en tabla temporal...")
+        # Insertar en staging por lotes (sin commit: las filas viven hasta el commit final)
+        print(f"   📦 Insertando en tabla de staging...")
         batch_size = 5000
-        
-        for i in range(0, len(datos_para_insert), batch_size):
-            batch = datos_para_insert[i:i+batch_size]
-            cursor.executemany(f"""
-                INSERT INTO {temp_table} (
-                    CALLLATE, CALLHOUR, CLID, SRC, DST, DCONTEXT, 
-                    CHANNEL, DSTCHANNEL, LASTAPP, DURATION, DISPOSITION, 
-                    UNIQUEID, CALLTYPE, LLAVE_UNICA
-                ) VALUES (
-                    TO_DATE(:1, 'YYYY-MM-DD'), :2, :3, :4, :5, :6, 
-                    :7, :8, :9, :10, :11, :12, :13, :14
-                )
-            """, batch)
-            connection.commit()
+        inicio_insert = time.time()
+        
+        with etapa('insercion_staging') as m:
+            for i in range(0, len(datos_para_insert), batch_size):
+                batch = datos_para_insert[i:i+batch_size]
+                cursor.executemany(f"""
+                    INSERT INTO {STAGING_TABLE} ({", ".join(COLUMNAS_INSERT)})
+                    VALUES ({", ".join(f":{n}" for n in range(1, len(COLUMNAS_INSERT) + 1))})
+                """, batch)
+            m['filas'] = len(datos_para_insert)
+        
+        tiempo_insert = time.time() - inicio_insert
+        filas_por_segundo = len(datos_para_insert) / tiempo_insert if tiempo_insert > 0 else 0
+        print(f"   ✅ Insertados {len(datos_para_insert):,} registros en {tiempo_insert:.2f} s "
+              f"({filas_por_segundo:,.0f} filas/s)")
         
         # Hacer MERGE
         print(f"   🔄 Ejecutando MERGE...")
         
+        # Filas del staging que ya existen en la tabla (para separar nuevas de actualizadas)
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM {STAGING_TABLE} S
+            WHERE EXISTS (SELECT 1 FROM {TABLE_NAME} T WHERE T.LLAVE_UNICA = S.LLAVE_UNICA)
+        """)
+        coincidentes = cursor.fetchone()[0]
+        
+        set_clause = ",\n                    ".join(f"T.{col} = S.{col}" for col in COLUMNAS_ACTUALIZABLES)
+        # DECODE trata NULL = NULL como igual: solo se reescriben filas que realmente cambian
+        where_cambios = ""
+        if MERGE_DETECTAR_CAMBIOS:
+            where_cambios = "WHERE " + "\n                   OR ".join(
+                f"DECODE(T.{col}, S.{col}, 0, 1) = 1" for col in COLUMNAS_ACTUALIZABLES
+            )
+        
         merge_sql = f"""
             MERGE INTO {TABLE_NAME} T
-            USING {temp_table} S
+            USING {STAGING_TABLE} S
             ON (T.LLAVE_UNICA = S.LLAVE_UNICA)
             WHEN MATCHED THEN
                 UPDATE SET 
-                    T.CALLLATE = S.CALLLATE,
-                    T.CALLHOUR = S.CALLHOUR,
-                    T.CLID = S.CLID,
-                    T.SRC = S.SRC,
-                    T.DST = S.DST,
-                    T.DCONTEXT = S.DCONTEXT,
-                    T.CHANNEL = S.CHANNEL,
-                    T.DSTCHANNEL = S.DSTCHANNEL,
-                    T.LASTAPP = S.LASTAPP,
-                    T.DURATION = S.DURATION,
-                    T.DISPOSITION = S.DISPOSITION,
-                    T.CALLTYPE = S.CALLTYPE,
+                    {set_clause},
                     T.FECHA_INSERCION = SYSTIMESTAMP
+                {where_cambios}
             WHEN NOT MATCHED THEN
-                INSERT (CALLLATE, CALLHOUR, CLID, SRC, DST, DCONTEXT, 
-                        CHANNEL, DSTCHANNEL, LASTAPP, DURATION, DISPOSITION, 
-                        UNIQUEID, CALLTYPE, LLAVE_UNICA)
-                VALUES (S.CALLLATE, S.CALLHOUR, S.CLID, S.SRC, S.DST, S.DCONTEXT,
-                        S.CHANNEL, S.DSTCHANNEL, S.LASTAPP, S.DURATION, S.DISPOSITION,
-                        S.UNIQUEID, S.CALLTYPE, S.LLAVE_UNICA)
+                INSERT ({", ".join(COLUMNAS_INSERT)})
+                VALUES ({", ".join(f"S.{col}" for col in COLUMNAS_INSERT)})
         """
         
-        cursor.execute(merge_sql)
-        connection.commit()
-        
-        # LIMPIEZA: Eliminar tabla temporal (SIEMPRE)
-        print(f"   🧹 Eliminando tabla temporal...")
-        cursor.execute(f"DROP TABLE {temp_table}")
-        connection.commit()
+        with etapa('merge') as m:
+            cursor.execute(merge_sql)
+            afectadas = cursor.rowcount
+            
+            # Único commit de la ejecución: confirma el MERGE y vacía el staging
+            connection.commit()
+            m['filas'] = afectadas
         
-        # Verificar
-        cursor.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}")
-        total = cursor.fetchone()[0]
+        nuevos = len(datos_para_insert) - coincidentes
+        conteos = {
+            'nuevos': nuevos,
+            'actualizados': afectadas - nuevos,
+            'sin_cambios': coincidentes - (afectadas - nuevos)
+        }
         
         tiempo_merge = time.time() - inicio_merge
         
         print(f"✅ ¡MERGE COMPLETADO!")
-        print(f"   📊 Total en tabla: {total:,} registros")
-        print(f"   ✨ Nuevos en esta ejecución: {len(df)}")
+        print(f"   ✨ Insertados: {conteos['nuevos']:,}")
+        print(f"   🔄 Actualizados: {conteos['actualizados']:,}")
+        print(f"   💤 Sin cambios: {conteos['sin_cambios']:,}")
         print(f"   ⏱️  Tiempo: {tiempo_merge:.2f} segundos")
         
-        return len(df)
+        return conteos
         
     except Exception as e:
         print(f"❌ Error en MERGE: {e}")
-        # INTENTAR LIMPIAR LA TABLA TEMPORAL AUNQUE HAYA ERROR
-        if cursor and temp_table:
+        # El rollback deshace el MERGE parcial y vacía el staging
+        if connection:
             try:
-                cursor.execute(f"DROP TABLE {temp_table}")
-                connection.commit()
-                print(f"   🧹 Tabla temporal eliminada después del error")
-            except:
+                connection.rollback()
+            except oracledb.Error:
                 pass
         raise e
     finally:
@@ -571,9 +633,6 @@ def main():
     print(f"🎯 INICIANDO PROCESO - ÚLTIMOS 3 DÍAS")
     print(f"{'='*60}")
     
-    # 0. LIMPIAR TABLAS TEMPORALES HUÉRFANAS (SIEMPRE AL INICIAR)
-    limpiar_tablas_temporales()
-    
     # 1. Obtener última fecha en Oracle y verificar si tiene la columna llave
     ultima_fecha, tiene_llave = obtener_ultima_fecha_oracle()
     
@@ -582,15 +641,20 @@ def main():
         crear_tabla_oracle()
         tiene_llave = True
     
-    # 3. Descargar y filtrar localmente últimos 3 días
-    datos_filtrados = descargar_ultimos_3_dias(ultima_fecha)
+    # 3. Descargar y filtrar localmente últimos 3 días (más las páginas que quedaron fallidas)
+    punto = leer_punto_control(TABLE_NAME)
+    pendiente = calldate_local(punto['calldate_pendiente']) if punto and punto['calldate_pendiente'] else None
+    datos_filtrados, info = descargar_ultimos_3_dias(ultima_fecha, pendiente)
     
-    if not datos_filtrados:
+    if datos_filtrados.empty:
         print(f"✅ No hay datos nuevos en los últimos 3 días")
+        guardar_punto_control(TABLE_NAME, info)
         return
     
     # 4. Procesar datos
-    df = procesar_datos(datos_filtrados)
+    with etapa('transformacion') as m:
+        df = procesar_datos(datos_filtrados)
+        m['filas'] = len(df)
     
     # 5. Mostrar estadísticas
     print(f"\n📊 REGISTROS A PROCESAR:")
@@ -600,10 +664,10 @@ def main():
         print(f"   • Llaves únicas: {df['LLAVE_UNICA'].nunique():,}")
     
     # 6. Hacer MERGE
-    registros_procesados = merge_express_oracle(df, tiene_llave)
+    conteos = merge_express_oracle(df, tiene_llave)
     
-    # 7. LIMPIAR TABLAS TEMPORALES NUEVAMENTE (por si acaso)
-    limpiar_tablas_temporales()
+    # 7. Punto de control (solo después del commit del MERGE)
+    guardar_punto_control(TABLE_NAME, info)
     
     # Tiempo total
     tiempo_total = time.time() - inicio_total
@@ -612,7 +676,9 @@ def main():
     
     print(f"\n{'='*60}")
     print(f"✅ ¡PROCESO COMPLETADO! 🚀")
-    print(f"   Registros nuevos: {registros_procesados}")
+    print(f"   Registros nuevos: {conteos['nuevos']:,}")
+    print(f"   Registros actualizados: {conteos['actualizados']:,}")
+    print(f"   Registros sin cambios: {conteos['sin_cambios']:,}")
     print(f"⏱️  Tiempo total: {minutos} minutos {segundos} segundos")
     print(f"{'='*60}")
 
@@ -621,4 +687,11 @@ def main():
 # ============================================================================
 
 if __name__ == "__main__":
-    main()
+    inicializar()
+    estado = 'error'
+    try:
+        main()
+        estado = 'ok'
+    finally:
+        cerrar_pool()
+        guardar_metricas('cdr_merge', estado)
@@ -5,17 +5,18 @@
 import os
 import pandas as pd
 import json
+import shutil
 import tempfile
 import time
-from sqlalchemy import create_engine, text
-from oci.object_storage import ObjectStorageClient
-from tqdm import tqdm
-import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 import sys
-
-print("=" * 80)
-print("🚀 INICIO DEL PROCESO: CDR_LLAMADAS -> NUEVO PARQUET")
-print("=" * 80)
+from conexion_oracle import crear_engine, cerrar_pool
+from metricas import guardar_metricas
+from exportar_parquet import exportar_a_parquet, exportar_particionado
+from subida_oci import (upload_to_oci_force_overwrite, huella_archivo, sin_cambios,
+                        TAMANO_PARTE_MB, PARTES_PARALELAS, VERSIONES_CONSERVAR, VERSIONES_DIAS)
+from datetime import datetime
 
 # ============================================================================
 # 📥 CONFIGURACIÓN CON VARIABLES DE ENTORNO
@@ -42,48 +43,90 @@ TABLA_CDR = "CDR_LLAMADAS"
 ARCHIVO_NUEVO = "CDR_Llamadas_Actualizado_v2.parquet"
 NOMBRE_AMIGABLE = "CDR LLAMADAS (Nuevo)"
 
-# Verificar que todas las credenciales están presentes
-credenciales_faltantes = []
-if not ORACLE_USER: credenciales_faltantes.append("ORACLE_USER")
-if not ORACLE_PASSWORD: credenciales_faltantes.append("ORACLE_PASSWORD")
-if not ORACLE_DSN: credenciales_faltantes.append("ORACLE_DSN")
-if not USER_OCID: credenciales_faltantes.append("OCI_USER_OCID")
-if not TENANCY_OCID: credenciales_faltantes.append("OCI_TENANCY_OCID")
-if not KEY_FINGERPRINT: credenciales_faltantes.append("OCI_KEY_FINGERPRINT")
-if not PRIVATE_KEY_CONTENT: credenciales_faltantes.append("OCI_PRIVATE_KEY")
-
-if credenciales_faltantes:
-    print(f"❌ Error: Faltan las siguientes credenciales: {', '.join(credenciales_faltantes)}")
-    sys.exit(1)
+# --- Modo de exportación ---
+# completo:    un solo archivo ARCHIVO_NUEVO con toda la tabla (modo histórico)
+# incremental: dataset year=/month=/day= bajo PREFIJO_DATASET, solo los días con
+#              FECHA_INSERCION posterior al watermark guardado en el bucket
+# reconstruir: reescribe todas las particiones del dataset
+PARQUET_MODO = os.environ.get('PARQUET_MODO', 'completo')
+PREFIJO_DATASET = "CDR_Llamadas_dataset"
+OBJETO_WATERMARK = f"{PREFIJO_DATASET}/_watermark.json"
+
+# --- Perfil de escritura Parquet (ver exportar_parquet.opciones_escritura) ---
+# basico: snappy como siempre | optimizado: zstd, filas ordenadas por fecha y
+# hora, índice de páginas y bloom filters en las llaves
+PARQUET_PERFIL = os.environ.get('PARQUET_PERFIL', 'basico')
+ORDEN_CDR = ('CALLLATE', 'CALLHOUR')
+# Orden total de la lectura (LLAVE_UNICA desempata fecha y hora): sin cambios en
+# la tabla sale el mismo archivo byte a byte y la huella permite omitir la subida
+ORDER_BY_CDR = 'ORDER BY CALLLATE, CALLHOUR, LLAVE_UNICA'
+BLOOM_CDR = ('UNIQUEID', 'llave_unica')
+
+# --- Subida multiparte a OCI (partes en paralelo, reintento por parte) ---
+OCI_PARTE_MB = int(os.environ.get('OCI_PARTE_MB', str(TAMANO_PARTE_MB)))
+OCI_PARTES_PARALELAS = int(os.environ.get('OCI_PARTES_PARALELAS', str(PARTES_PARALELAS)))
+
+# --- Retención de versiones en el bucket (0 y 0 = se borran todas al subir) ---
+OCI_VERSIONES_CONSERVAR = int(os.environ.get('OCI_VERSIONES_CONSERVAR', str(VERSIONES_CONSERVAR)))
+OCI_VERSIONES_DIAS = int(os.environ.get('OCI_VERSIONES_DIAS', str(VERSIONES_DIAS)))
+
+# --- Subir aunque la huella (SHA-256) del archivo coincida con la del bucket ---
+OCI_FORZAR_SUBIDA = os.environ.get('OCI_FORZAR_SUBIDA', '0') == '1'
 
 # ============================================================================
-# 🔧 CONFIGURACIÓN OCI SDK
+# 🔧 INICIALIZACIÓN: CREDENCIALES Y CLIENTE OCI
 # ============================================================================
+# Importar el módulo no imprime, no verifica credenciales ni escribe la clave:
+# todo eso lo hace inicializar() desde el bloque de ejecución.
 
 KEY_FILE_PATH = "/tmp/oci_key_cdr.pem"
 OBJECT_STORAGE_CLIENT = None
 
-try:
-    # Escribir la clave privada en un archivo temporal
-    with open(KEY_FILE_PATH, 'w') as f:
-        f.write(PRIVATE_KEY_CONTENT.strip())
+def inicializar():
+    """Verifica las credenciales y crea el cliente OCI (sale con código 1 si falta algo)"""
+    global OBJECT_STORAGE_CLIENT
+
+    print("=" * 80)
+    print("🚀 INICIO DEL PROCESO: CDR_LLAMADAS -> NUEVO PARQUET")
+    print("=" * 80)
+
+    # Verificar que todas las credenciales están presentes
+    credenciales_faltantes = []
+    if not ORACLE_USER: credenciales_faltantes.append("ORACLE_USER")
+    if not ORACLE_PASSWORD: credenciales_faltantes.append("ORACLE_PASSWORD")
+    if not ORACLE_DSN: credenciales_faltantes.append("ORACLE_DSN")
+    if not USER_OCID: credenciales_faltantes.append("OCI_USER_OCID")
+    if not TENANCY_OCID: credenciales_faltantes.append("OCI_TENANCY_OCID")
+    if not KEY_FINGERPRINT: credenciales_faltantes.append("OCI_KEY_FINGERPRINT")
+    if not PRIVATE_KEY_CONTENT: credenciales_faltantes.append("OCI_PRIVATE_KEY")
+
+    if credenciales_faltantes:
+        print(f"❌ Error: Faltan las siguientes credenciales: {', '.join(credenciales_faltantes)}")
+        sys.exit(1)
+
+    try:
+        from oci.object_storage import ObjectStorageClient
 
-    OCI_CONFIG = {
-        "user": USER_OCID,
-        "fingerprint": KEY_FINGERPRINT,
-        "key_file": KEY_FILE_PATH,
-        "tenancy": TENANCY_OCID,
-        "region": REGION
-    }
+        # Escribir la clave privada en un archivo temporal
+        with open(KEY_FILE_PATH, 'w') as f:
+            f.write(PRIVATE_KEY_CONTENT.strip())
 
-    OBJECT_STORAGE_CLIENT = ObjectStorageClient(OCI_CONFIG)
-    print("✅ Configuración OCI SDK exitosa.\n")
+        OCI_CONFIG = {
+            "user": USER_OCID,
+            "fingerprint": KEY_FINGERPRINT,
+            "key_file": KEY_FILE_PATH,
+            "tenancy": TENANCY_OCID,
+            "region": REGION
+        }
 
-except Exception as e:
-    print(f"❌ Error al configurar OCI SDK: {e}")
-    import traceback
-    traceback.print_exc()
-    sys.exit(1)
+        OBJECT_STORAGE_CLIENT = ObjectStorageClient(OCI_CONFIG)
+        print("✅ Configuración OCI SDK exitosa.\n")
+
+    except Exception as e:
+        print(f"❌ Error al configurar OCI SDK: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
 
 # ============================================================================
 # 📋 FUNCIÓN PARA DIAGNOSTICAR COLUMNAS
@@ -110,147 +153,205 @@ def diagnosticar_columnas(df):
     
     return df.columns.tolist()
 
+# ============================================================================
+# 📐 ESQUEMA DE COLUMNAS CDR
+# ============================================================================
+
+# columna: (tipo Arrow en el Parquet, relleno para nulos o inválidos)
+# - CALLLATE: timestamp real (inválidas -> 1900-01-01, como antes)
+# - CALLHOUR: hora del día (time32), calculada desde 'HH:MM:SS'
+# - columnas de pocos valores: categóricas (diccionario en el Parquet)
+# Las columnas fuera del esquema (LLAVE_UNICA, FECHA_INSERCION...) pasan igual.
+CATEGORIA = pa.dictionary(pa.int32(), pa.string())
+ESQUEMA_CDR = {
+    'CALLLATE':    (pa.timestamp('ms'), pd.Timestamp('1900-01-01')),
+    'CALLHOUR':    (pa.time32('s'), 0),
+    'CLID':        (pa.string(), ''),
+    'SRC':         (pa.string(), ''),
+    'DST':         (pa.string(), ''),
+    'DCONTEXT':    (CATEGORIA, ''),
+    'CHANNEL':     (pa.string(), ''),
+    'DSTCHANNEL':  (pa.string(), ''),
+    'LASTAPP':     (CATEGORIA, ''),
+    'DURATION':    (pa.int64(), 0),
+    'DISPOSITION': (CATEGORIA, 'DESCONOCIDO'),
+    'UNIQUEID':    (pa.string(), ''),
+    'CALLTYPE':    (CATEGORIA, 'DESCONOCIDO'),
+}
+TIPOS_CDR = {columna: tipo for columna, (tipo, _) in ESQUEMA_CDR.items()}
+
+def _segundos_del_dia(serie):
+    """'HH:MM:SS...' -> segundos desde medianoche (inválidas -> 0), vectorizado en Arrow"""
+    texto = pa.array(serie.fillna('').astype(str), type=pa.string())
+    validas = pc.match_substring_regex(texto, r'^([01]\d|2[0-3]):[0-5]\d:[0-5]\d')
+    texto = pc.if_else(validas, texto, '00:00:00')
+
+    def _campo(inicio, factor):
+        return pc.multiply(pc.cast(pc.utf8_slice_codeunits(texto, inicio, inicio + 2), pa.int32()), factor)
+
+    total = pc.add(pc.add(_campo(0, 3600), _campo(3, 60)), _campo(6, 1))
+    return pd.Series(total.to_numpy(), index=serie.index, dtype='int32')
+
 # ============================================================================
 # 🧹 FUNCIÓN DE LIMPIEZA PARA CDR
 # ============================================================================
 
-def limpiar_cdr(df):
-    """Limpieza específica para CDR"""
+def limpiar_cdr(df, mostrar=True):
+    """Limpieza específica para CDR según ESQUEMA_CDR (mostrar=False para lotes de la exportación en streaming)"""
     if df.empty:
         return df
     
     registros_iniciales = len(df)
-    print(f"\n📊 Registros iniciales: {registros_iniciales:,}")
-    
-    # Identificar columnas reales (con mayúsculas como vienen de Oracle)
-    columnas_df = df.columns.tolist()
+    if mostrar:
+        print(f"\n📊 Registros iniciales: {registros_iniciales:,}")
     
-    # Mapeo de posibles nombres
-    mapeo = {}
-    for col in columnas_df:
-        col_upper = col.upper()
-        if col_upper == 'CALLLATE':
-            mapeo[col] = 'CALLLATE'
-        elif col_upper == 'CALLHOUR':
-            mapeo[col] = 'CALLHOUR'
-        elif col_upper == 'CLID':
-            mapeo[col] = 'CLID'
-        elif col_upper == 'SRC':
-            mapeo[col] = 'SRC'
-        elif col_upper == 'DST':
-            mapeo[col] = 'DST'
-        elif col_upper == 'DCONTEXT':
-            mapeo[col] = 'DCONTEXT'
-        elif col_upper == 'CHANNEL':
-            mapeo[col] = 'CHANNEL'
-        elif col_upper == 'DSTCHANNEL':
-            mapeo[col] = 'DSTCHANNEL'
-        elif col_upper == 'LASTAPP':
-            mapeo[col] = 'LASTAPP'
-        elif col_upper == 'DURATION':
-            mapeo[col] = 'DURATION'
-        elif col_upper == 'DISPOSITION':
-            mapeo[col] = 'DISPOSITION'
-        elif col_upper == 'UNIQUEID':
-            mapeo[col] = 'UNIQUEID'
-        elif col_upper == 'CALLTYPE':
-            mapeo[col] = 'CALLTYPE'
-    
-    # Aplicar mapeo si hay columnas que renombrar
+    # Nombres del esquema en mayúsculas, vengan como vengan de Oracle
+    mapeo = {col: col.upper() for col in df.columns
+             if col.upper() in ESQUEMA_CDR and col != col.upper()}
     if mapeo:
         df = df.rename(columns=mapeo)
-        print(f"   🔄 Columnas renombradas: {len(mapeo)}")
+        if mostrar:
+            print(f"   🔄 Columnas renombradas: {len(mapeo)}")
     
-    # Limpiar cada columna según su tipo
-    if 'CLID' in df.columns:
-        df['CLID'] = df['CLID'].fillna('').astype(str)
-    if 'SRC' in df.columns:
-        df['SRC'] = df['SRC'].fillna('').astype(str)
-    if 'DST' in df.columns:
-        df['DST'] = df['DST'].fillna('').astype(str)
-    if 'DCONTEXT' in df.columns:
-        df['DCONTEXT'] = df['DCONTEXT'].fillna('').astype(str)
-    if 'CHANNEL' in df.columns:
-        df['CHANNEL'] = df['CHANNEL'].fillna('').astype(str)
-    if 'DSTCHANNEL' in df.columns:
-        df['DSTCHANNEL'] = df['DSTCHANNEL'].fillna('').astype(str)
-    if 'LASTAPP' in df.columns:
-        df['LASTAPP'] = df['LASTAPP'].fillna('').astype(str)
-    if 'DISPOSITION' in df.columns:
-        df['DISPOSITION'] = df['DISPOSITION'].fillna('DESCONOCIDO').astype(str)
-    if 'CALLTYPE' in df.columns:
-        df['CALLTYPE'] = df['CALLTYPE'].fillna('DESCONOCIDO').astype(str)
-    if 'DURATION' in df.columns:
-        df['DURATION'] = pd.to_numeric(df['DURATION'], errors='coerce').fillna(0).astype(int)
-    if 'CALLLATE' in df.columns:
-        df['CALLLATE'] = pd.to_datetime(df['CALLLATE'], errors='coerce')
-        df['CALLLATE'] = df['CALLLATE'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        df['CALLLATE'] = df['CALLLATE'].fillna('1900-01-01 00:00:00')
-    if 'CALLHOUR' in df.columns:
-        df['CALLHOUR'] = df['CALLHOUR'].astype(str).str[:8]
-        df.loc[~df['CALLHOUR'].str.match(r'\d{2}:\d{2}:\d{2}', na=False), 'CALLHOUR'] = '00:00:00'
-    if 'UNIQUEID' in df.columns:
-        df['UNIQUEID'] = df['UNIQUEID'].astype(str)
+    # Limpiar cada columna según su tipo declarado
+    for col, (tipo, relleno) in ESQUEMA_CDR.items():
+        if col not in df.columns:
+            continue
+        if pa.types.is_timestamp(tipo):
+            df[col] = pd.to_datetime(df[col], errors='coerce').fillna(relleno)
+        elif pa.types.is_time(tipo):
+            df[col] = _segundos_del_dia(df[col])
+        elif pa.types.is_integer(tipo):
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(relleno).astype('int64')
+        elif pa.types.is_dictionary(tipo):
+            df[col] = df[col].fillna(relleno).astype(str).astype('category')
+        else:
+            df[col] = df[col].fillna(relleno).astype(str)
     
-    print(f"✅ Registros después de limpieza: {len(df):,}")
+    if mostrar:
+        print(f"✅ Registros después de limpieza: {len(df):,}")
     return df
 
 # ============================================================================
-# 🗑️ FUNCIÓN PARA LIMPIAR VERSIONES ANTIGUAS
+# 🗂️ FUNCIONES PARA EL DATASET PARTICIONADO (INCREMENTAL)
 # ============================================================================
 
-def limpiar_versiones_antiguas(client, namespace, bucket_name, object_name):
-    """Elimina TODAS las versiones anteriores de un objeto"""
-    try:
-        versions = client.list_object_versions(
-            namespace_name=namespace,
-            bucket_name=bucket_name,
-            prefix=object_name
-        ).data.items
-
-        if not versions:
-            return
-
-        for version in versions:
-            try:
-                client.delete_object(
-                    namespace_name=namespace,
-                    bucket_name=bucket_name,
-                    object_name=version.name,
-                    version_id=version.version_id
-                )
-                print(f"   🗑️ Versión eliminada: {version.version_id}")
-            except:
-                pass
-    except Exception as e:
-        print(f"   ⚠️ Error limpiando versiones: {e}")
-
-# ============================================================================
-# ☁️ FUNCIÓN PARA SUBIR A OCI
-# ============================================================================
-
-def upload_to_oci_force_overwrite(client, namespace, bucket_name, object_name, file_path, pbar):
-    """Sube archivo a OCI con sobrescritura REAL"""
-    if not client:
-        return False
+def leer_watermark(client):
+    """Lee el último FECHA_INSERCION exportado (None si el dataset no existe)"""
+    from oci.exceptions import ServiceError
 
     try:
-        print(f"\n   🧹 Limpiando versiones anteriores...")
-        limpiar_versiones_antiguas(client, namespace, bucket_name, object_name)
-
-        with open(file_path, 'rb') as f:
-            client.put_object(
-                namespace_name=namespace,
-                bucket_name=bucket_name,
-                object_name=object_name,
-                put_object_body=f
+        respuesta = client.get_object(
+            namespace_name=NAMESPACE,
+            bucket_name=BUCKET_NAME,
+            object_name=OBJETO_WATERMARK
+        )
+    except ServiceError as e:
+        if e.status == 404:
+            return None
+        raise
+    estado = json.loads(respuesta.data.content.decode('utf-8'))
+    return datetime.fromisoformat(estado['fecha_insercion'])
+
+def guardar_watermark(client, watermark):
+    """Guarda el FECHA_INSERCION máximo exportado junto al dataset"""
+    client.put_object(
+        namespace_name=NAMESPACE,
+        bucket_name=BUCKET_NAME,
+        object_name=OBJETO_WATERMARK,
+        put_object_body=json.dumps({'fecha_insercion': watermark.isoformat()})
+    )
+
+def actualizar_dataset_particionado(engine, reconstruir=False):
+    """Reescribe y sube solo las particiones de los días con filas nuevas o cambiadas"""
+    from sqlalchemy import text
+    from tqdm import tqdm
+
+    watermark = None if reconstruir else leer_watermark(OBJECT_STORAGE_CLIENT)
+
+    # El watermark nuevo se toma ANTES de exportar: lo que entre durante la
+    # exportación se vuelve a considerar en la próxima ejecución
+    with engine.connect() as conn:
+        nuevo_watermark = conn.execute(
+            text(f'SELECT MAX(FECHA_INSERCION) FROM "{TABLA_CDR}"')
+        ).scalar()
+
+    if watermark is None:
+        print(f"🗂️ Reconstruyendo todas las particiones de {PREFIJO_DATASET}/")
+        sql = f'SELECT * FROM "{TABLA_CDR}" {ORDER_BY_CDR}'
+        parametros = None
+    else:
+        print(f"🗂️ Watermark FECHA_INSERCION: {watermark}")
+        if nuevo_watermark is None or nuevo_watermark <= watermark:
+            print("✅ No hay filas nuevas ni cambiadas: no se reescribe ninguna partición")
+            return 0
+        sql = f"""
+            SELECT * FROM "{TABLA_CDR}"
+            WHERE TRUNC(CALLLATE) IN (
+                SELECT DISTINCT TRUNC(CALLLATE) FROM "{TABLA_CDR}"
+                WHERE FECHA_INSERCION > :1
             )
+            {ORDER_BY_CDR}
+        """
+        parametros = [watermark]
 
-        return True
+    directorio = tempfile.mkdtemp(prefix="cdr_dataset_")
+    try:
+        resultado = exportar_particionado(
+            sql,
+            directorio,
+            'calllate',
+            transformar=lambda df_lote: limpiar_cdr(df_lote, mostrar=False),
+            parametros=parametros,
+            tipos=TIPOS_CDR,
+            perfil=PARQUET_PERFIL,
+            orden=ORDEN_CDR,
+            bloom=BLOOM_CDR
+        )
+        particiones = resultado['particiones']
+        print(f"✅ {resultado['filas']:,} registros en {len(particiones)} particiones "
+              f"({resultado['tiempo']:.2f} segundos)")
+
+        fallidas = 0
+        omitidas = 0
+        with tqdm(total=len(particiones), desc="Subiendo particiones", ncols=80) as pbar:
+            for relativa in particiones:
+                objeto = f"{PREFIJO_DATASET}/{relativa}"
+                ruta = os.path.join(directorio, relativa)
+                huella = huella_archivo(ruta)
+                if not OCI_FORZAR_SUBIDA and sin_cambios(OBJECT_STORAGE_CLIENT, NAMESPACE,
+                                                         BUCKET_NAME, objeto, huella):
+                    omitidas += 1
+                elif not upload_to_oci_force_overwrite(
+                    client=OBJECT_STORAGE_CLIENT,
+                    namespace=NAMESPACE,
+                    bucket_name=BUCKET_NAME,
+                    object_name=objeto,
+                    file_path=ruta,
+                    tamano_parte_mb=OCI_PARTE_MB,
+                    partes_paralelas=OCI_PARTES_PARALELAS,
+                    conservar=OCI_VERSIONES_CONSERVAR,
+                    dias=OCI_VERSIONES_DIAS,
+                    mostrar_progreso=False,
+                    huella=huella
+                ):
+                    fallidas += 1
+                pbar.update(1)
+
+        if omitidas:
+            print(f"⏭️ {omitidas} particiones sin cambios (misma huella): no se subieron")
+
+        # Solo se avanza el watermark si todas las particiones subieron
+        if fallidas:
+            print(f"❌ {fallidas} particiones no se subieron: el watermark no avanza")
+        elif nuevo_watermark is not None:
+            guardar_watermark(OBJECT_STORAGE_CLIENT, nuevo_watermark)
+            print(f"✅ Watermark actualizado: {nuevo_watermark}")
+
+        return len(particiones) - fallidas - omitidas
 
-    except Exception as e:
-        print(f"\n❌ Error al subir: {e}")
-        return False
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
 
 # ============================================================================
 # 🎯 FUNCIÓN PRINCIPAL
@@ -258,24 +359,24 @@ def upload_to_oci_force_overwrite(client, namespace, bucket_name, object_name, f
 
 def main():
     inicio_total = time.time()
+    estado = 'ok'
     
+    from sqlalchemy import text
+
     if not OBJECT_STORAGE_CLIENT:
         print("❌ No se puede continuar sin OCI.")
         return
 
     print(f"\n{'='*60}")
     print(f"🎯 PROCESANDO: {NOMBRE_AMIGABLE}")
-    print(f"📁 Archivo destino: {ARCHIVO_NUEVO}")
+    print(f"📁 Archivo destino: {ARCHIVO_NUEVO if PARQUET_MODO == 'completo' else PREFIJO_DATASET + '/'}")
+    print(f"⚙️ Modo: {PARQUET_MODO} | Perfil Parquet: {PARQUET_PERFIL}")
     print(f"{'='*60}\n")
 
     try:
         # 1. Conectar a Oracle
         print("🔌 Conectando a Oracle...")
-        engine = create_engine(
-            f"oracle+oracledb://{ORACLE_USER}:{ORACLE_PASSWORD}@{ORACLE_DSN}",
-            arraysize=5000,  # Optimizado para lectura masiva
-            max_identifier_length=128
-        )
+        engine = crear_engine()
         
         # Probar conexión
         with engine.connect() as conn:
@@ -288,84 +389,99 @@ def main():
             total_registros = result.scalar()
             print(f"📊 Total en BD: {total_registros:,} registros")
 
-        # 3. Leer TODOS los datos
-        print(f"\n📚 Leyendo datos de {TABLA_CDR}...")
-        inicio_lectura = time.time()
-        
-        # Leer todo de una vez
-        df = pd.read_sql(f'SELECT * FROM "{TABLA_CDR}"', engine)
-        
-        tiempo_lectura = time.time() - inicio_lectura
-        registros_leidos = len(df)
-        
-        print(f"✅ Leídos {registros_leidos:,} registros en {tiempo_lectura:.2f} segundos")
-
-        # 4. Verificar integridad
-        if registros_leidos != total_registros:
-            print(f"⚠️ ALERTA: Leídos {registros_leidos:,} vs {total_registros:,} en BD")
-        else:
-            print(f"✅ Integridad verificada: 100% de los registros")
-
-        if df.empty:
-            print("❌ La tabla está vacía")
+        # 2b. Modo dataset particionado: solo las particiones que cambiaron
+        if PARQUET_MODO in ('incremental', 'reconstruir'):
+            subidas = actualizar_dataset_particionado(engine, reconstruir=PARQUET_MODO == 'reconstruir')
+            tiempo_total = time.time() - inicio_total
+            print(f"\n{'='*60}")
+            print(f"✅ DATASET ACTUALIZADO ({PARQUET_MODO}): {subidas} particiones subidas")
+            print(f"⏱️  Tiempo total: {int(tiempo_total // 60)} minutos {int(tiempo_total % 60)} segundos")
+            print(f"📁 Prefijo: {PREFIJO_DATASET}/")
+            print(f"{'='*60}")
             return
 
-        # 5. Diagnosticar columnas
-        diagnosticar_columnas(df)
-
-        # 6. Limpiar datos
-        print(f"\n🧹 Limpiando datos...")
-        df = limpiar_cdr(df)
-
-        # 7. Crear archivo temporal
+        # 3. Crear archivo temporal
         with tempfile.NamedTemporaryFile(suffix=".parquet", delete=False) as tmp:
             ruta_temporal = tmp.name
 
-        # 8. Guardar como Parquet
-        print(f"\n💾 Guardando como Parquet...")
+        # 4. Leer, limpiar y guardar como Parquet en streaming (lote a lote)
+        print(f"\n📚 Exportando {TABLA_CDR} a Parquet por lotes...")
         inicio_parquet = time.time()
-        
-        # Optimizaciones para Parquet
-        df.to_parquet(
-            ruta_temporal, 
-            index=False, 
-            engine='pyarrow', 
+
+        def _diagnosticar(df_lote):
+            diagnosticar_columnas(df_lote)
+            print(f"\n🧹 Limpiando datos por lotes...")
+
+        # Siempre ordenado: la huella necesita el mismo orden en cada ejecución
+        # y el perfil optimizado declara las filas ordenadas por fecha y hora
+        sql_export = f'SELECT * FROM "{TABLA_CDR}" {ORDER_BY_CDR}'
+
+        resultado_export = exportar_a_parquet(
+            sql_export,
+            ruta_temporal,
+            transformar=lambda df_lote: limpiar_cdr(df_lote, mostrar=False),
+            al_primer_lote=_diagnosticar,
+            tipos=TIPOS_CDR,
             compression='snappy',
-            row_group_size=100000  # Optimizado para 300k+ registros
+            row_group_size=100000,  # Optimizado para 300k+ registros
+            perfil=PARQUET_PERFIL,
+            orden=ORDEN_CDR,
+            bloom=BLOOM_CDR
         )
-        
+
         tiempo_parquet = time.time() - inicio_parquet
+        registros_leidos = resultado_export['filas']
+
+        print(f"✅ Leídos {registros_leidos:,} registros en {resultado_export['tiempo_lectura']:.2f} segundos")
+
+        # 5. Verificar integridad
+        if registros_leidos != total_registros:
+            print(f"⚠️ ALERTA: Leídos {registros_leidos:,} vs {total_registros:,} en BD")
+        else:
+            print(f"✅ Integridad verificada: 100% de los registros")
+
+        if registros_leidos == 0:
+            print("❌ La tabla está vacía")
+            os.remove(ruta_temporal)
+            return
+
         tamaño_mb = os.path.getsize(ruta_temporal) / (1024 * 1024)
         
         print(f"✅ Archivo creado: {tamaño_mb:.2f} MB")
-        print(f"⏱️  Tiempo de compresión: {tiempo_parquet:.2f} segundos")
-
-        # 9. Subir a OCI con barra de progreso
-        print(f"\n☁️ Subiendo a OCI bucket '{BUCKET_NAME}'...")
-        
-        with tqdm(total=100, desc="Subiendo", unit="%", ncols=80) as pbar:
-            pbar.update(10)
-            
+        print(f"⏱️  Tiempo de limpieza y compresión: {resultado_export['tiempo_escritura']:.2f} segundos")
+        print(f"⏱️  Tiempo total de exportación: {tiempo_parquet:.2f} segundos")
+
+        # 6. Subir a OCI con barra de progreso (se omite si el contenido no cambió)
+        huella = huella_archivo(ruta_temporal)
+        if not OCI_FORZAR_SUBIDA and sin_cambios(OBJECT_STORAGE_CLIENT, NAMESPACE, BUCKET_NAME,
+                                                 ARCHIVO_NUEVO, huella):
+            resultado = None
+            print(f"\n⏭️ {ARCHIVO_NUEVO} no cambió desde la última subida (huella {huella[:12]}...)")
+            print(f"   Se omiten la limpieza de versiones y la subida")
+        else:
+            print(f"\n☁️ Subiendo a OCI bucket '{BUCKET_NAME}'...")
             resultado = upload_to_oci_force_overwrite(
                 client=OBJECT_STORAGE_CLIENT,
                 namespace=NAMESPACE,
                 bucket_name=BUCKET_NAME,
                 object_name=ARCHIVO_NUEVO,
                 file_path=ruta_temporal,
-                pbar=pbar
+                tamano_parte_mb=OCI_PARTE_MB,
+                partes_paralelas=OCI_PARTES_PARALELAS,
+                conservar=OCI_VERSIONES_CONSERVAR,
+                dias=OCI_VERSIONES_DIAS,
+                huella=huella
             )
-            
-            pbar.update(90)
 
         if resultado:
             print(f"\n✅ Archivo subido exitosamente!")
             print(f"   📁 {ARCHIVO_NUEVO}")
             print(f"   📦 {tamaño_mb:.2f} MB")
-            print(f"   📊 {len(df):,} registros")
-        else:
+            print(f"   📊 {registros_leidos:,} registros")
+        elif resultado is False:
             print(f"\n❌ Error al subir el archivo")
 
-        # 10. Limpiar archivo temporal
+        # 7. Limpiar archivo temporal
         if os.path.exists(ruta_temporal):
             os.remove(ruta_temporal)
             print(f"\n🧹 Archivo temporal eliminado.")
@@ -382,19 +498,23 @@ def main():
         print(f"{'='*60}")
 
     except Exception as e:
+        estado = 'error'
         print(f"\n❌ Error general: {e}")
         import traceback
         traceback.print_exc()
         sys.exit(1)
 
     finally:
+        cerrar_pool()
         if os.path.exists(KEY_FILE_PATH):
             os.remove(KEY_FILE_PATH)
             print("🧹 Clave privada eliminada.")
+        guardar_metricas('cdr_to_parquet', estado)
 
 # ============================================================================
 # 🏃 EJECUTAR
 # ============================================================================
 
 if __name__ == "__main__":
+    inicializar()
     main()
@@ -0,0 +1,89 @@
+# ============================================================================
+# SCRIPT: COMPARAR PERFILES DE ESCRITURA PARQUET (TAMAÑO Y LECTURA)
+# ============================================================================
+# Uso: python scripts/comparar_perfiles_parquet.py CDR_Llamadas_Actualizado_v2.parquet
+#
+# Reescribe un Parquet de CDR con cada perfil de exportar_parquet y mide:
+# tamaño, tiempo de escritura, lectura completa, lectura de un rango de
+# fechas (poda por estadísticas de row group) y búsqueda puntual por UNIQUEID.
+
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from exportar_parquet import PERFILES, opciones_escritura
+
+ORDEN = ('CALLLATE', 'CALLHOUR')
+BLOOM = ('UNIQUEID', 'llave_unica')
+ROW_GROUP_SIZE = 100000
+DIAS_RANGO = 7
+REPETICIONES = 3
+
+def _medir(funcion):
+    """Mejor tiempo de REPETICIONES ejecuciones"""
+    mejor = None
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        funcion()
+        transcurrido = time.perf_counter() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor
+
+def escribir_con_perfil(tabla, ruta, perfil):
+    """Escribe tabla con el perfil (ordenada si el perfil declara orden)"""
+    orden = [c for c in ORDEN if c in tabla.column_names]
+    if perfil == 'optimizado' and orden:
+        tabla = tabla.sort_by([(c, 'ascending') for c in orden])
+    opciones = opciones_escritura(tabla.schema, perfil, orden=orden, bloom=BLOOM,
+                                  row_group_size=ROW_GROUP_SIZE)
+    with pq.ParquetWriter(ruta, tabla.schema, **opciones) as writer:
+        writer.write_table(tabla, row_group_size=ROW_GROUP_SIZE)
+
+def comparar(ruta_origen):
+    """Imprime la comparación de todos los perfiles sobre el mismo archivo"""
+    tabla = pq.read_table(ruta_origen)
+    print(f"📂 {ruta_origen}: {tabla.num_rows:,} registros, {tabla.num_columns} columnas\n")
+
+    # Filtros de prueba: últimos DIAS_RANGO días y un UNIQUEID del medio
+    filtro_rango = None
+    if 'CALLLATE' in tabla.column_names:
+        maxima = pc.max(tabla['CALLLATE']).as_py()
+        if maxima is not None:
+            filtro_rango = [('CALLLATE', '>=', maxima - timedelta(days=DIAS_RANGO))]
+    filtro_llave = None
+    if 'UNIQUEID' in tabla.column_names and tabla.num_rows:
+        filtro_llave = [('UNIQUEID', '=', tabla['UNIQUEID'][tabla.num_rows // 2].as_py())]
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio:
+        for perfil in PERFILES:
+            ruta = os.path.join(directorio, f"{perfil}.parquet")
+            escritura = _medir(lambda: escribir_con_perfil(tabla, ruta, perfil))
+            fila = {
+                'perfil': perfil,
+                'mb': os.path.getsize(ruta) / (1024 * 1024),
+                'escritura': escritura,
+                'lectura': _medir(lambda: pq.read_table(ruta)),
+                'rango': _medir(lambda: pq.read_table(ruta, filters=filtro_rango)) if filtro_rango else None,
+                'puntual': _medir(lambda: pq.read_table(ruta, filters=filtro_llave)) if filtro_llave else None,
+            }
+            resultados.append(fila)
+
+    def _seg(valor):
+        return f"{valor:8.3f}s" if valor is not None else "       -"
+
+    print(f"{'perfil':<12}{'tamaño':>10}{'escritura':>11}{'lectura':>10}{'rango':>10}{'puntual':>10}")
+    for fila in resultados:
+        print(f"{fila['perfil']:<12}{fila['mb']:>8.2f}MB{_seg(fila['escritura']):>11}"
+              f"{_seg(fila['lectura']):>10}{_seg(fila['rango']):>10}{_seg(fila['puntual']):>10}")
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python scripts/comparar_perfiles_parquet.py archivo.parquet")
+        sys.exit(1)
+    comparar(sys.argv[1])
@@ -0,0 +1,61 @@
+# ============================================================================
+# 🔌 POOL DE CONEXIONES ORACLE COMPARTIDO
+# ============================================================================
+# Todas las etapas de un script toman sus conexiones del mismo pool:
+# un solo handshake contra el DSN y el ajuste de sesión en un solo lugar.
+
+import os
+
+# --- Ajuste de sesión (aplica a todos los cursores) ---
+ARRAYSIZE = 5000        # filas por viaje en fetch
+PREFETCHROWS = 5000     # filas que llegan junto con el execute
+STMTCACHESIZE = 40      # sentencias preparadas en caché por conexión
+
+# --- Tamaño del pool ---
+POOL_MIN = 1
+POOL_MAX = 4
+
+_POOL = None
+
+def obtener_pool():
+    """Crea el pool la primera vez que se pide (credenciales ORACLE_* del entorno)"""
+    global _POOL
+    if _POOL is None:
+        import oracledb
+
+        oracledb.defaults.arraysize = ARRAYSIZE
+        oracledb.defaults.prefetchrows = PREFETCHROWS
+        oracledb.defaults.stmtcachesize = STMTCACHESIZE
+        _POOL = oracledb.create_pool(
+            user=os.environ.get('ORACLE_USER'),
+            password=os.environ.get('ORACLE_PASSWORD'),
+            dsn=os.environ.get('ORACLE_DSN'),
+            min=POOL_MIN,
+            max=POOL_MAX,
+            increment=1
+        )
+    return _POOL
+
+def conectar():
+    """Toma una conexión del pool; connection.close() la devuelve al pool"""
+    return obtener_pool().acquire()
+
+def crear_engine():
+    """Engine SQLAlchemy que reutiliza las conexiones del pool"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import NullPool
+
+    return create_engine(
+        "oracle+oracledb://",
+        creator=conectar,
+        poolclass=NullPool,
+        arraysize=ARRAYSIZE,
+        max_identifier_length=128
+    )
+
+def cerrar_pool():
+    """Cierra el pool al terminar el script"""
+    global _POOL
+    if _POOL is not None:
+        _POOL.close(force=True)
+        _POOL = None
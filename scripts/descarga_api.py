@@ -0,0 +1,572 @@
+# ============================================================================
+# 📡 DESCARGA CONCURRENTE DE PÁGINAS - API /api/integration/cdr/all
+# ============================================================================
+# Compartido por cdr_merge.py y merge_oikost_crudo.py
+#
+# Cada página se decodifica con orjson (json de la librería estándar si no
+# está instalado) y sus registros se pasan a columnas: {campo: [valores]}.
+# pd.DataFrame arma las columnas directo de ahí, sin recorrer un dict por
+# registro. La respuesta se pide comprimida (gzip, o br si está brotli).
+
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+from urllib3.util.request import ACCEPT_ENCODING
+
+try:
+    import orjson
+except ImportError:  # sin orjson: json de la librería estándar
+    orjson = None
+
+from metricas import etapa
+
+WORKERS_DEFECTO = 8
+MAX_RPS_DEFECTO = 10.0
+
+# --- Reintentos por página (espera exponencial: 1 s, 2 s, 4 s... con tope) ---
+REINTENTOS_DEFECTO = 3
+ESPERA_BASE_S = 1.0
+ESPERA_MAXIMA_S = 30.0
+# Respuestas que se reintentan; cualquier otro código falla al primer intento
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+# --- Control adaptativo (AIMD) del ritmo y la concurrencia ---
+FACTOR_TOPE_RPS = 4.0        # el ritmo sube hasta FACTOR_TOPE_RPS × max_rps
+AUMENTO_RPS = 0.25           # suba por ventana sana, como fracción de max_rps
+FACTOR_RECORTE = 0.5         # recorte multiplicativo ante saturación
+RPS_MINIMO = 0.5
+FACTOR_LATENCIA = 2.0        # latencia (suavizada) sobre la mejor vista que cuenta como saturación
+ALFA_LATENCIA = 0.2          # peso de cada muestra en la latencia suavizada
+
+# ============================================================================
+# 🚦 CONTROL DE RITMO Y CONCURRENCIA (AIMD)
+# ============================================================================
+
+class ControladorTasa:
+    """
+    Ritmo (peticiones/s) y concurrencia compartidos por todos los hilos.
+
+    En modo adaptativo arranca con max_rps y la mitad de los workers. Tras
+    cada ventana sana (tantas respuestas 200 como la concurrencia actual)
+    suma AUMENTO_RPS × max_rps al ritmo y un hilo a la concurrencia, hasta
+    los topes. Un 429, un 5xx, un error de conexión o una latencia
+    suavizada FACTOR_LATENCIA veces peor que la mejor vista los recortan a
+    la mitad; las respuestas que ya estaban en vuelo al recortar no vuelven
+    a recortar. Con adaptativo=False es un límite fijo de max_rps con todos
+    los workers. max_rps 0 = sin límite de ritmo (solo se adapta la
+    concurrencia).
+    """
+
+    def __init__(self, max_rps, workers=WORKERS_DEFECTO, adaptativo=True, tope_rps=None):
+        self.adaptativo = adaptativo
+        self.rps_inicial = self.rps = max_rps if max_rps and max_rps > 0 else 0.0
+        self.tope_rps = tope_rps or self.rps * FACTOR_TOPE_RPS
+        self.tope_concurrencia = max(workers, 1)
+        self.concurrencia = max(self.tope_concurrencia // 2, 1) if adaptativo else self.tope_concurrencia
+        self.latencia = None
+        self.mejor_latencia = None
+        self.contadores = {'peticiones': 0, 'aumentos': 0, 'recortes': 0,
+                           '429': 0, '5xx': 0, 'errores': 0}
+        self._cond = threading.Condition()
+        self._en_vuelo = 0
+        self._siguiente = time.monotonic()
+        self._sanas = 0
+        self._sin_recorte = 0
+        self._rps_max = self.rps
+        self._concurrencia_max = self.concurrencia
+
+    def describir(self):
+        """Configuración elegida, para la salida de la ejecución"""
+        ritmo = f"{self.rps:g} peticiones/s" if self.rps else "sin límite de ritmo"
+        if not self.adaptativo:
+            return f"fijo: {ritmo}, {self.concurrencia} en paralelo"
+        tope = f"{self.tope_rps:g}/s" if self.rps else "sin límite"
+        return (f"adaptativo: {ritmo} (tope {tope}), {self.concurrencia} en paralelo "
+                f"(tope {self.tope_concurrencia})")
+
+    def esperar(self):
+        """Toma un lugar de la concurrencia y espera el turno que da el ritmo actual"""
+        with self._cond:
+            while self._en_vuelo >= self.concurrencia:
+                self._cond.wait()
+            self._en_vuelo += 1
+            ahora = time.monotonic()
+            turno = max(ahora, self._siguiente)
+            self._siguiente = turno + (1.0 / self.rps if self.rps else 0.0)
+        espera = turno - ahora
+        if espera > 0:
+            time.sleep(espera)
+
+    def pausar(self, segundos):
+        """Ningún hilo empieza otra petición en los próximos segundos (Retry-After)"""
+        with self._cond:
+            self._siguiente = max(self._siguiente, time.monotonic() + segundos)
+
+    def registrar(self, latencia, codigo):
+        """Libera el lugar tomado en esperar() y ajusta con la respuesta (codigo None = error de conexión)"""
+        with self._cond:
+            self._en_vuelo -= 1
+            self.contadores['peticiones'] += 1
+            saturada = codigo is None or codigo == 429 or codigo >= 500
+            if codigo is None:
+                self.contadores['errores'] += 1
+            elif codigo == 429:
+                self.contadores['429'] += 1
+            elif codigo >= 500:
+                self.contadores['5xx'] += 1
+            elif codigo == 200:
+                self.latencia = latencia if self.latencia is None else (
+                    ALFA_LATENCIA * latencia + (1 - ALFA_LATENCIA) * self.latencia)
+                if self.mejor_latencia is None or self.latencia < self.mejor_latencia:
+                    self.mejor_latencia = self.latencia
+                saturada = self.latencia > FACTOR_LATENCIA * self.mejor_latencia
+
+            if self.adaptativo:
+                if self._sin_recorte > 0:
+                    self._sin_recorte -= 1
+                elif saturada:
+                    self._recortar()
+                elif codigo == 200:
+                    self._sanas += 1
+                    if self._sanas >= self.concurrencia:
+                        self._aumentar()
+            self._cond.notify_all()
+
+    def _aumentar(self):
+        self._sanas = 0
+        if self.rps and self.rps < self.tope_rps:
+            self.rps = min(self.rps + AUMENTO_RPS * self.rps_inicial, self.tope_rps)
+        if self.concurrencia < self.tope_concurrencia:
+            self.concurrencia += 1
+        self.contadores['aumentos'] += 1
+        self._rps_max = max(self._rps_max, self.rps)
+        self._concurrencia_max = max(self._concurrencia_max, self.concurrencia)
+
+    def _recortar(self):
+        self._sanas = 0
+        # Las que siguen en vuelo salieron con el ritmo anterior: no cuentan para otro recorte
+        self._sin_recorte = self._en_vuelo
+        if self.rps:
+            self.rps = max(self.rps * FACTOR_RECORTE, RPS_MINIMO)
+        self.concurrencia = max(int(self.concurrencia * FACTOR_RECORTE), 1)
+        self.contadores['recortes'] += 1
+
+    def resumen(self):
+        """Estado final y contadores de la descarga"""
+        with self._cond:
+            return dict(
+                self.contadores,
+                adaptativo=self.adaptativo,
+                rps_inicial=self.rps_inicial,
+                rps_final=self.rps,
+                rps_max=self._rps_max,
+                concurrencia_final=self.concurrencia,
+                concurrencia_max=self._concurrencia_max,
+                latencia_ms=self.latencia * 1000 if self.latencia is not None else None,
+                mejor_latencia_ms=self.mejor_latencia * 1000 if self.mejor_latencia is not None else None,
+            )
+
+# ============================================================================
+# 🔌 SESIÓN CON POOL DE CONEXIONES
+# ============================================================================
+
+def crear_sesion(headers, workers=WORKERS_DEFECTO):
+    """Crea una sesión requests con un pool de conexiones del tamaño de los workers"""
+    session = requests.Session()
+    session.verify = False
+    # gzip/deflate siempre; br y zstd si están instalados brotli o zstandard
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    session.headers.update(headers)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(workers, 1))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+# ============================================================================
+# 🧮 DECODIFICACIÓN A COLUMNAS
+# ============================================================================
+
+def decodificar(contenido):
+    """JSON de la respuesta (bytes) con orjson si está disponible"""
+    if orjson is not None:
+        return orjson.loads(contenido)
+    return json.loads(contenido)
+
+def a_columnas(registros):
+    """
+    Lista de registros -> {campo: [valores]} en el orden de campos del
+    primero. Si algún registro trae otros campos se usa la unión y los
+    que faltan quedan en None (lo mismo que hace pd.DataFrame).
+    """
+    if not registros:
+        return {}
+    campos = list(registros[0])
+    # Mismo largo y todos los campos del primero: mismos campos en todos
+    if all(len(r) == len(campos) for r in registros):
+        try:
+            return {campo: [r[campo] for r in registros] for campo in campos}
+        except KeyError:
+            pass
+    campos = list(dict.fromkeys(campo for r in registros for campo in r))
+    return {campo: [r.get(campo) for r in registros] for campo in campos}
+
+def contar_filas(columnas):
+    """Número de registros de una página en columnas"""
+    return len(next(iter(columnas.values()), []))
+
+# ============================================================================
+# 📨 PETICIÓN DE UNA PÁGINA CON REINTENTOS
+# ============================================================================
+
+def espera_reintento(intento, espera_base=ESPERA_BASE_S, retry_after=None):
+    """Segundos antes del reintento número intento (Retry-After manda si viene)"""
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), ESPERA_MAXIMA_S)
+    except ValueError:
+        pass
+    espera = min(espera_base * 2 ** (intento - 1), ESPERA_MAXIMA_S)
+    # Jitter: los hilos que fallaron juntos no reintentan todos a la vez
+    return espera * random.uniform(0.5, 1.0)
+
+def pedir_pagina(session, api_url, pagina, timeout=30, limitador=None,
+                 reintentos=0, espera_base=ESPERA_BASE_S):
+    """
+    Pide una página y devuelve (JSON, intentos); el JSON es None si falla.
+    Los registros de 'data' vienen en columnas (ver a_columnas).
+
+    Los errores de conexión, timeouts y CODIGOS_REINTENTABLES se reintentan
+    hasta reintentos veces con espera exponencial; otro código distinto de
+    200 falla de inmediato. Cada intento pasa por el ControladorTasa
+    (limitador) y le informa su latencia y código.
+    """
+    intento = 0
+    while True:
+        intento += 1
+        if limitador:
+            limitador.esperar()
+        inicio = time.monotonic()
+        response = None
+        try:
+            response = session.get(f"{api_url}?page={pagina}", timeout=timeout)
+            codigo = response.status_code
+        except requests.RequestException as e:
+            codigo = None
+            error = f"Error ({type(e).__name__})"
+        finally:
+            if limitador:
+                limitador.registrar(time.monotonic() - inicio, codigo if response is not None else None)
+        if codigo == 200:
+            break
+        retry_after = None
+        if response is not None:
+            error = f"Error {codigo}"
+            retry_after = response.headers.get('Retry-After')
+        if (codigo is not None and codigo not in CODIGOS_REINTENTABLES) or intento > reintentos:
+            print(f"❌ {error} en página {pagina} (intento {intento})")
+            return None, intento
+        espera = espera_reintento(intento, espera_base, retry_after)
+        if limitador and codigo == 429:
+            limitador.pausar(espera)
+        time.sleep(espera)
+
+    with etapa('parseo') as m:
+        datos = decodificar(response.content)
+        m['bytes'] = len(response.content)
+        if isinstance(datos, dict):
+            registros = datos.get('data') or []
+            datos['data'] = a_columnas(registros)
+            m['filas'] = len(registros)
+    return datos, intento
+
+def clave_uniqueid(uniqueid):
+    """Orden numérico de un uniqueid de Asterisk ('1700000000.123')"""
+    try:
+        return tuple(int(parte) for parte in str(uniqueid).split('.'))
+    except ValueError:
+        return (0,)
+
+def resumir_pagina(columnas, intentos=1):
+    """Estado OK de una página con su rango de calldate (crudo) y el uniqueid más alto"""
+    calldates = [v for v in columnas.get('calldate', []) if v]
+    uniqueids = [v for v in columnas.get('uniqueid', []) if v]
+    return {
+        'estado': 'OK',
+        'intentos': intentos,
+        'registros': contar_filas(columnas),
+        'calldate_min': min(calldates) if calldates else None,
+        'calldate_max': max(calldates) if calldates else None,
+        'uniqueid_max': str(max(uniqueids, key=clave_uniqueid)) if uniqueids else None,
+    }
+
+# ============================================================================
+# 🔎 BÚSQUEDA DE LA PÁGINA LÍMITE (PÁGINAS ORDENADAS POR CALLDATE)
+# ============================================================================
+
+# Páginas extra a cada lado del límite por si llegan llamadas nuevas durante la descarga
+MARGEN_PAGINAS = 1
+
+def _describir_pagina(columnas, a_fecha):
+    """Devuelve (mínima, máxima, ascendente, descendente) de los calldate de una página"""
+    fechas = [a_fecha(valor) for valor in columnas.get('calldate', [])]
+    fechas = [f for f in fechas if f is not None]
+    if not fechas:
+        return None
+    pares = list(zip(fechas, fechas[1:]))
+    return (
+        min(fechas),
+        max(fechas),
+        all(a <= b for a, b in pares),
+        all(a >= b for a, b in pares)
+    )
+
+def _sondeos_consistentes(sondeos, ascendente):
+    """Comprueba que las páginas sondeadas respetan el orden supuesto"""
+    anterior = None
+    for pagina in sorted(sondeos):
+        minima, maxima, asc, desc = sondeos[pagina]
+        if not (asc if ascendente else desc):
+            return False
+        if anterior is not None:
+            if ascendente and anterior[1] > minima:
+                return False
+            if not ascendente and anterior[0] < maxima:
+                return False
+        anterior = (minima, maxima)
+    return True
+
+def _orden(primera, ultima):
+    """Orden de las páginas según la descripción de la primera y la última (o None)"""
+    if primera is None or ultima is None:
+        return None
+    if primera[1] <= ultima[0] and primera[0] < ultima[1]:
+        return 'ascendente'
+    if primera[0] >= ultima[1] and primera[1] > ultima[0]:
+        return 'descendente'
+    return None
+
+def detectar_orden(obtener, total_paginas, a_fecha):
+    """'ascendente' o 'descendente' según los calldate de la primera y la última página (None si no se sabe)"""
+    if total_paginas < 2:
+        return None
+    try:
+        return _orden(_describir_pagina(obtener(1) or {}, a_fecha),
+                      _describir_pagina(obtener(total_paginas) or {}, a_fecha))
+    except (ValueError, TypeError, requests.RequestException):
+        return None
+
+def buscar_rango_paginas(obtener, total_paginas, fecha_limite, a_fecha):
+    """
+    Busca por bisección las páginas con calldate >= fecha_limite.
+
+    obtener(pagina) devuelve las columnas de la página o None si falla.
+    a_fecha(valor) convierte un calldate crudo en fecha comparable (o None).
+    Devuelve (range de páginas, orden, sondeos) o None si el orden por
+    calldate no se cumple y hay que hacer la descarga completa.
+    """
+    if total_paginas < 2:
+        return None
+
+    sondeos = {}
+
+    def sondear(pagina):
+        if pagina not in sondeos:
+            columnas = obtener(pagina)
+            descripcion = _describir_pagina(columnas, a_fecha) if columnas else None
+            if descripcion is None:
+                raise ValueError(f"página {pagina} sin fechas válidas")
+            sondeos[pagina] = descripcion
+            if not _sondeos_consistentes(sondeos, ascendente):
+                raise ValueError(f"página {pagina} fuera de orden")
+        return sondeos[pagina]
+
+    try:
+        primera = _describir_pagina(obtener(1) or {}, a_fecha)
+        ultima = _describir_pagina(obtener(total_paginas) or {}, a_fecha)
+        orden = _orden(primera, ultima)
+        if orden is None:
+            return None
+        ascendente = orden == 'ascendente'
+        sondeos[1] = primera
+        sondeos[total_paginas] = ultima
+        if not _sondeos_consistentes(sondeos, ascendente):
+            return None
+
+        def contiene(pagina):
+            return sondear(pagina)[1] >= fecha_limite
+
+        if ascendente:
+            # Primera página cuya fecha máxima alcanza el límite
+            if not contiene(total_paginas):
+                return range(total_paginas, total_paginas + 1), 'ascendente', len(sondeos)
+            lo, hi = 1, total_paginas
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if contiene(mid):
+                    hi = mid
+                else:
+                    lo = mid + 1
+            inicio = max(1, lo - MARGEN_PAGINAS)
+            return range(inicio, total_paginas + 1), 'ascendente', len(sondeos)
+
+        # Descendente: última página cuya fecha máxima alcanza el límite
+        if not contiene(1):
+            return range(1, 2), 'descendente', len(sondeos)
+        lo, hi = 1, total_paginas
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if contiene(mid):
+                lo = mid
+            else:
+                hi = mid - 1
+        fin = min(total_paginas, lo + MARGEN_PAGINAS)
+        return range(1, fin + 1), 'descendente', len(sondeos)
+
+    except (ValueError, TypeError, requests.RequestException) as e:
+        print(f"   ⚠️ Búsqueda de página límite descartada: {e}")
+        return None
+
+def paginas_entre(obtener, total_paginas, desde, hasta, a_fecha):
+    """
+    Páginas con calldate en [desde, hasta): dos búsquedas por bisección
+    (obtener debería guardar las páginas ya pedidas para no repetirlas).
+    Devuelve (range de páginas, orden) o None si no están ordenadas.
+    """
+    resultado_desde = buscar_rango_paginas(obtener, total_paginas, desde, a_fecha)
+    resultado_hasta = buscar_rango_paginas(obtener, total_paginas, hasta, a_fecha)
+    if not resultado_desde or not resultado_hasta:
+        return None
+    rango, orden, _ = resultado_desde
+    limite = resultado_hasta[0]
+    # La página donde cruza hasta tiene registros de los dos lados: se conserva con su margen
+    if orden == 'ascendente':
+        fin = min(rango.stop - 1, limite.start + 2 * MARGEN_PAGINAS)
+        inicio = rango.start
+    else:
+        inicio = max(rango.start, limite.stop - 1 - 2 * MARGEN_PAGINAS)
+        fin = rango.stop - 1
+    if fin < inicio:
+        return range(inicio, inicio), orden
+    return range(inicio, fin + 1), orden
+
+# ============================================================================
+# 📥 DESCARGA CONCURRENTE
+# ============================================================================
+
+def descargar_paginas(session, api_url, workers=WORKERS_DEFECTO, max_rps=MAX_RPS_DEFECTO,
+                      timeout=30, reintentos=REINTENTOS_DEFECTO, fecha_limite=None,
+                      a_fecha=None, al_llegar=None, adaptativo=True, tope_rps=None):
+    """
+    Lee totalPages de la página 1 y descarga el resto en paralelo.
+
+    Devuelve (páginas, info): la lista de páginas en orden, cada una en
+    columnas ({campo: [valores]}).
+    El ritmo y la concurrencia los lleva un ControladorTasa: con
+    adaptativo=True arrancan en max_rps y workers / 2 y se ajustan (AIMD)
+    hasta tope_rps y workers; el resultado queda en info['control'].
+    Cada página se reintenta hasta reintentos veces con espera exponencial;
+    las que igual fallan quedan en info['paginas_fallidas'] y el estado de
+    todas en info['paginas'] (ver resumir_pagina), para el punto de control.
+    Con fecha_limite y a_fecha se buscan por bisección solo las páginas
+    desde fecha_limite; si no están ordenadas se descarga todo.
+    Con al_llegar(columnas) cada página se transforma (y filtra) en
+    cuanto llega y la lista trae lo que devuelve al_llegar, sin acumular
+    los registros crudos.
+    """
+    limitador = ControladorTasa(max_rps, workers, adaptativo, tope_rps)
+    info = {'total': 0, 'total_paginas': 0, 'paginas_fallidas': [], 'rango_paginas': None,
+            'registros_descargados': 0, 'paginas': {}, 'control': None}
+    estados = info['paginas']
+
+    def _fallida(pagina, intentos):
+        estados[pagina] = {'estado': 'FALLIDA', 'intentos': intentos, 'registros': 0,
+                           'calldate_min': None, 'calldate_max': None, 'uniqueid_max': None}
+
+    primera, intentos = pedir_pagina(session, api_url, 1, timeout, limitador, reintentos)
+    if primera is None:
+        _fallida(1, intentos)
+        info['paginas_fallidas'].append(1)
+        return [], info
+
+    info['total'] = primera.get('total', 0)
+    info['total_paginas'] = total_paginas = primera.get('totalPages', 1)
+    print(f"✅ API tiene {info['total']:,} registros totales en {total_paginas} páginas")
+    print(f"   ⚙️ Workers: {workers} | Ritmo {limitador.describir()} | Reintentos: {reintentos}")
+
+    # Las páginas sondeadas se guardan crudas y se transforman al final
+    paginas = {1: primera.get('data') or {}}
+    estados[1] = resumir_pagina(paginas[1], intentos)
+    crudas = {1}
+
+    def _descargar(pagina):
+        data, intentos = pedir_pagina(session, api_url, pagina, timeout, limitador, reintentos)
+        if data is None:
+            return pagina, None, None, intentos
+        columnas = data.get('data') or {}
+        estado = resumir_pagina(columnas, intentos)
+        return pagina, (al_llegar(columnas) if al_llegar else columnas), estado, intentos
+
+    # Modo acotado: sondear páginas para encontrar dónde empieza fecha_limite
+    por_descargar = range(1, total_paginas + 1)
+    if fecha_limite is not None and a_fecha is not None:
+        def _obtener(pagina):
+            if pagina not in paginas:
+                data, intentos = pedir_pagina(session, api_url, pagina, timeout, limitador, reintentos)
+                if data is None:
+                    return None
+                paginas[pagina] = data.get('data') or {}
+                estados[pagina] = resumir_pagina(paginas[pagina], intentos)
+                crudas.add(pagina)
+            return paginas[pagina]
+
+        resultado = buscar_rango_paginas(_obtener, total_paginas, fecha_limite, a_fecha)
+        if resultado:
+            por_descargar, orden, n_sondeos = resultado
+            info['rango_paginas'] = (por_descargar.start, por_descargar.stop - 1)
+            print(f"   🔎 Páginas en orden {orden}: se descargan {por_descargar.start}-"
+                  f"{por_descargar.stop - 1} de {total_paginas} ({n_sondeos} sondeos)")
+            paginas = {p: r for p, r in paginas.items() if p in por_descargar}
+        else:
+            print(f"   ⚠️ Las páginas no están ordenadas por calldate: descarga completa")
+
+    pendientes = [p for p in por_descargar if p not in paginas]
+    with tqdm(total=len(por_descargar), desc="Descargando páginas",
+              initial=len(por_descargar) - len(pendientes)) as pbar:
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            futuros = [pool.submit(_descargar, p) for p in pendientes]
+            for futuro in as_completed(futuros):
+                pagina, trozo, estado, intentos = futuro.result()
+                if trozo is None:
+                    _fallida(pagina, intentos)
+                    info['paginas_fallidas'].append(pagina)
+                else:
+                    paginas[pagina] = trozo
+                    estados[pagina] = estado
+                    info['registros_descargados'] += estado['registros']
+                pbar.update(1)
+
+    info['paginas_fallidas'].sort()
+    info['control'] = control = limitador.resumen()
+    if control['adaptativo']:
+        ritmo = "sin límite"
+        if control['rps_final']:
+            ritmo = f"{control['rps_final']:.1f}/s (máx. {control['rps_max']:.1f})"
+        latencia = f"{control['latencia_ms']:.0f} ms" if control['latencia_ms'] is not None else "-"
+        print(f"   🚦 Ritmo final {ritmo}, {control['concurrencia_final']} en paralelo "
+              f"(máx. {control['concurrencia_max']}) | {control['aumentos']} aumentos, "
+              f"{control['recortes']} recortes | 429: {control['429']}, 5xx: {control['5xx']}, "
+              f"errores: {control['errores']} | latencia {latencia}")
+    info['paginas'] = {p: estados[p] for p in sorted(estados) if p in por_descargar}
+
+    for pagina in crudas & paginas.keys():
+        info['registros_descargados'] += contar_filas(paginas[pagina])
+        if al_llegar:
+            paginas[pagina] = al_llegar(paginas[pagina])
+
+    return [paginas[p] for p in sorted(paginas)], info
@@ -0,0 +1,434 @@
+# ============================================================================
+# 🧬 ESQUEMA TIPADO DE CDR_OIKOST_CRUDO (MAPA DE TIPOS EN ORACLE)
+# ============================================================================
+# Compartido por merge_oikost_crudo.py y backfill.py. La tabla cruda ya no
+# guarda todo como VARCHAR2(4000): calldate es DATE, duration y billsec son
+# NUMBER y el resto VARCHAR2 del largo que necesitan. El mapa de tipos
+# queda en CDR_ESQUEMA_COLUMNAS (una fila por columna) y de ahí salen la
+# tabla, el staging y la conversión de los binds:
+#
+#   - Columna nueva de la API: se agrega con su tipo (antes rompía el MERGE).
+#   - Valor más largo que su VARCHAR2: la columna se amplía antes de cargar.
+#   - Tabla anterior con calldate en texto: las cargas la siguen usando en
+#     texto. Se migra solo a mano con migrar_oikost_crudo.py: copia por
+#     lotes a una tabla nueva convirtiendo en Python con las mismas reglas
+#     de la carga diaria y, si ningún valor con dato queda en NULL, la
+#     intercambia; la anterior queda como CDR_OIKOST_CRUDO_TEXTO hasta que
+#     se borre a mano. Si algo no convierte, la tabla de texto sigue viva.
+#     Los índices se crean en la nueva; permisos y sinónimos no se copian.
+#
+# Los largos se miden en bytes (UTF-8) y se reserva MARGEN_LARGO veces el
+# máximo visto, redondeado al siguiente de LARGOS_VARCHAR.
+
+import pandas as pd
+
+TABLA_ESQUEMA = "CDR_ESQUEMA_COLUMNAS"
+
+# Tipos fijos por columna; las demás son VARCHAR2
+TIPOS_FIJOS = {'calldate': 'DATE', 'duration': 'NUMBER', 'billsec': 'NUMBER'}
+
+LARGOS_VARCHAR = (20, 50, 100, 255, 500, 1000, 2000, 4000)
+MARGEN_LARGO = 2
+
+SUFIJO_ANTERIOR = "_TEXTO"
+SUFIJO_NUEVA = "_NUEVA"
+# Filas por lote al copiar la tabla de texto y valores de ejemplo por columna en el reporte
+TAMANO_LOTE_MIGRACION = 50000
+EJEMPLOS_PERDIDOS = 5
+
+# ============================================================================
+# 🧱 MAPA DE TIPOS PERSISTIDO
+# ============================================================================
+
+def _existe_tabla(cursor, tabla):
+    cursor.execute("""
+        SELECT COUNT(*) FROM USER_TABLES
+        WHERE TABLE_NAME = UPPER(:1)
+    """, [tabla])
+    return cursor.fetchone()[0] > 0
+
+def asegurar_tabla_esquema(cursor):
+    """Crea la tabla del mapa de tipos la primera vez"""
+    if _existe_tabla(cursor, TABLA_ESQUEMA):
+        return
+    print(f"   🏗️ Creando tabla de control {TABLA_ESQUEMA}...")
+    cursor.execute(f"""
+        CREATE TABLE {TABLA_ESQUEMA} (
+            TABLA VARCHAR2(128),
+            COLUMNA VARCHAR2(128),
+            POSICION NUMBER(5),
+            TIPO VARCHAR2(20),
+            LARGO NUMBER(5),
+            FECHA_ACTUALIZACION TIMESTAMP DEFAULT SYSTIMESTAMP,
+            PRIMARY KEY (TABLA, COLUMNA)
+        )
+    """)
+
+def leer_tipos(cursor, tabla):
+    """Mapa guardado {columna: (tipo, largo)} en el orden de la tabla ({} si no hay)"""
+    cursor.execute(f"""
+        SELECT COLUMNA, TIPO, LARGO FROM {TABLA_ESQUEMA}
+        WHERE TABLA = :1
+        ORDER BY POSICION
+    """, [tabla])
+    return {columna: (tipo, int(largo) if largo else None) for columna, tipo, largo in cursor.fetchall()}
+
+def guardar_tipos(cursor, tabla, tipos):
+    """Reemplaza el mapa de la tabla (sin commit)"""
+    cursor.execute(f"DELETE FROM {TABLA_ESQUEMA} WHERE TABLA = :1", [tabla])
+    cursor.executemany(f"""
+        INSERT INTO {TABLA_ESQUEMA} (TABLA, COLUMNA, POSICION, TIPO, LARGO)
+        VALUES (:1, :2, :3, :4, :5)
+    """, [(tabla, columna, posicion, tipo, largo)
+          for posicion, (columna, (tipo, largo)) in enumerate(tipos.items(), 1)])
+
+def columnas_catalogo(cursor, tabla):
+    """{columna: (DATA_TYPE, DATA_LENGTH)} de la tabla en el catálogo ({} si no existe)"""
+    cursor.execute("""
+        SELECT COLUMN_NAME, DATA_TYPE, DATA_LENGTH FROM USER_TAB_COLUMNS
+        WHERE TABLE_NAME = UPPER(:1)
+    """, [tabla])
+    return {columna: (tipo, largo) for columna, tipo, largo in cursor.fetchall()}
+
+# ============================================================================
+# 🔎 INFERENCIA
+# ============================================================================
+
+def definicion(tipo, largo=None):
+    """Tipo Oracle de una entrada del mapa"""
+    return f"VARCHAR2({largo})" if tipo == 'VARCHAR2' else tipo
+
+def largo_varchar(maximo):
+    """Largo reservado para un máximo visto de maximo bytes"""
+    necesario = (maximo or 1) * MARGEN_LARGO
+    return next((largo for largo in LARGOS_VARCHAR if largo >= necesario), LARGOS_VARCHAR[-1])
+
+def _texto(valor):
+    """Valor de una columna VARCHAR2 como lo guarda la tabla (los enteros sin '.0')"""
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+def largos_maximos(df):
+    """Largo máximo en bytes de cada columna del DataFrame (0 si está vacía)"""
+    largos = {}
+    for columna in df.columns:
+        valores = df[columna].dropna()
+        if valores.empty:
+            largos[columna] = 0
+            continue
+        if not pd.api.types.is_string_dtype(valores) and not pd.api.types.is_object_dtype(valores):
+            valores = valores.map(_texto)
+        largos[columna] = int(valores.astype(str).str.encode('utf-8').str.len().max())
+    return largos
+
+def inferir_tipos(largos, tipos=None):
+    """
+    Completa el mapa tipos con los largos vistos ({columna: bytes}).
+    Devuelve (mapa, columnas nuevas, columnas VARCHAR2 ampliadas).
+    """
+    tipos = dict(tipos or {})
+    nuevas, ampliadas = [], []
+    for columna, maximo in largos.items():
+        actual = tipos.get(columna)
+        if actual is None:
+            tipo = TIPOS_FIJOS.get(columna, 'VARCHAR2')
+            tipos[columna] = (tipo, largo_varchar(maximo) if tipo == 'VARCHAR2' else None)
+            nuevas.append(columna)
+        elif actual[0] == 'VARCHAR2' and maximo > (actual[1] or 0):
+            # Ya en el máximo de LARGOS_VARCHAR no hay a qué ampliar
+            largo = largo_varchar(maximo)
+            if largo > (actual[1] or 0):
+                tipos[columna] = ('VARCHAR2', largo)
+                ampliadas.append(columna)
+    return tipos, nuevas, ampliadas
+
+def tipos_desde_catalogo(catalogo):
+    """Mapa a partir de una tabla ya tipada (cuando falta el mapa guardado)"""
+    tipos = {}
+    for columna, (tipo, largo) in catalogo.items():
+        if tipo.startswith('VARCHAR'):
+            tipos[columna] = ('VARCHAR2', int(largo or LARGOS_VARCHAR[-1]))
+        elif tipo.startswith('TIMESTAMP'):
+            tipos[columna] = ('DATE', None)
+        else:
+            tipos[columna] = (tipo, None)
+    return tipos
+
+def tabla_tipada(catalogo):
+    """True si calldate ya no es texto (la tabla no necesita migración)"""
+    tipo = catalogo.get('calldate', ('',))[0] or ''
+    return tipo == 'DATE' or tipo.startswith('TIMESTAMP')
+
+# ============================================================================
+# 📦 BINDS
+# ============================================================================
+
+def _fecha(valor):
+    """Un calldate suelto con su propio formato (None si no es fecha)"""
+    fecha = pd.to_datetime(valor, errors='coerce')
+    if pd.isna(fecha):
+        return None
+    # Con zona horaria queda la hora local escrita, como en cdr_merge
+    return (fecha.tz_localize(None) if fecha.tzinfo else fecha).to_pydatetime()
+
+def _fechas(serie):
+    # pandas toma el formato del primer valor: los que no lo siguen (con 'T',
+    # con fracciones de segundo) se leen uno a uno en vez de quedar en NULL
+    try:
+        fechas = pd.to_datetime(serie, errors='coerce')
+    except ValueError:
+        # Zonas horarias mezcladas: todos uno a uno
+        fechas = pd.Series(pd.NaT, index=serie.index, dtype='datetime64[ns]')
+    if fechas.dt.tz is not None:
+        fechas = fechas.dt.tz_localize(None)
+    return [f.to_pydatetime() if not pd.isna(f) else (_fecha(v) if presente else None)
+            for f, v, presente in zip(fechas, serie.tolist(), serie.notna())]
+
+def _numeros(serie):
+    numeros = pd.to_numeric(serie, errors='coerce')
+    return numeros.astype(object).where(numeros.notna(), None).tolist()
+
+def _textos(serie):
+    return [_texto(v) if presente else None for v, presente in zip(serie.tolist(), serie.notna())]
+
+# Tipo del mapa -> conversión de la columna (lo demás va como texto)
+CONVERTIR = {'DATE': _fechas, 'NUMBER': _numeros}
+
+def valores_perdidos(df, valores, columnas):
+    """
+    {columna: [valores originales]} que tenían dato y la conversión dejó en
+    None. El texto vacío no cuenta: Oracle ya lo guardaba como NULL.
+    """
+    perdidos = {}
+    for col in columnas:
+        serie = df[col]
+        malos = [original for original, presente, nuevo in zip(serie.tolist(), serie.notna(), valores[col])
+                 if presente and nuevo is None and original != '']
+        if malos:
+            perdidos[col] = malos
+    return perdidos
+
+def preparar_filas(df, columnas, tipos):
+    """
+    Filas para executemany con cada columna convertida a su tipo (DATE,
+    NUMBER, texto). Los valores que no convierten van como NULL y se avisan
+    por columna con ejemplos (migrar_tabla, en cambio, no sigue).
+    """
+    valores = {col: CONVERTIR.get(tipos[col][0], _textos)(df[col]) for col in columnas}
+    convertidas = [col for col in columnas if tipos[col][0] in CONVERTIR]
+    for col, malos in valores_perdidos(df, valores, convertidas).items():
+        print(f"   ⚠️ {len(malos):,} valores de {col} no se pueden convertir a {tipos[col][0]} "
+              f"y van como NULL; ejemplos: {malos[:EJEMPLOS_PERDIDOS]}")
+    return list(zip(*(valores[col] for col in columnas)))
+
+# ============================================================================
+# 🏗️ TABLA E ÍNDICES
+# ============================================================================
+
+def crear_tabla(cursor, tabla, tipos):
+    col_defs = ", ".join(f'"{col}" {definicion(*tipo)}' for col, tipo in tipos.items())
+    cursor.execute(f"CREATE TABLE {tabla} ({col_defs})")
+
+def crear_indices(cursor, tabla):
+    """Llave del MERGE (uniqueid) y calldate, para MAX("calldate") sin recorrer la tabla"""
+    for sql in (f'CREATE UNIQUE INDEX IDX_{tabla}_UID ON {tabla} ("uniqueid")',
+                f'CREATE INDEX IDX_{tabla}_FECHA ON {tabla} ("calldate")'):
+        try:
+            cursor.execute(sql)
+        except Exception as e:
+            print(f"   ⚠️ No se pudo crear el índice ({sql.split(' ON ')[0]}): {e}")
+
+def largos_en_tabla(cursor, tabla, columnas):
+    """Largo máximo en bytes de cada columna de texto de la tabla (un solo recorrido)"""
+    if not columnas:
+        return {}
+    maximos = ", ".join(f'MAX(LENGTHB("{col}"))' for col in columnas)
+    cursor.execute(f'SELECT {maximos} FROM {tabla}')
+    return {col: int(valor or 0) for col, valor in zip(columnas, cursor.fetchone())}
+
+def _staging_vigente(cursor, staging, tipos):
+    """False si alguna columna del staging tiene otro tipo que el mapa (p. ej. texto tras migrar)"""
+    actuales = tipos_desde_catalogo(columnas_catalogo(cursor, staging))
+    return all(actuales[col][0] == tipo for col, (tipo, _) in tipos.items() if col in actuales)
+
+# ============================================================================
+# 🔄 MIGRACIÓN DE LA TABLA DE TEXTO (MANUAL: migrar_oikost_crudo.py)
+# ============================================================================
+
+def _deshacer_migracion(cursor, tabla, nueva, anterior):
+    """Deja viva la tabla de texto y borra la copia a medio hacer"""
+    if not _existe_tabla(cursor, tabla) and _existe_tabla(cursor, anterior):
+        cursor.execute(f"ALTER TABLE {anterior} RENAME TO {tabla}")
+    if _existe_tabla(cursor, nueva):
+        cursor.execute(f"DROP TABLE {nueva}")
+
+def migrar_tabla(connection, tabla, tipos, catalogo, solo_verificar=False):
+    """
+    Copia la tabla de texto a una tipada y las intercambia; la anterior queda
+    con SUFIJO_ANTERIOR. Convierte en Python por lotes con las mismas reglas
+    que la carga diaria (CONVERTIR). Si algún valor con dato no se puede
+    convertir no se intercambia nada: se borra la copia, la tabla de texto
+    sigue viva y se lanza RuntimeError. Con solo_verificar solo lee y
+    convierte. Devuelve las filas revisadas.
+    """
+    nueva = f"{tabla}{SUFIJO_NUEVA}"
+    anterior = f"{tabla}{SUFIJO_ANTERIOR}"
+    columnas = [col for col in tipos if col in catalogo]
+    convertidas = [col for col in columnas if tipos[col][0] in CONVERTIR]
+    cols = ", ".join(f'"{col}"' for col in columnas)
+    placeholders = ", ".join(f':{i + 1}' for i in range(len(columnas)))
+
+    cursor = connection.cursor()
+    lectura = connection.cursor()
+    lectura.arraysize = TAMANO_LOTE_MIGRACION
+    perdidos = {}
+    revisadas = 0
+    intercambiada = False
+    try:
+        if not solo_verificar:
+            if _existe_tabla(cursor, anterior):
+                raise RuntimeError(f"ya existe {anterior}: bórrala o renómbrala antes de migrar")
+            if _existe_tabla(cursor, nueva):
+                # Resto de una migración interrumpida
+                cursor.execute(f"DROP TABLE {nueva}")
+            crear_tabla(cursor, nueva, tipos)
+
+        lectura.execute(f"SELECT {cols} FROM {tabla}")
+        while True:
+            filas = lectura.fetchmany(TAMANO_LOTE_MIGRACION)
+            if not filas:
+                break
+            df = pd.DataFrame(filas, columns=columnas, dtype=object)
+            valores = {col: CONVERTIR.get(tipos[col][0], _textos)(df[col]) for col in columnas}
+            for col, malos in valores_perdidos(df, valores, convertidas).items():
+                total, ejemplos = perdidos.get(col, (0, []))
+                perdidos[col] = (total + len(malos), (ejemplos + malos)[:EJEMPLOS_PERDIDOS])
+            # Con un valor perdido ya no se copia: se sigue leyendo solo para el reporte completo
+            if not solo_verificar and not perdidos:
+                cursor.executemany(f"INSERT INTO {nueva} ({cols}) VALUES ({placeholders})",
+                                   list(zip(*(valores[col] for col in columnas))))
+                connection.commit()
+            revisadas += len(filas)
+            print(f"   ⏳ {revisadas:,} filas revisadas...")
+
+        if perdidos:
+            for col, (total, ejemplos) in perdidos.items():
+                print(f"   ❌ {total:,} valores de {col} no se pueden convertir a {tipos[col][0]}; "
+                      f"ejemplos: {ejemplos}")
+            raise RuntimeError(f"{sum(total for total, _ in perdidos.values()):,} valores no se "
+                               f"pueden convertir: {tabla} sigue en texto")
+        if solo_verificar:
+            return revisadas
+
+        cursor.execute(f"SELECT COUNT(*) FROM {nueva}")
+        copiadas = cursor.fetchone()[0]
+        if copiadas != revisadas:
+            raise RuntimeError(f"{nueva} tiene {copiadas:,} filas y {tabla} {revisadas:,}")
+
+        cursor.execute(f"ALTER TABLE {tabla} RENAME TO {anterior}")
+        cursor.execute(f"ALTER TABLE {nueva} RENAME TO {tabla}")
+        intercambiada = True
+        crear_indices(cursor, tabla)
+        connection.commit()
+        return revisadas
+    except Exception:
+        connection.rollback()
+        if not solo_verificar and not intercambiada:
+            _deshacer_migracion(cursor, tabla, nueva, anterior)
+        raise
+    finally:
+        lectura.close()
+        cursor.close()
+
+def migrar_esquema(connection, tabla, solo_verificar=False):
+    """
+    Pasa a columnas tipadas una tabla que sigue en texto (calldate VARCHAR2)
+    y guarda su mapa. No hace nada si ya está tipada. Devuelve las filas
+    revisadas; lanza RuntimeError si algún valor se perdería.
+    """
+    cursor = connection.cursor()
+    try:
+        asegurar_tabla_esquema(cursor)
+        catalogo = columnas_catalogo(cursor, tabla)
+        if not catalogo:
+            raise RuntimeError(f"no existe la tabla {tabla}")
+        if tabla_tipada(catalogo):
+            print(f"   ✅ {tabla} ya tiene columnas tipadas: no hay nada que migrar")
+            return 0
+
+        texto = [col for col in catalogo if TIPOS_FIJOS.get(col, 'VARCHAR2') == 'VARCHAR2']
+        en_tabla = largos_en_tabla(cursor, tabla, texto)
+        tipos, _, _ = inferir_tipos({col: en_tabla.get(col, 0) for col in catalogo})
+        print(f"   📋 Tipos: {', '.join(f'{c} {definicion(*t)}' for c, t in tipos.items())}")
+
+        revisadas = migrar_tabla(connection, tabla, tipos, catalogo, solo_verificar)
+        if not solo_verificar:
+            guardar_tipos(cursor, tabla, tipos)
+            connection.commit()
+        return revisadas
+    finally:
+        cursor.close()
+
+# ============================================================================
+# 🧭 ESQUEMA ANTES DE CADA CARGA
+# ============================================================================
+
+def asegurar_esquema(connection, tabla, df, staging=None):
+    """
+    Deja la tabla (y su staging) lista para los datos de df: la crea tipada
+    si no existe y agrega o amplía columnas. Una tabla que sigue en texto no
+    se migra aquí (ver migrar_esquema): se sigue cargando en texto como
+    antes. El staging se borra cuando ya no coincide con la tabla (es una
+    tabla temporal vacía) para que se vuelva a crear.
+    Devuelve el mapa {columna: (tipo, largo)} con el que cargar.
+    """
+    cursor = connection.cursor()
+    try:
+        asegurar_tabla_esquema(cursor)
+        guardados = leer_tipos(cursor, tabla)
+        catalogo = columnas_catalogo(cursor, tabla)
+        largos = largos_maximos(df)
+        tipada = True
+        ampliadas = []
+
+        if not catalogo:
+            tipos, _, _ = inferir_tipos(largos, guardados)
+            print(f"   🏗️ Creando tabla {tabla} con tipos: "
+                  f"{', '.join(f'{c} {definicion(*t)}' for c, t in tipos.items())}")
+            crear_tabla(cursor, tabla, tipos)
+            crear_indices(cursor, tabla)
+
+        else:
+            tipada = tabla_tipada(catalogo)
+            if not tipada:
+                # Un mapa guardado no aplica a la tabla de texto: se carga con los tipos del catálogo
+                print(f"   ⚠️ {tabla} sigue en texto: se carga como VARCHAR2 (para tiparla, "
+                      f"correr migrar_oikost_crudo.py)")
+                guardados = tipos_desde_catalogo(catalogo)
+            tipos, nuevas, ampliadas = inferir_tipos(largos, guardados or tipos_desde_catalogo(catalogo))
+            nuevas = [col for col in nuevas if col not in catalogo]
+            if not tipada:
+                for col in nuevas:
+                    tipos[col] = ('VARCHAR2', LARGOS_VARCHAR[-1])
+            if nuevas:
+                print(f"   🔧 Columnas nuevas en {tabla}: {nuevas}")
+                col_defs = ", ".join(f'"{col}" {definicion(*tipos[col])}' for col in nuevas)
+                cursor.execute(f"ALTER TABLE {tabla} ADD ({col_defs})")
+            if ampliadas:
+                print(f"   🔧 Ampliando en {tabla}: "
+                      f"{', '.join(f'{c} {definicion(*tipos[c])}' for c in ampliadas)}")
+                col_defs = ", ".join(f'"{col}" {definicion(*tipos[col])}' for col in ampliadas)
+                cursor.execute(f"ALTER TABLE {tabla} MODIFY ({col_defs})")
+
+        # Solo se guarda el mapa de una tabla tipada
+        if tipada and tipos != guardados:
+            guardar_tipos(cursor, tabla, tipos)
+            connection.commit()
+        # El staging puede no existir aún (primera carga): solo se borra si está
+        if staging and _existe_tabla(cursor, staging) and (
+                ampliadas or not _staging_vigente(cursor, staging, tipos)):
+            cursor.execute(f"DROP TABLE {staging}")
+        return tipos
+    finally:
+        cursor.close()
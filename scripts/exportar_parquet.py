@@ -0,0 +1,272 @@
+# ============================================================================
+# 💾 EXPORTACIÓN ORACLE -> PARQUET EN STREAMING
+# ============================================================================
+# Compartido por cdr_to_parquet.py y parquet_oikost_crudo.py: la tabla se lee
+# en lotes Arrow directamente desde python-oracledb (fetch_df_batches) y cada
+# lote se agrega al archivo con ParquetWriter, así la memoria depende del
+# tamaño del lote y no del tamaño de la tabla, y no se crean objetos Python
+# (ni Decimal) por celda.
+
+import inspect
+import os
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from conexion_oracle import conectar
+from metricas import etapa
+
+TAMANO_LOTE = 100000
+FILAS_MUESTRA = 100
+
+# ============================================================================
+# ⚙️ PERFILES DE ESCRITURA
+# ============================================================================
+# basico:     compresión elegida (snappy) y valores por defecto de pyarrow,
+#             el mismo archivo de siempre
+# optimizado: zstd, índice de páginas, codificación según el tipo de cada
+#             columna, bloom filters en las llaves y sorting_columns (la
+#             consulta debe venir con el ORDER BY correspondiente)
+PERFILES = ('basico', 'optimizado')
+NIVEL_ZSTD = 3
+FPP_BLOOM = 0.05
+
+# Los bloom filters solo existen en versiones recientes de pyarrow; si no, se omiten
+_SOPORTA_BLOOM = 'bloom_filter_options' in inspect.signature(pq.ParquetWriter.__init__).parameters
+
+def opciones_escritura(esquema, perfil='basico', compression='snappy', orden=(), bloom=(),
+                       nivel_zstd=NIVEL_ZSTD, row_group_size=100000):
+    """Argumentos de pq.ParquetWriter para el perfil pedido"""
+    if perfil not in PERFILES:
+        raise ValueError(f"Perfil Parquet desconocido: {perfil} (opciones: {', '.join(PERFILES)})")
+    if perfil == 'basico':
+        return {'compression': compression}
+
+    bloom = [c for c in bloom if c in esquema.names]
+    diccionario = []
+    codificacion = {}
+    for campo in esquema:
+        tipo = campo.type
+        if pa.types.is_dictionary(tipo):
+            diccionario.append(campo.name)
+        elif pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+            # Llaves (casi únicas): prefijos compartidos; el resto: pocos valores
+            if campo.name in bloom:
+                codificacion[campo.name] = 'DELTA_BYTE_ARRAY'
+            else:
+                diccionario.append(campo.name)
+        elif (pa.types.is_integer(tipo) or pa.types.is_timestamp(tipo)
+              or pa.types.is_time(tipo) or pa.types.is_date(tipo)):
+            codificacion[campo.name] = 'DELTA_BINARY_PACKED'
+        elif pa.types.is_floating(tipo):
+            codificacion[campo.name] = 'BYTE_STREAM_SPLIT'
+
+    opciones = {
+        'compression': 'zstd',
+        'compression_level': nivel_zstd,
+        'use_dictionary': diccionario,
+        'column_encoding': codificacion,
+        'write_page_index': True,
+        'sorting_columns': [pq.SortingColumn(esquema.get_field_index(c))
+                            for c in orden if c in esquema.names],
+    }
+    if bloom:
+        if _SOPORTA_BLOOM:
+            opciones['bloom_filter_options'] = {
+                c: {'ndv': row_group_size, 'fpp': FPP_BLOOM} for c in bloom
+            }
+        else:
+            print(f"   ⚠️ pyarrow {pa.__version__} no escribe bloom filters: se omiten")
+    return opciones
+
+def _normalizar_nombre(nombre):
+    """Mismo criterio que SQLAlchemy/pd.read_sql: los nombres en MAYÚSCULAS pasan a minúsculas"""
+    return nombre.lower() if nombre.upper() == nombre else nombre
+
+def _tipo_compacto(tipo):
+    """NUMBER -> int64/float64, DATE/TIMESTAMP -> timestamp[us], texto -> string"""
+    if pa.types.is_decimal(tipo):
+        return pa.int64() if tipo.scale == 0 else pa.float64()
+    if pa.types.is_timestamp(tipo):
+        return pa.timestamp('us', tz=tipo.tz)
+    if pa.types.is_large_string(tipo):
+        return pa.string()
+    return tipo
+
+def lote_a_arrow(lote):
+    """Convierte un DataFrame de python-oracledb en tabla Arrow con tipos compactos"""
+    tabla = pa.table(lote)
+    esquema = pa.schema([
+        pa.field(_normalizar_nombre(campo.name), _tipo_compacto(campo.type))
+        for campo in tabla.schema
+    ])
+    return tabla.rename_columns(esquema.names).cast(esquema)
+
+def _esquema_estable(tabla, tipos_origen, tipos=None):
+    """Fija las columnas declaradas en tipos y da el tipo de origen a las que quedaron sin tipo (todo NULL)"""
+    tipos = tipos or {}
+    campos = []
+    for campo in tabla.schema:
+        if campo.name in tipos:
+            campo = campo.with_type(tipos[campo.name])
+        elif pa.types.is_null(campo.type):
+            campo = campo.with_type(tipos_origen.get(campo.name, pa.string()))
+        campos.append(campo)
+    return pa.schema(campos, metadata=tabla.schema.metadata)
+
+def _lotes(connection, sql, parametros, tamano_lote):
+    """Itera los lotes Arrow de la consulta (se detiene en el primer lote vacío)"""
+    lotes = connection.fetch_df_batches(sql, parametros, size=tamano_lote, fetch_decimals=False)
+    for lote in lotes:
+        if lote.num_rows() == 0:
+            break
+        yield lote_a_arrow(lote)
+
+def _preparar_lote(tabla, transformar, esquema, tipos=None):
+    """Aplica transformar (en pandas) y ajusta el lote al esquema del archivo"""
+    if transformar:
+        tipos_origen = {campo.name: campo.type for campo in tabla.schema}
+        df = transformar(tabla.to_pandas())
+        if esquema is None:
+            tabla = pa.Table.from_pandas(df, preserve_index=False)
+            return tabla.cast(_esquema_estable(tabla, tipos_origen, tipos))
+        return pa.Table.from_pandas(df, schema=esquema, preserve_index=False)
+    if esquema is not None:
+        return tabla.cast(esquema)
+    if tipos:
+        return tabla.cast(_esquema_estable(tabla, {}, tipos))
+    return tabla
+
+def exportar_a_parquet(sql, ruta, transformar=None, al_primer_lote=None, parametros=None,
+                       tipos=None, tamano_lote=TAMANO_LOTE, compression='snappy',
+                       row_group_size=100000, perfil='basico', orden=(), bloom=()):
+    """
+    Ejecuta sql y escribe el resultado en ruta, lote a lote.
+
+    transformar(df) limpia cada lote en pandas antes de escribirlo; sin
+    transformar los lotes van de Oracle a Parquet sin pasar por pandas.
+    al_primer_lote(df) recibe una muestra del primer lote (diagnóstico).
+    tipos {columna: tipo Arrow} fija el tipo de esas columnas en el archivo.
+    perfil, orden y bloom eligen las opciones del writer (opciones_escritura).
+    Devuelve {'filas', 'tiempo_lectura', 'tiempo_escritura'}.
+    """
+    resultado = {'filas': 0, 'tiempo_lectura': 0.0, 'tiempo_escritura': 0.0}
+    writer = None
+    esquema = None
+
+    connection = conectar()
+    try:
+        lotes = _lotes(connection, sql, parametros, tamano_lote)
+        while True:
+            inicio = time.time()
+            with etapa('lectura_oracle') as m:
+                tabla = next(lotes, None)
+                if tabla is not None:
+                    m['filas'] = tabla.num_rows
+                    m['bytes'] = tabla.nbytes
+            if tabla is None:
+                break
+            resultado['tiempo_lectura'] += time.time() - inicio
+
+            inicio = time.time()
+            if writer is None and al_primer_lote:
+                al_primer_lote(tabla.slice(0, FILAS_MUESTRA).to_pandas())
+
+            with etapa('transformacion') as m:
+                tabla = _preparar_lote(tabla, transformar, esquema, tipos)
+                m['filas'] = tabla.num_rows
+            if writer is None:
+                esquema = tabla.schema
+                opciones = opciones_escritura(esquema, perfil, compression, orden, bloom,
+                                              row_group_size=row_group_size)
+                writer = pq.ParquetWriter(ruta, esquema, **opciones)
+
+            with etapa('escritura_parquet') as m:
+                writer.write_table(tabla, row_group_size=row_group_size)
+                m['filas'] = tabla.num_rows
+            resultado['filas'] += tabla.num_rows
+            resultado['tiempo_escritura'] += time.time() - inicio
+            print(f"   💾 {resultado['filas']:,} registros escritos...")
+
+    finally:
+        if writer is not None:
+            writer.close()
+        connection.close()
+
+    return resultado
+
+# ============================================================================
+# 🗂️ DATASET PARTICIONADO POR FECHA (ESTILO HIVE)
+# ============================================================================
+
+def ruta_particion(dia):
+    """'2025-03-07' -> 'year=2025/month=03/day=07/part-0.parquet'"""
+    anio, mes, d = dia.split('-')
+    return f"year={anio}/month={mes}/day={d}/part-0.parquet"
+
+def exportar_particionado(sql, directorio, columna_fecha, transformar=None, parametros=None,
+                          tipos=None, tamano_lote=TAMANO_LOTE, compression='snappy',
+                          row_group_size=100000, perfil='basico', orden=(), bloom=()):
+    """
+    Escribe el resultado de sql como dataset Hive year=/month=/day= en directorio.
+
+    La consulta debe venir ORDER BY columna_fecha: cada día se escribe de
+    corrido en un solo archivo y se cierra al empezar el siguiente. Las
+    filas con fecha nula van a 1900-01-01 (el mismo relleno de limpiar_cdr).
+    Devuelve {'filas', 'particiones': [rutas relativas], 'tiempo'}.
+    """
+    resultado = {'filas': 0, 'particiones': [], 'tiempo': 0.0}
+    inicio = time.time()
+    esquema = None
+    writer = None
+    dia_actual = None
+
+    connection = conectar()
+    try:
+        lotes = _lotes(connection, sql, parametros, tamano_lote)
+        while True:
+            with etapa('lectura_oracle') as m:
+                tabla = next(lotes, None)
+                if tabla is not None:
+                    m['filas'] = tabla.num_rows
+                    m['bytes'] = tabla.nbytes
+            if tabla is None:
+                break
+            dias = pc.fill_null(pc.strftime(tabla[columna_fecha], format='%Y-%m-%d'), '1900-01-01')
+            with etapa('transformacion') as m:
+                tabla = _preparar_lote(tabla, transformar, esquema, tipos)
+                m['filas'] = tabla.num_rows
+            if esquema is None:
+                esquema = tabla.schema
+                opciones = opciones_escritura(esquema, perfil, compression, orden, bloom,
+                                              row_group_size=row_group_size)
+
+            with etapa('escritura_parquet') as m:
+                m['filas'] = tabla.num_rows
+                for dia in pc.unique(dias).to_pylist():
+                    trozo = tabla.filter(pc.equal(dias, dia))
+                    if dia != dia_actual:
+                        relativa = ruta_particion(dia)
+                        if relativa in resultado['particiones']:
+                            raise ValueError(f"La consulta no viene ordenada por {columna_fecha} ({dia})")
+                        if writer is not None:
+                            writer.close()
+                        ruta = os.path.join(directorio, relativa)
+                        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+                        writer = pq.ParquetWriter(ruta, esquema, **opciones)
+                        resultado['particiones'].append(relativa)
+                        dia_actual = dia
+                    writer.write_table(trozo, row_group_size=row_group_size)
+
+            resultado['filas'] += tabla.num_rows
+            print(f"   💾 {resultado['filas']:,} registros en {len(resultado['particiones'])} particiones...")
+
+    finally:
+        if writer is not None:
+            writer.close()
+        connection.close()
+
+    resultado['tiempo'] = time.time() - inicio
+    return resultado
@@ -3,20 +3,17 @@
 # ============================================================================
 
 import os
-import requests
 import pandas as pd
 from tqdm import tqdm
 import urllib3
 import time
-import oracledb
 import sys
 from datetime import datetime, timedelta
-
-urllib3.disable_warnings()
-
-print("=" * 80)
-print("🚀 INICIANDO MERGE INCREMENTAL DE DATOS CRUDOS OIKOST")
-print("=" * 80)
+from descarga_api import crear_sesion, descargar_paginas, WORKERS_DEFECTO, REINTENTOS_DEFECTO
+from conexion_oracle import conectar, cerrar_pool
+from punto_control import leer_punto_control, guardar_punto_control
+from esquema_crudo import asegurar_esquema, preparar_filas, definicion
+from metricas import etapa, guardar_metricas
 
 # ============================================================================
 # 🛠️ CONFIGURACIÓN CON VARIABLES DE ENTORNO (SECRETS)
@@ -33,31 +30,68 @@ TOKEN_BASIC = os.environ.get('OIKOST_TOKEN')
 
 # --- Tabla destino ---
 TABLE_NAME = "CDR_OIKOST_CRUDO"
+# Tabla temporal global permanente (ON COMMIT DELETE ROWS) usada como staging del MERGE
+STAGING_TABLE = f"{TABLE_NAME}_STG"
+# MERGE que solo actualiza filas cuyo contenido cambió (0 = reescribir todas las coincidentes)
+MERGE_DETECTAR_CAMBIOS = os.environ.get('MERGE_DETECTAR_CAMBIOS', '1') == '1'
 
-# Verificar credenciales obligatorias
-if not all([ORACLE_USER, ORACLE_PASSWORD, ORACLE_DSN, TOKEN_BASIC]):
-    print("❌ FALTAN CREDENCIALES. Verifica los secrets:")
-    if not ORACLE_USER: print("   - ORACLE_USER")
-    if not ORACLE_PASSWORD: print("   - ORACLE_PASSWORD")
-    if not ORACLE_DSN: print("   - ORACLE_DSN")
-    if not TOKEN_BASIC: print("   - OIKOST_TOKEN")
-    sys.exit(1)
+# --- Descarga concurrente (el servidor OIKOST es más sensible: límite más bajo) ---
+OIKOST_WORKERS = int(os.environ.get('OIKOST_WORKERS', WORKERS_DEFECTO))
+OIKOST_MAX_RPS = float(os.environ.get('OIKOST_MAX_RPS', 5))
+# Control adaptativo (AIMD): OIKOST_MAX_RPS es el ritmo inicial y sube hasta OIKOST_TOPE_RPS
+# (0 = 4 veces el inicial) mientras la API responde bien; OIKOST_ADAPTATIVO=0 lo deja fijo
+OIKOST_ADAPTATIVO = os.environ.get('OIKOST_ADAPTATIVO', '1') == '1'
+OIKOST_TOPE_RPS = float(os.environ.get('OIKOST_TOPE_RPS', 0))
+# Reintentos por página (con espera exponencial) antes de darla por fallida
+OIKOST_REINTENTOS = int(os.environ.get('OIKOST_REINTENTOS', REINTENTOS_DEFECTO))
+# Buscar por bisección la primera página con fecha_limite (requiere páginas ordenadas por calldate)
+OIKOST_BUSQUEDA_LIMITE = os.environ.get('OIKOST_BUSQUEDA_LIMITE', '0') == '1'
 
-print(f"🔌 API: {API_URL}")
-print(f"🗄️ Tabla destino: {TABLE_NAME}")
+# Cabeceras con el token: las arma inicializar()
+headers = None
+
+# ============================================================================
+# 🔧 INICIALIZACIÓN
+# ============================================================================
+# Importar el módulo no imprime ni verifica credenciales: lo hace
+# inicializar() desde el bloque de ejecución.
+
+def inicializar():
+    """Verifica las credenciales y arma las cabeceras de la API (sale con código 1 si falta alguna)"""
+    global headers
+
+    urllib3.disable_warnings()
+
+    print("=" * 80)
+    print("🚀 INICIANDO MERGE INCREMENTAL DE DATOS CRUDOS OIKOST")
+    print("=" * 80)
+
+    # Verificar credenciales obligatorias
+    if not all([ORACLE_USER, ORACLE_PASSWORD, ORACLE_DSN, TOKEN_BASIC]):
+        print("❌ FALTAN CREDENCIALES. Verifica los secrets:")
+        if not ORACLE_USER: print("   - ORACLE_USER")
+        if not ORACLE_PASSWORD: print("   - ORACLE_PASSWORD")
+        if not ORACLE_DSN: print("   - ORACLE_DSN")
+        if not TOKEN_BASIC: print("   - OIKOST_TOKEN")
+        sys.exit(1)
+
+    headers = {
+        'Authorization': TOKEN_BASIC,
+        'User-Agent': 'Mozilla/5.0',
+        'Accept': 'application/json'
+    }
+
+    print(f"🔌 API: {API_URL}")
+    print(f"🗄️ Tabla destino: {TABLE_NAME}")
 
 # ============================================================================
 # 📅 FUNCIÓN PARA OBTENER ÚLTIMA FECHA EN ORACLE
 # ============================================================================
 
 def obtener_ultima_fecha_oracle():
-    """Obtiene el valor máximo de calldate (string) de la tabla Oracle"""
+    """Obtiene el valor máximo de calldate de la tabla Oracle (DATE; texto si aún no se migró)"""
     try:
-        connection = oracledb.connect(
-            user=ORACLE_USER,
-            password=ORACLE_PASSWORD,
-            dsn=ORACLE_DSN
-        )
+        connection = conectar()
         cursor = connection.cursor()
         
         # Verificar si la tabla existe
@@ -75,14 +109,14 @@ def obtener_ultima_fecha_oracle():
         
         # Obtener máximo calldate
         cursor.execute(f'SELECT MAX("calldate") FROM "{TABLE_NAME}"')
-        max_calldate_str = cursor.fetchone()[0]
+        max_calldate = cursor.fetchone()[0]
         
         cursor.close()
         connection.close()
         
-        if max_calldate_str:
-            print(f"📅 Última fecha (string) en BD: {max_calldate_str}")
-            return pd.to_datetime(max_calldate_str)
+        if max_calldate:
+            print(f"📅 Última fecha en BD: {max_calldate}")
+            return pd.to_datetime(max_calldate)
         else:
             print("📅 Tabla vacía - primera carga")
             return None
@@ -95,17 +129,21 @@ def obtener_ultima_fecha_oracle():
 # 📥 FUNCIÓN PARA DESCARGAR DATOS NUEVOS
 # ============================================================================
 
-def descargar_datos_nuevos(ultima_fecha):
-    """Descarga todas las páginas y filtra localmente registros desde ultima_fecha - 3 días"""
+def calldate_api(valor):
+    """Convierte un calldate crudo de la API a fecha (None si no es válido)"""
+    fecha = pd.to_datetime(valor, errors='coerce')
+    return None if pd.isna(fecha) else fecha
+
+def descargar_datos_nuevos(ultima_fecha, pendiente=None):
+    """
+    Descarga en streaming y filtra cada página al llegar: registros desde ultima_fecha - 3 días.
+    Con pendiente (calldate desde el que quedaron páginas fallidas en el punto
+    de control) la ventana baja hasta ahí y esos registros no se descartan.
+    Devuelve (DataFrame, info de la descarga o None si falló).
+    """
     print("\n📥 Descargando datos nuevos desde oikost...")
     
-    session = requests.Session()
-    session.verify = False
-    session.headers.update({
-        'Authorization': TOKEN_BASIC,
-        'User-Agent': 'Mozilla/5.0',
-        'Accept': 'application/json'
-    })
+    session = crear_sesion(headers, OIKOST_WORKERS)
     
     # Calcular fecha límite
     if ultima_fecha:
@@ -115,153 +153,196 @@ def descargar_datos_nuevos(ultima_fecha):
         fecha_limite = datetime.now() - timedelta(days=30)
         print(f"📅 Primera carga: desde {fecha_limite}")
     
-    todos_datos = []
-    pagina = 1
-    total_paginas = None
-    pbar = None
+    if pendiente is not None and pendiente < fecha_limite:
+        fecha_limite = pendiente
+        print(f"⏪ Retomando páginas fallidas: desde {fecha_limite}")
+    
+    def filtrar_pagina(columnas):
+        """Convierte una página (en columnas) en DataFrame y conserva solo calldate >= fecha_limite"""
+        with etapa('filtro') as m:
+            df_pagina = pd.DataFrame(columnas)
+            if df_pagina.empty:
+                return df_pagina
+            calldate_dt = pd.to_datetime(df_pagina['calldate'], errors='coerce')
+            conservar = calldate_dt >= fecha_limite
+            if ultima_fecha:
+                nuevos = calldate_dt > ultima_fecha
+                if pendiente is not None:
+                    nuevos |= calldate_dt >= pendiente
+                conservar &= nuevos
+            df_pagina = df_pagina[conservar]
+            m['filas'] = len(df_pagina)
+            return df_pagina
+    
+    trozos = []
+    info = None
     
     try:
-        while True:
-            response = session.get(f"{API_URL}?page={pagina}", timeout=60)
-            
-            if response.status_code != 200:
-                print(f"❌ Error {response.status_code} en página {pagina}")
-                break
-            
-            data = response.json()
-            registros = data.get('data', [])
-            
-            if pagina == 1:
-                total_registros = data.get('total', 0)
-                total_paginas = data.get('totalPages', 1)
-                print(f"📊 API tiene {total_registros:,} registros totales")
-                print(f"📑 Total páginas: {total_paginas}")
-                
-                if total_registros == 0:
-                    print("⚠️ No hay datos")
-                    return []
-                
-                pbar = tqdm(total=total_paginas, desc="Descargando páginas")
-            
-            todos_datos.extend(registros)
-            if pbar:
-                pbar.update(1)
-            
-            if pagina >= total_paginas:
-                break
-                
-            pagina += 1
-            time.sleep(0.3)
+        # Las páginas que fallan tras los reintentos quedan en el punto de control
+        with etapa('descarga') as m:
+            trozos, info = descargar_paginas(
+                session, API_URL,
+                workers=OIKOST_WORKERS,
+                max_rps=OIKOST_MAX_RPS,
+                timeout=60,
+                reintentos=OIKOST_REINTENTOS,
+                adaptativo=OIKOST_ADAPTATIVO,
+                tope_rps=OIKOST_TOPE_RPS or None,
+                fecha_limite=fecha_limite if OIKOST_BUSQUEDA_LIMITE else None,
+                a_fecha=calldate_api,
+                al_llegar=filtrar_pagina
+            )
+            m['filas'] = info['registros_descargados']
+        
+        if info['total'] == 0 and not info['paginas_fallidas']:
+            print("⚠️ No hay datos")
+            return pd.DataFrame(), info
+        
+        if info['paginas_fallidas']:
+            print(f"⚠️ Páginas fallidas (quedan en el punto de control): {info['paginas_fallidas']}")
             
     except Exception as e:
         print(f"❌ Error en descarga: {e}")
-    finally:
-        if pbar:
-            pbar.close()
+        return pd.DataFrame(), None
     
-    print(f"✅ Descargados {len(todos_datos):,} registros crudos")
+    print(f"✅ Descargados {info['registros_descargados']:,} registros crudos")
     
-    # Filtrar por fecha
-    if todos_datos:
-        df_temp = pd.DataFrame(todos_datos)
-        df_temp['calldate_dt'] = pd.to_datetime(df_temp['calldate'], errors='coerce')
-        
-        df_filtrado = df_temp[df_temp['calldate_dt'] >= fecha_limite]
-        print(f"🔍 Después de filtrar por fecha: {len(df_filtrado)} registros")
-        
-        if ultima_fecha:
-            df_filtrado = df_filtrado[df_filtrado['calldate_dt'] > ultima_fecha]
-            print(f"🔍 Después de filtrar > última fecha: {len(df_filtrado)} registros realmente nuevos")
-        
-        # Eliminar columna temporal
-        df_filtrado = df_filtrado.drop(columns=['calldate_dt'])
-        return df_filtrado.to_dict('records')
+    # Solo quedan en memoria los registros que pasaron el filtro de fecha
+    trozos = [t for t in trozos if not t.empty]
+    if not trozos:
+        return pd.DataFrame(), info
+    
+    with etapa('transformacion') as m:
+        df_filtrado = pd.concat(trozos, ignore_index=True)
+        print(f"🔍 Después de filtrar por fecha: {len(df_filtrado)} registros realmente nuevos")
+        m['filas'] = len(df_filtrado)
+    return df_filtrado, info
+
+# ============================================================================
+# 🧱 FUNCIÓN PARA ASEGURAR LA TABLA DE STAGING (GLOBAL TEMPORARY)
+# ============================================================================
+
+def asegurar_tabla_staging(cursor, tipos):
+    """Crea la tabla temporal global con los tipos del mapa y agrega columnas nuevas de la API"""
+    cursor.execute("""
+        SELECT COLUMN_NAME FROM USER_TAB_COLUMNS 
+        WHERE TABLE_NAME = UPPER(:1)
+    """, [STAGING_TABLE])
+    existentes = {fila[0] for fila in cursor.fetchall()}
+    
+    if not existentes:
+        print(f"   🏗️ Creando tabla de staging {STAGING_TABLE} (GLOBAL TEMPORARY)...")
+        col_defs = ", ".join([f'"{col}" {definicion(*tipo)}' for col, tipo in tipos.items()])
+        cursor.execute(f"CREATE GLOBAL TEMPORARY TABLE {STAGING_TABLE} ({col_defs}) ON COMMIT DELETE ROWS")
+        return
     
-    return todos_datos
+    nuevas = [col for col in tipos if col not in existentes]
+    if nuevas:
+        print(f"   🔧 Agregando columnas al staging: {nuevas}")
+        col_defs = ", ".join([f'"{col}" {definicion(*tipos[col])}' for col in nuevas])
+        cursor.execute(f"ALTER TABLE {STAGING_TABLE} ADD ({col_defs})")
 
 # ============================================================================
 # 📦 FUNCIÓN DE MERGE EN ORACLE
 # ============================================================================
 
-def merge_en_oracle(datos):
-    if not datos:
+def merge_en_oracle(df):
+    import oracledb
+
+    if df.empty:
         print("⚠️ No hay datos nuevos para procesar")
         return 0
     
-    print(f"\n📦 Procesando MERGE de {len(datos):,} registros en {TABLE_NAME}...")
+    # Si las páginas se corren durante la descarga un registro llega dos veces;
+    # el MERGE (y el índice único de uniqueid) exige un uniqueid por fila: queda la última versión
+    filas_descargadas = len(df)
+    df = df.drop_duplicates(subset=['uniqueid'], keep='last')
+    if len(df) < filas_descargadas:
+        print(f"🧹 {filas_descargadas - len(df):,} registros repetidos por uniqueid descartados")
+    
+    print(f"\n📦 Procesando MERGE de {len(df):,} registros en {TABLE_NAME}...")
     
-    connection = oracledb.connect(
-        user=ORACLE_USER,
-        password=ORACLE_PASSWORD,
-        dsn=ORACLE_DSN
-    )
+    connection = conectar()
     cursor = connection.cursor()
     
     try:
         # Obtener columnas
-        columnas = list(datos[0].keys())
+        columnas = list(df.columns)
         print(f"   📋 Columnas detectadas: {columnas}")
         
+        # Tabla con los tipos del mapa (la crea o le agrega/amplía columnas; la de texto no se migra)
+        tipos = asegurar_esquema(connection, TABLE_NAME, df, STAGING_TABLE)
+        
         # Construir partes del MERGE
-        set_clause = ", ".join([f'T."{col}" = S."{col}"' for col in columnas if col != 'uniqueid'])
+        actualizables = [col for col in columnas if col != 'uniqueid']
+        set_clause = ", ".join([f'T."{col}" = S."{col}"' for col in actualizables])
+        # DECODE trata NULL = NULL como igual: solo se reescriben filas que realmente cambian
+        where_cambios = ""
+        if MERGE_DETECTAR_CAMBIOS and actualizables:
+            where_cambios = "WHERE " + " OR ".join(
+                [f'DECODE(T."{col}", S."{col}", 0, 1) = 1' for col in actualizables]
+            )
         cols_insert = ", ".join([f'"{col}"' for col in columnas])
         vals_insert = ", ".join([f'S."{col}"' for col in columnas])
         
-        # Crear tabla temporal
-        temp_table = f"{TABLE_NAME}_TEMP_{int(time.time())}"
-        cursor.execute(f"BEGIN EXECUTE IMMEDIATE 'DROP TABLE {temp_table}'; EXCEPTION WHEN OTHERS THEN NULL; END;")
+        # Tabla de staging (DDL solo la primera vez o si la API trae columnas nuevas)
+        asegurar_tabla_staging(cursor, tipos)
         
-        col_defs = ", ".join([f'"{col}" VARCHAR2(4000)' for col in columnas])
-        cursor.execute(f"CREATE TABLE {temp_table} ({col_defs})")
-        
-        # Insertar datos en temporal
+        # Insertar datos en staging (sin commit: las filas viven hasta el commit final)
         placeholders = ", ".join([f':{i+1}' for i in range(len(columnas))])
-        insert_sql = f"INSERT INTO {temp_table} VALUES ({placeholders})"
+        insert_sql = f"INSERT INTO {STAGING_TABLE} ({cols_insert}) VALUES ({placeholders})"
         
         batch_size = 5000
-        total = len(datos)
-        with tqdm(total=total, desc="Insertando en temporal") as pbar:
+        total = len(df)
+        with etapa('insercion_staging') as m, tqdm(total=total, desc="Insertando en staging") as pbar:
+            m['filas'] = total
+            # calldate como DATE, duration/billsec como número y el resto como texto
+            filas = preparar_filas(df, columnas, tipos)
             for i in range(0, total, batch_size):
-                batch = datos[i:i+batch_size]
-                batch_tuplas = []
-                for reg in batch:
-                    tupla = tuple(reg.get(col, None) for col in columnas)
-                    batch_tuplas.append(tupla)
-                cursor.executemany(insert_sql, batch_tuplas)
-                connection.commit()
+                batch = filas[i:i+batch_size]
+                cursor.executemany(insert_sql, batch)
                 pbar.update(len(batch))
         
+        # Filas del staging que ya existen en la tabla (para separar nuevas de actualizadas)
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM {STAGING_TABLE} S
+            WHERE EXISTS (SELECT 1 FROM {TABLE_NAME} T WHERE T."uniqueid" = S."uniqueid")
+        """)
+        coincidentes = cursor.fetchone()[0]
+        
         # Ejecutar MERGE
         print("   🔄 Ejecutando MERGE...")
         merge_sql = f"""
             MERGE INTO {TABLE_NAME} T
-            USING {temp_table} S
+            USING {STAGING_TABLE} S
             ON (T."uniqueid" = S."uniqueid")
             WHEN MATCHED THEN
                 UPDATE SET {set_clause}
+                {where_cambios}
             WHEN NOT MATCHED THEN
                 INSERT ({cols_insert}) VALUES ({vals_insert})
         """
-        cursor.execute(merge_sql)
-        connection.commit()
-        
-        # Limpiar
-        cursor.execute(f"DROP TABLE {temp_table}")
-        connection.commit()
+        with etapa('merge') as m:
+            cursor.execute(merge_sql)
+            afectadas = cursor.rowcount
+            
+            # Único commit de la ejecución: confirma el MERGE y vacía el staging
+            connection.commit()
+            m['filas'] = afectadas
         
-        # Verificar
-        cursor.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}")
-        total_insertado = cursor.fetchone()[0]
-        print(f"✅ Total registros en tabla: {total_insertado:,}")
+        nuevos = total - coincidentes
+        actualizados = afectadas - nuevos
+        print(f"✅ MERGE completado: {nuevos:,} insertados, {actualizados:,} actualizados, "
+              f"{coincidentes - actualizados:,} sin cambios")
         
-        return len(datos)
+        return len(df)
         
     except Exception as e:
         print(f"❌ Error en MERGE: {e}")
+        # El rollback deshace el MERGE parcial y vacía el staging
         try:
-            cursor.execute(f"DROP TABLE {temp_table}")
-            connection.commit()
-        except:
+            connection.rollback()
+        except oracledb.Error:
             pass
         return 0
     finally:
@@ -282,21 +363,28 @@ def main():
     # 1. Obtener última fecha
     ultima_fecha = obtener_ultima_fecha_oracle()
     
-    # 2. Descargar datos nuevos
-    datos_nuevos = descargar_datos_nuevos(ultima_fecha)
+    # 2. Descargar datos nuevos (más las páginas que quedaron fallidas)
+    punto = leer_punto_control(TABLE_NAME)
+    pendiente = calldate_api(punto['calldate_pendiente']) if punto and punto['calldate_pendiente'] else None
+    datos_nuevos, info = descargar_datos_nuevos(ultima_fecha, pendiente)
     
-    if not datos_nuevos:
+    if datos_nuevos.empty:
         print("✅ No hay datos nuevos para procesar")
+        guardar_punto_control(TABLE_NAME, info)
         return
     
     # 3. Mostrar muestra
     print(f"\n🔍 Muestra del primer registro nuevo:")
-    for k, v in list(datos_nuevos[0].items())[:10]:
+    for k, v in list(datos_nuevos.iloc[0].items())[:10]:
         print(f"   {k}: {v}")
     
     # 4. Hacer MERGE
     insertados = merge_en_oracle(datos_nuevos)
     
+    # 5. Punto de control (solo si el MERGE se confirmó)
+    if insertados:
+        guardar_punto_control(TABLE_NAME, info)
+    
     # Tiempo total
     tiempo_total = time.time() - inicio_total
     minutos = int(tiempo_total // 60)
@@ -308,4 +396,11 @@ def main():
     print(f"{'='*60}")
 
 if __name__ == "__main__":
-    main()
+    inicializar()
+    estado = 'error'
+    try:
+        main()
+        estado = 'ok'
+    finally:
+        cerrar_pool()
+        guardar_metricas('merge_oikost_crudo', estado)
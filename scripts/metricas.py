@@ -0,0 +1,128 @@
+# ============================================================================
+# 📈 MÉTRICAS POR ETAPA (JSON POR EJECUCIÓN)
+# ============================================================================
+# Compartido por los cuatro scripts. Cada etapa (descarga, parseo, filtro,
+# transformacion, preparacion_binds, insercion_staging, merge,
+# lectura_oracle, escritura_parquet, subida) se mide con:
+#
+#     with etapa('merge') as m:
+#         ...
+#         m['filas'] = afectadas
+#
+# y guardar_metricas(script) escribe un JSON por ejecución en METRICAS_DIR.
+# Si una etapa se repite (un lote, una página, una partición) se acumula:
+# tiempos, filas y bytes se suman y 'veces' cuenta las repeticiones. Las
+# etapas medidas dentro de hilos (parseo y filtro de cada página) suman la
+# duración de cada llamada y el CPU de su hilo, así que pueden pasar del
+# tiempo de pared de la descarga que las contiene.
+#
+# La memoria de cada etapa es la del proceso: rss_pico_proceso_mb es el pico
+# del proceso hasta el final de la etapa (no baja en las etapas siguientes) y
+# rss_delta_mb lo que creció la memoria residente durante la etapa (el mayor
+# de sus repeticiones; en etapas de hilos incluye lo que hicieron los demás).
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: sin pico de memoria
+    resource = None
+
+METRICAS_DIR = 'metricas'
+
+_ETAPAS = {}
+_LOCK = threading.Lock()
+_INICIO = {'fecha': datetime.now(), 'pared': time.perf_counter(), 'cpu': time.process_time()}
+
+def rss_pico_mb():
+    """Memoria residente máxima del proceso hasta ahora (MB)"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def rss_actual_mb():
+    """Memoria residente actual del proceso (MB), solo en Linux"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _cpu():
+    # En hilos secundarios el CPU del proceso incluiría el de los demás hilos
+    if threading.current_thread() is threading.main_thread():
+        return time.process_time()
+    return time.thread_time()
+
+@contextmanager
+def etapa(nombre):
+    """Mide el bloque como la etapa nombre; el dict que entrega acepta 'filas' y 'bytes'"""
+    medida = {'filas': None, 'bytes': None}
+    inicio_pared = time.perf_counter()
+    inicio_cpu = _cpu()
+    inicio_rss = rss_actual_mb()
+    error = False
+    try:
+        yield medida
+    except BaseException:
+        error = True
+        raise
+    finally:
+        pared = time.perf_counter() - inicio_pared
+        cpu = _cpu() - inicio_cpu
+        rss = rss_actual_mb()
+        with _LOCK:
+            registro = _ETAPAS.setdefault(nombre, {
+                'etapa': nombre, 'veces': 0, 'pared_s': 0.0, 'cpu_s': 0.0,
+                'filas': None, 'bytes': None, 'rss_pico_proceso_mb': None, 'rss_mb': None,
+                'rss_delta_mb': None, 'errores': 0,
+            })
+            registro['veces'] += 1
+            registro['pared_s'] += pared
+            registro['cpu_s'] += cpu
+            for clave in ('filas', 'bytes'):
+                if medida[clave] is not None:
+                    registro[clave] = (registro[clave] or 0) + int(medida[clave])
+            registro['rss_pico_proceso_mb'] = rss_pico_mb()
+            registro['rss_mb'] = rss
+            if rss is not None and inicio_rss is not None:
+                registro['rss_delta_mb'] = max(registro['rss_delta_mb'] or 0.0, rss - inicio_rss)
+            registro['errores'] += error
+
+def etapas():
+    """Copia de las etapas medidas hasta ahora, en el orden en que empezaron"""
+    with _LOCK:
+        return [dict(r) for r in _ETAPAS.values()]
+
+def resumen(script, estado='ok'):
+    """Diccionario de la ejecución completa (lo que guardar_metricas escribe)"""
+    return {
+        'script': script,
+        'inicio': _INICIO['fecha'].isoformat(timespec='seconds'),
+        'fin': datetime.now().isoformat(timespec='seconds'),
+        'estado': estado,
+        'pared_s': time.perf_counter() - _INICIO['pared'],
+        'cpu_s': time.process_time() - _INICIO['cpu'],
+        'rss_pico_mb': rss_pico_mb(),
+        'etapas': etapas(),
+    }
+
+def guardar_metricas(script, estado='ok', directorio=None):
+    """Escribe {directorio}/{script}_{fecha}.json (METRICAS_DIR del entorno o 'metricas')"""
+    directorio = directorio or os.environ.get('METRICAS_DIR', METRICAS_DIR)
+    datos = resumen(script, estado)
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        ruta = os.path.join(directorio, f"{script}_{_INICIO['fecha']:%Y%m%d_%H%M%S}.json")
+        with open(ruta, 'w') as f:
+            json.dump(datos, f, indent=2)
+    except OSError as e:
+        print(f"⚠️ No se pudieron guardar las métricas: {e}")
+        return None
+    print(f"📈 Métricas: {ruta}")
+    return ruta
@@ -0,0 +1,84 @@
+# ============================================================================
+# SCRIPT: MIGRACIÓN DE CDR_OIKOST_CRUDO A COLUMNAS TIPADAS (MANUAL)
+# ============================================================================
+# Uso: python scripts/migrar_oikost_crudo.py
+#
+# La carga diaria y el backfill siguen cargando en texto una tabla que aún
+# tiene calldate como VARCHAR2; la migración a DATE / NUMBER solo la hace
+# este script (ver esquema_crudo.migrar_esquema). Copia la tabla por lotes
+# a CDR_OIKOST_CRUDO_NUEVA con las mismas conversiones de la carga diaria y
+# solo la intercambia si ningún valor con dato quedó en NULL; si alguno no
+# convierte, reporta cuántos y ejemplos por columna, borra la copia y la
+# tabla de texto sigue viva. La anterior queda como CDR_OIKOST_CRUDO_TEXTO.
+#
+# No correrlo al mismo tiempo que merge_oikost_crudo.py ni un backfill de
+# oikost: lo que se cargue durante la copia no pasa a la tabla nueva.
+#
+# Variables de entorno:
+#   MIGRACION_SOLO_VERIFICAR   1 = solo leer y convertir, sin crear ni renombrar nada (0)
+
+import os
+import sys
+import time
+from conexion_oracle import conectar, cerrar_pool
+from esquema_crudo import migrar_esquema
+from metricas import etapa, guardar_metricas
+
+# ============================================================================
+# 🛠️ CONFIGURACIÓN CON VARIABLES DE ENTORNO
+# ============================================================================
+
+ORACLE_USER = os.environ.get('ORACLE_USER')
+ORACLE_PASSWORD = os.environ.get('ORACLE_PASSWORD')
+ORACLE_DSN = os.environ.get('ORACLE_DSN')
+
+TABLE_NAME = "CDR_OIKOST_CRUDO"
+MIGRACION_SOLO_VERIFICAR = os.environ.get('MIGRACION_SOLO_VERIFICAR', '0') == '1'
+
+# ============================================================================
+# 🎯 FUNCIÓN PRINCIPAL
+# ============================================================================
+
+def main():
+    faltantes = [nombre for nombre, valor in (('ORACLE_USER', ORACLE_USER),
+                                              ('ORACLE_PASSWORD', ORACLE_PASSWORD),
+                                              ('ORACLE_DSN', ORACLE_DSN)) if not valor]
+    if faltantes:
+        print(f"❌ FALTAN CREDENCIALES: {', '.join(faltantes)}")
+        sys.exit(1)
+
+    modo = "VERIFICACIÓN (sin cambios)" if MIGRACION_SOLO_VERIFICAR else "MIGRACIÓN"
+    print("=" * 80)
+    print(f"🧬 {modo} DE {TABLE_NAME} A COLUMNAS TIPADAS")
+    print("=" * 80)
+
+    inicio = time.time()
+    connection = conectar()
+    try:
+        with etapa('migracion') as m:
+            revisadas = migrar_esquema(connection, TABLE_NAME, MIGRACION_SOLO_VERIFICAR)
+            m['filas'] = revisadas
+    except RuntimeError as e:
+        print(f"\n❌ No se migró: {e}")
+        sys.exit(1)
+    finally:
+        connection.close()
+
+    if revisadas and MIGRACION_SOLO_VERIFICAR:
+        print(f"\n✅ {revisadas:,} filas revisadas: todos los valores convierten, se puede migrar")
+    elif revisadas:
+        print(f"\n✅ {revisadas:,} filas migradas; la tabla anterior quedó como {TABLE_NAME}_TEXTO")
+    print(f"⏱️  Tiempo total: {time.time() - inicio:.0f} segundos")
+
+# ============================================================================
+# 🏃 EJECUTAR
+# ============================================================================
+
+if __name__ == "__main__":
+    estado = 'error'
+    try:
+        main()
+        estado = 'ok'
+    finally:
+        cerrar_pool()
+        guardar_metricas('migrar_oikost_crudo', estado)
@@ -3,20 +3,15 @@
 # ============================================================================
 
 import os
-import pandas as pd
 import tempfile
 import time
-from sqlalchemy import create_engine, text
-from oci.object_storage import ObjectStorageClient
-from tqdm import tqdm
 import urllib3
 import sys
-
-urllib3.disable_warnings()
-
-print("=" * 80)
-print("🚀 INICIO DEL PROCESO: CDR_OIKOST_CRUDO -> PARQUET")
-print("=" * 80)
+from conexion_oracle import crear_engine, cerrar_pool
+from metricas import guardar_metricas
+from exportar_parquet import exportar_a_parquet
+from subida_oci import (upload_to_oci_force_overwrite, huella_archivo, sin_cambios,
+                        TAMANO_PARTE_MB, PARTES_PARALELAS, VERSIONES_CONSERVAR, VERSIONES_DIAS)
 
 # ============================================================================
 # 📥 CONFIGURACIÓN CON VARIABLES DE ENTORNO (SECRETS)
@@ -42,111 +37,89 @@ NAMESPACE = "idazkw2d7ca6"
 TABLA_ORIGEN = "CDR_OIKOST_CRUDO"
 ARCHIVO_PARQUET = "CDR_OIKOST_CRUDO.parquet"
 NOMBRE_AMIGABLE = "CDR OIKOST Crudo"
+# Orden total de la lectura (uniqueid es único): sin cambios en la tabla sale el
+# mismo archivo byte a byte y la huella permite omitir la subida
+ORDER_BY_CRUDO = 'ORDER BY "uniqueid"'
 
-# Verificar credenciales obligatorias
-credenciales_faltantes = []
-if not ORACLE_USER: credenciales_faltantes.append("ORACLE_USER")
-if not ORACLE_PASSWORD: credenciales_faltantes.append("ORACLE_PASSWORD")
-if not ORACLE_DSN: credenciales_faltantes.append("ORACLE_DSN")
-if not OCI_USER_OCID: credenciales_faltantes.append("OCI_USER_OCID")
-if not OCI_TENANCY_OCID: credenciales_faltantes.append("OCI_TENANCY_OCID")
-if not OCI_KEY_FINGERPRINT: credenciales_faltantes.append("OCI_KEY_FINGERPRINT")
-if not OCI_PRIVATE_KEY: credenciales_faltantes.append("OCI_PRIVATE_KEY")
+# --- Subida multiparte a OCI (partes en paralelo, reintento por parte) ---
+OCI_PARTE_MB = int(os.environ.get('OCI_PARTE_MB', str(TAMANO_PARTE_MB)))
+OCI_PARTES_PARALELAS = int(os.environ.get('OCI_PARTES_PARALELAS', str(PARTES_PARALELAS)))
 
-if credenciales_faltantes:
-    print("❌ FALTAN CREDENCIALES:")
-    for cred in credenciales_faltantes:
-        print(f"   - {cred}")
-    sys.exit(1)
+# --- Retención de versiones en el bucket (0 y 0 = se borran todas al subir) ---
+OCI_VERSIONES_CONSERVAR = int(os.environ.get('OCI_VERSIONES_CONSERVAR', str(VERSIONES_CONSERVAR)))
+OCI_VERSIONES_DIAS = int(os.environ.get('OCI_VERSIONES_DIAS', str(VERSIONES_DIAS)))
 
-print("✅ Todas las credenciales encontradas.")
+# --- Subir aunque la huella (SHA-256) del archivo coincida con la del bucket ---
+OCI_FORZAR_SUBIDA = os.environ.get('OCI_FORZAR_SUBIDA', '0') == '1'
 
 # ============================================================================
-# 🔧 CONFIGURACIÓN OCI SDK
+# 🔧 INICIALIZACIÓN: CREDENCIALES Y CLIENTE OCI
 # ============================================================================
+# Importar el módulo no imprime, no verifica credenciales ni escribe la clave:
+# todo eso lo hace inicializar() desde el bloque de ejecución.
 
 KEY_FILE_PATH = "/tmp/oci_key_oikost.pem"
 OBJECT_STORAGE_CLIENT = None
 
-try:
-    # Escribir la clave privada en un archivo temporal
-    with open(KEY_FILE_PATH, 'w') as f:
-        f.write(OCI_PRIVATE_KEY.strip())
-
-    OCI_CONFIG = {
-        "user": OCI_USER_OCID,
-        "fingerprint": OCI_KEY_FINGERPRINT,
-        "key_file": KEY_FILE_PATH,
-        "tenancy": OCI_TENANCY_OCID,
-        "region": REGION
-    }
-
-    OBJECT_STORAGE_CLIENT = ObjectStorageClient(OCI_CONFIG)
-    print("✅ Configuración OCI SDK exitosa.\n")
+def inicializar():
+    """Verifica las credenciales y crea el cliente OCI (sale con código 1 si falta alguna)"""
+    global OBJECT_STORAGE_CLIENT
+
+    urllib3.disable_warnings()
+
+    print("=" * 80)
+    print("🚀 INICIO DEL PROCESO: CDR_OIKOST_CRUDO -> PARQUET")
+    print("=" * 80)
+
+    # Verificar credenciales obligatorias
+    credenciales_faltantes = []
+    if not ORACLE_USER: credenciales_faltantes.append("ORACLE_USER")
+    if not ORACLE_PASSWORD: credenciales_faltantes.append("ORACLE_PASSWORD")
+    if not ORACLE_DSN: credenciales_faltantes.append("ORACLE_DSN")
+    if not OCI_USER_OCID: credenciales_faltantes.append("OCI_USER_OCID")
+    if not OCI_TENANCY_OCID: credenciales_faltantes.append("OCI_TENANCY_OCID")
+    if not OCI_KEY_FINGERPRINT: credenciales_faltantes.append("OCI_KEY_FINGERPRINT")
+    if not OCI_PRIVATE_KEY: credenciales_faltantes.append("OCI_PRIVATE_KEY")
+
+    if credenciales_faltantes:
+        print("❌ FALTAN CREDENCIALES:")
+        for cred in credenciales_faltantes:
+            print(f"   - {cred}")
+        sys.exit(1)
 
-except Exception as e:
-    print(f"❌ Error al configurar OCI SDK: {e}")
-    # No salimos, pero no podremos subir a OCI
+    print("✅ Todas las credenciales encontradas.")
 
-# ============================================================================
-# 🧹 FUNCIONES AUXILIARES
-# ============================================================================
-
-def limpiar_versiones_antiguas(client, namespace, bucket_name, object_name):
-    """Elimina TODAS las versiones anteriores de un objeto"""
     try:
-        versions = client.list_object_versions(
-            namespace_name=namespace,
-            bucket_name=bucket_name,
-            prefix=object_name
-        ).data.items
+        from oci.object_storage import ObjectStorageClient
 
-        if not versions:
-            return
+        # Escribir la clave privada en un archivo temporal
+        with open(KEY_FILE_PATH, 'w') as f:
+            f.write(OCI_PRIVATE_KEY.strip())
 
-        for version in versions:
-            try:
-                client.delete_object(
-                    namespace_name=namespace,
-                    bucket_name=bucket_name,
-                    object_name=version.name,
-                    version_id=version.version_id
-                )
-                print(f"   🗑️ Versión eliminada: {version.version_id}")
-            except:
-                pass
-    except Exception as e:
-        print(f"   ⚠️ Error limpiando versiones: {e}")
+        OCI_CONFIG = {
+            "user": OCI_USER_OCID,
+            "fingerprint": OCI_KEY_FINGERPRINT,
+            "key_file": KEY_FILE_PATH,
+            "tenancy": OCI_TENANCY_OCID,
+            "region": REGION
+        }
 
-def upload_to_oci_force_overwrite(client, namespace, bucket_name, object_name, file_path, pbar):
-    """Sube archivo a OCI con sobrescritura REAL"""
-    if not client:
-        return False
-
-    try:
-        print(f"\n   🧹 Limpiando versiones anteriores...")
-        limpiar_versiones_antiguas(client, namespace, bucket_name, object_name)
-
-        with open(file_path, 'rb') as f:
-            client.put_object(
-                namespace_name=namespace,
-                bucket_name=bucket_name,
-                object_name=object_name,
-                put_object_body=f
-            )
-
-        return True
+        OBJECT_STORAGE_CLIENT = ObjectStorageClient(OCI_CONFIG)
+        print("✅ Configuración OCI SDK exitosa.\n")
 
     except Exception as e:
-        print(f"\n❌ Error al subir: {e}")
-        return False
+        print(f"❌ Error al configurar OCI SDK: {e}")
+        # No salimos, pero no podremos subir a OCI
 
 # ============================================================================
 # 🎯 FUNCIÓN PRINCIPAL
 # ============================================================================
 
 def main():
+    from sqlalchemy import text
+
     inicio_total = time.time()
+    estado = 'ok'
 
     # Verificar cliente OCI
     if not OBJECT_STORAGE_CLIENT:
@@ -163,11 +136,7 @@ def main():
     try:
         # 1. Conectar a Oracle
         print("🔌 Conectando a Oracle...")
-        engine = create_engine(
-            f"oracle+oracledb://{ORACLE_USER}:{ORACLE_PASSWORD}@{ORACLE_DSN}",
-            arraysize=5000,
-            max_identifier_length=128
-        )
+        engine = crear_engine()
 
         # 2. Contar registros
         with engine.connect() as conn:
@@ -175,78 +144,81 @@ def main():
             total_registros = result.scalar()
             print(f"📊 Total en BD: {total_registros:,} registros")
 
-        # 3. Leer TODOS los datos
-        print(f"\n📚 Leyendo datos de {TABLA_ORIGEN}...")
-        inicio_lectura = time.time()
+        # 3. Crear archivo temporal
+        with tempfile.NamedTemporaryFile(suffix=".parquet", delete=False) as tmp:
+            ruta_temporal = tmp.name
+
+        # 4. Leer y guardar como Parquet en streaming (lote a lote)
+        print(f"\n📚 Exportando {TABLA_ORIGEN} a Parquet por lotes...")
+        inicio_parquet = time.time()
+
+        def _mostrar_muestra(df_lote):
+            print(f"\n🔍 Muestra de las primeras 3 filas:")
+            print(df_lote.head(3).to_string())
 
-        df = pd.read_sql(f'SELECT * FROM "{TABLA_ORIGEN}"', engine)
+        resultado_export = exportar_a_parquet(
+            f'SELECT * FROM "{TABLA_ORIGEN}" {ORDER_BY_CRUDO}',
+            ruta_temporal,
+            al_primer_lote=_mostrar_muestra,
+            compression='snappy',
+            row_group_size=100000
+        )
 
-        tiempo_lectura = time.time() - inicio_lectura
-        registros_leidos = len(df)
+        tiempo_parquet = time.time() - inicio_parquet
+        registros_leidos = resultado_export['filas']
 
-        print(f"✅ Leídos {registros_leidos:,} registros en {tiempo_lectura:.2f} segundos")
+        print(f"✅ Leídos {registros_leidos:,} registros en {resultado_export['tiempo_lectura']:.2f} segundos")
 
         if registros_leidos != total_registros:
             print(f"⚠️ ALERTA: Leídos {registros_leidos:,} vs {total_registros:,} en BD")
         else:
             print(f"✅ Integridad verificada: {registros_leidos:,} registros")
 
-        if df.empty:
+        if registros_leidos == 0:
             print("❌ La tabla está vacía")
+            os.remove(ruta_temporal)
             return
 
-        # 4. Mostrar muestra de datos
-        print(f"\n🔍 Muestra de las primeras 3 filas:")
-        print(df.head(3).to_string())
-
-        # 5. Crear archivo temporal
-        with tempfile.NamedTemporaryFile(suffix=".parquet", delete=False) as tmp:
-            ruta_temporal = tmp.name
-
-        # 6. Guardar como Parquet
-        print(f"\n💾 Guardando como Parquet...")
-        inicio_parquet = time.time()
-
-        df.to_parquet(
-            ruta_temporal,
-            index=False,
-            engine='pyarrow',
-            compression='snappy',
-            row_group_size=100000
-        )
-
-        tiempo_parquet = time.time() - inicio_parquet
         tamaño_mb = os.path.getsize(ruta_temporal) / (1024 * 1024)
 
         print(f"✅ Archivo creado: {tamaño_mb:.2f} MB")
-        print(f"⏱️  Tiempo de compresión: {tiempo_parquet:.2f} segundos")
+        print(f"⏱️  Tiempo de compresión: {resultado_export['tiempo_escritura']:.2f} segundos")
+        print(f"⏱️  Tiempo total de exportación: {tiempo_parquet:.2f} segundos")
 
-        # 7. Subir a OCI (si hay cliente)
+        # 5. Subir a OCI (si hay cliente y el contenido cambió)
         if subir:
-            print(f"\n☁️ Subiendo a OCI bucket '{BUCKET_NAME}'...")
-            with tqdm(total=100, desc="Subiendo", unit="%", ncols=80) as pbar:
-                pbar.update(10)
+            huella = huella_archivo(ruta_temporal)
+            if not OCI_FORZAR_SUBIDA and sin_cambios(OBJECT_STORAGE_CLIENT, NAMESPACE, BUCKET_NAME,
+                                                     ARCHIVO_PARQUET, huella):
+                resultado = None
+                print(f"\n⏭️ {ARCHIVO_PARQUET} no cambió desde la última subida (huella {huella[:12]}...)")
+                print(f"   Se omiten la limpieza de versiones y la subida")
+            else:
+                print(f"\n☁️ Subiendo a OCI bucket '{BUCKET_NAME}'...")
                 resultado = upload_to_oci_force_overwrite(
                     client=OBJECT_STORAGE_CLIENT,
                     namespace=NAMESPACE,
                     bucket_name=BUCKET_NAME,
                     object_name=ARCHIVO_PARQUET,
                     file_path=ruta_temporal,
-                    pbar=pbar
+                    tamano_parte_mb=OCI_PARTE_MB,
+                    partes_paralelas=OCI_PARTES_PARALELAS,
+                    conservar=OCI_VERSIONES_CONSERVAR,
+                    dias=OCI_VERSIONES_DIAS,
+                    huella=huella
                 )
-                pbar.update(90)
 
             if resultado:
                 print(f"\n✅ Archivo subido exitosamente!")
                 print(f"   📁 {ARCHIVO_PARQUET}")
                 print(f"   📦 {tamaño_mb:.2f} MB")
                 print(f"   📊 {registros_leidos:,} registros")
-            else:
+            elif resultado is False:
                 print(f"\n❌ Error al subir el archivo")
         else:
             print(f"\n✅ Archivo Parquet generado localmente: {ruta_temporal}")
 
-        # 8. Limpiar archivo temporal
+        # 6. Limpiar archivo temporal
         if os.path.exists(ruta_temporal):
             os.remove(ruta_temporal)
             print(f"\n🧹 Archivo temporal eliminado.")
@@ -263,19 +235,23 @@ def main():
         print(f"{'='*60}")
 
     except Exception as e:
+        estado = 'error'
         print(f"\n❌ Error general: {e}")
         import traceback
         traceback.print_exc()
         sys.exit(1)
 
     finally:
+        cerrar_pool()
         if os.path.exists(KEY_FILE_PATH):
             os.remove(KEY_FILE_PATH)
             print("🧹 Clave privada eliminada.")
+        guardar_metricas('parquet_oikost_crudo', estado)
 
 # ============================================================================
 # 🏃 EJECUTAR
 # ============================================================================
 
 if __name__ == "__main__":
+    inicializar()
     main()
@@ -0,0 +1,231 @@
+# ============================================================================
+# 📍 PUNTO DE CONTROL DE LA DESCARGA (TABLAS DE CONTROL EN ORACLE)
+# ============================================================================
+# Compartido por cdr_merge.py y merge_oikost_crudo.py. Por cada proceso (la
+# tabla destino) guarda el resultado de la última descarga ya confirmada:
+#
+#   CDR_PUNTO_CONTROL          una fila por proceso: última página ingerida
+#                              sin huecos, calldate y uniqueid más altos
+#                              vistos, total de la API y CALLDATE_PENDIENTE
+#   CDR_PUNTO_CONTROL_PAGINAS  una fila por página: OK o FALLIDA, intentos,
+#                              registros y rango de calldate
+#
+# Los números de página se corren cada vez que llegan llamadas nuevas, así
+# que la siguiente ejecución no pide "la página 37" sino lo que quedó desde
+# CALLDATE_PENDIENTE: el calldate más viejo de las páginas vecinas de cada
+# página fallida (lo que sí se ingirió a su alrededor). Los scripts bajan su
+# fecha límite hasta ahí y no descartan esos registros por ser anteriores a
+# la última fecha de la tabla. Con la búsqueda por bisección activada se
+# piden solo las páginas desde la fallida más vieja y las nuevas.
+#
+# Los calldate se guardan crudos (como los manda la API); cada script los
+# convierte con su propia función de fecha.
+
+from conexion_oracle import conectar
+from descarga_api import clave_uniqueid
+
+TABLA_PUNTO_CONTROL = "CDR_PUNTO_CONTROL"
+TABLA_PAGINAS = f"{TABLA_PUNTO_CONTROL}_PAGINAS"
+
+# ============================================================================
+# 🧱 TABLAS DE CONTROL
+# ============================================================================
+
+def _existe_tabla(cursor, tabla):
+    cursor.execute("""
+        SELECT COUNT(*) FROM USER_TABLES
+        WHERE TABLE_NAME = UPPER(:1)
+    """, [tabla])
+    return cursor.fetchone()[0] > 0
+
+def asegurar_tablas(cursor):
+    """Crea las tablas de control la primera vez"""
+    if not _existe_tabla(cursor, TABLA_PUNTO_CONTROL):
+        print(f"   🏗️ Creando tabla de control {TABLA_PUNTO_CONTROL}...")
+        cursor.execute(f"""
+            CREATE TABLE {TABLA_PUNTO_CONTROL} (
+                PROCESO VARCHAR2(100) PRIMARY KEY,
+                ESTADO VARCHAR2(20),
+                ULTIMA_PAGINA NUMBER(10),
+                TOTAL_PAGINAS NUMBER(10),
+                TOTAL_API NUMBER(12),
+                PAGINAS_FALLIDAS NUMBER(10),
+                CALLDATE_MAX VARCHAR2(40),
+                UNIQUEID_MAX VARCHAR2(100),
+                CALLDATE_PENDIENTE VARCHAR2(40),
+                FECHA_ACTUALIZACION TIMESTAMP DEFAULT SYSTIMESTAMP
+            )
+        """)
+
+    if not _existe_tabla(cursor, TABLA_PAGINAS):
+        print(f"   🏗️ Creando tabla de control {TABLA_PAGINAS}...")
+        cursor.execute(f"""
+            CREATE TABLE {TABLA_PAGINAS} (
+                PROCESO VARCHAR2(100),
+                PAGINA NUMBER(10),
+                ESTADO VARCHAR2(20),
+                INTENTOS NUMBER(5),
+                REGISTROS NUMBER(10),
+                CALLDATE_MIN VARCHAR2(40),
+                CALLDATE_MAX VARCHAR2(40),
+                UNIQUEID_MAX VARCHAR2(100),
+                PRIMARY KEY (PROCESO, PAGINA)
+            )
+        """)
+
+# ============================================================================
+# 📖 LECTURA
+# ============================================================================
+
+def leer_punto_control(proceso):
+    """Último punto de control del proceso (dict) o None si no hay o no se puede leer"""
+    try:
+        connection = conectar()
+        cursor = connection.cursor()
+        try:
+            if not _existe_tabla(cursor, TABLA_PUNTO_CONTROL):
+                return None
+            cursor.execute(f"""
+                SELECT ESTADO, ULTIMA_PAGINA, TOTAL_PAGINAS, TOTAL_API, PAGINAS_FALLIDAS,
+                       CALLDATE_MAX, UNIQUEID_MAX, CALLDATE_PENDIENTE, FECHA_ACTUALIZACION
+                FROM {TABLA_PUNTO_CONTROL}
+                WHERE PROCESO = :1
+            """, [proceso])
+            fila = cursor.fetchone()
+        finally:
+            cursor.close()
+            connection.close()
+    except Exception as e:
+        print(f"⚠️ No se pudo leer el punto de control: {e}")
+        return None
+
+    if fila is None:
+        return None
+    punto = dict(zip(
+        ['estado', 'ultima_pagina', 'total_paginas', 'total_api', 'paginas_fallidas',
+         'calldate_max', 'uniqueid_max', 'calldate_pendiente', 'fecha_actualizacion'],
+        fila
+    ))
+    print(f"📍 Punto de control ({punto['fecha_actualizacion']}): {punto['estado']}, "
+          f"última página {punto['ultima_pagina']} de {punto['total_paginas']}, "
+          f"calldate máximo {punto['calldate_max']}")
+    if punto['calldate_pendiente']:
+        print(f"   ⏪ {punto['paginas_fallidas']} páginas pendientes: se retoma desde "
+              f"{punto['calldate_pendiente']}")
+    return punto
+
+# ============================================================================
+# 💾 ESCRITURA
+# ============================================================================
+
+def resumir_descarga(paginas):
+    """
+    Resumen de la descarga a partir de info['paginas'] de descargar_paginas.
+
+    La cota de cada página fallida es el calldate mínimo de sus vecinas OK
+    más cercanas (sea cual sea el orden de las páginas, sus registros no son
+    más viejos que eso); si está en un extremo se usa el más viejo visto.
+    """
+    numeros = sorted(paginas)
+    ok = [p for p in numeros if paginas[p]['estado'] == 'OK']
+    fallidas = [p for p in numeros if paginas[p]['estado'] != 'OK']
+
+    ultima_pagina = None
+    for pagina in numeros:
+        if paginas[pagina]['estado'] != 'OK':
+            break
+        ultima_pagina = pagina
+
+    def _minimo(valores):
+        valores = [v for v in valores if v]
+        return min(valores) if valores else None
+
+    def _maximo(valores, clave=None):
+        valores = [v for v in valores if v]
+        return max(valores, key=clave) if valores else None
+
+    mas_viejo = _minimo(paginas[p]['calldate_min'] for p in ok)
+    cotas = []
+    for pagina in fallidas:
+        anterior = max((p for p in ok if p < pagina), default=None)
+        siguiente = min((p for p in ok if p > pagina), default=None)
+        if anterior is None or siguiente is None:
+            cotas.append(mas_viejo)
+        else:
+            cotas.append(_minimo([paginas[anterior]['calldate_min'], paginas[siguiente]['calldate_min']]))
+
+    return {
+        'estado': 'PENDIENTE' if fallidas else 'COMPLETO',
+        'ultima_pagina': ultima_pagina,
+        'paginas_fallidas': len(fallidas),
+        'calldate_max': _maximo(paginas[p]['calldate_max'] for p in ok),
+        'uniqueid_max': _maximo((paginas[p]['uniqueid_max'] for p in ok), clave_uniqueid),
+        'calldate_pendiente': _minimo(cotas),
+    }
+
+def guardar_punto_control(proceso, info):
+    """
+    Guarda el resultado de la descarga (info de descargar_paginas) como punto
+    de control del proceso. Se llama después del commit del MERGE: si el
+    proceso se cae antes, la siguiente ejecución repite desde el punto
+    anterior (el MERGE es idempotente).
+    """
+    if not info or not info.get('paginas') or 1 in info['paginas_fallidas']:
+        print("⚠️ Punto de control sin cambios: la descarga no llegó a leer la API")
+        return None
+
+    resumen = resumir_descarga(info['paginas'])
+    filas_paginas = [
+        (proceso, pagina, e['estado'], e['intentos'], e['registros'],
+         e['calldate_min'], e['calldate_max'], e['uniqueid_max'])
+        for pagina, e in sorted(info['paginas'].items())
+    ]
+
+    connection = conectar()
+    cursor = connection.cursor()
+    try:
+        asegurar_tablas(cursor)
+        # Los máximos vistos no retroceden aunque esta descarga cubra menos páginas
+        cursor.execute(f"""
+            SELECT CALLDATE_MAX, UNIQUEID_MAX FROM {TABLA_PUNTO_CONTROL}
+            WHERE PROCESO = :1
+        """, [proceso])
+        anterior = cursor.fetchone()
+        if anterior:
+            if anterior[0] and (not resumen['calldate_max'] or anterior[0] > resumen['calldate_max']):
+                resumen['calldate_max'] = anterior[0]
+            if anterior[1] and (not resumen['uniqueid_max'] or
+                                clave_uniqueid(anterior[1]) > clave_uniqueid(resumen['uniqueid_max'])):
+                resumen['uniqueid_max'] = anterior[1]
+        cursor.execute(f"DELETE FROM {TABLA_PUNTO_CONTROL} WHERE PROCESO = :1", [proceso])
+        cursor.execute(f"""
+            INSERT INTO {TABLA_PUNTO_CONTROL} (
+                PROCESO, ESTADO, ULTIMA_PAGINA, TOTAL_PAGINAS, TOTAL_API, PAGINAS_FALLIDAS,
+                CALLDATE_MAX, UNIQUEID_MAX, CALLDATE_PENDIENTE
+            ) VALUES (:1, :2, :3, :4, :5, :6, :7, :8, :9)
+        """, [proceso, resumen['estado'], resumen['ultima_pagina'], info['total_paginas'],
+              info['total'], resumen['paginas_fallidas'], resumen['calldate_max'],
+              resumen['uniqueid_max'], resumen['calldate_pendiente']])
+        cursor.execute(f"DELETE FROM {TABLA_PAGINAS} WHERE PROCESO = :1", [proceso])
+        cursor.executemany(f"""
+            INSERT INTO {TABLA_PAGINAS} (
+                PROCESO, PAGINA, ESTADO, INTENTOS, REGISTROS,
+                CALLDATE_MIN, CALLDATE_MAX, UNIQUEID_MAX
+            ) VALUES (:1, :2, :3, :4, :5, :6, :7, :8)
+        """, filas_paginas)
+        connection.commit()
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar el punto de control: {e}")
+        connection.rollback()
+        return None
+    finally:
+        cursor.close()
+        connection.close()
+
+    if resumen['calldate_pendiente']:
+        print(f"📍 Punto de control: {resumen['paginas_fallidas']} páginas fallidas, "
+              f"la próxima ejecución retoma desde {resumen['calldate_pendiente']}")
+    else:
+        print(f"📍 Punto de control: {len(filas_paginas)} páginas OK, "
+              f"calldate máximo {resumen['calldate_max']}")
+    return resumen
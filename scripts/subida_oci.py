@@ -0,0 +1,206 @@
+# ============================================================================
+# ☁️ SUBIDA A OCI OBJECT STORAGE
+# ============================================================================
+# Compartido por cdr_to_parquet.py y parquet_oikost_crudo.py. Los archivos más
+# grandes que una parte se suben en multiparte con UploadManager: las partes
+# van en paralelo y si una falla se reintenta solo esa parte, no el archivo.
+# El SDK de OCI se importa dentro de cada función (tarda en cargar y los
+# scripts solo lo necesitan al llegar a la subida).
+
+import copy
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from metricas import etapa
+
+TAMANO_PARTE_MB = 32
+PARTES_PARALELAS = 4
+
+# --- Retención de versiones (0 y 0 = borrar todas, como siempre) ---
+VERSIONES_CONSERVAR = 0     # versiones más nuevas que se conservan
+VERSIONES_DIAS = 0          # solo se borran las que tienen más de estos días
+BORRADOS_PARALELOS = 8
+
+# ============================================================================
+# 🗑️ VERSIONES ANTIGUAS
+# ============================================================================
+
+def listar_versiones(client, namespace, bucket_name, object_name):
+    """Todas las versiones del objeto (sigue la paginación), de la más nueva a la más vieja"""
+    from oci.pagination import list_call_get_all_results
+
+    respuesta = list_call_get_all_results(
+        client.list_object_versions,
+        namespace,
+        bucket_name,
+        prefix=object_name,
+        fields='name,size,timeCreated'
+    )
+    # prefix también trae otros objetos que empiezan igual: solo el nombre exacto
+    versiones = [v for v in respuesta.data if v.name == object_name]
+    return sorted(versiones, key=lambda v: v.time_created, reverse=True)
+
+def versiones_a_borrar(versiones, conservar=VERSIONES_CONSERVAR, dias=VERSIONES_DIAS):
+    """Aplica la retención: se conservan las `conservar` más nuevas y las de menos de `dias` días"""
+    limite = datetime.now(timezone.utc) - timedelta(days=dias) if dias else None
+    return [
+        v for v in versiones[conservar:]
+        if limite is None or v.time_created is None or v.time_created < limite
+    ]
+
+def limpiar_versiones_antiguas(client, namespace, bucket_name, object_name,
+                               conservar=VERSIONES_CONSERVAR, dias=VERSIONES_DIAS,
+                               paralelos=BORRADOS_PARALELOS):
+    """
+    Elimina las versiones anteriores de un objeto según la retención.
+
+    Con conservar=0 y dias=0 (lo de siempre) se borran TODAS. Los borrados
+    van en paralelo (hasta `paralelos` a la vez). Devuelve
+    {'versiones', 'bytes', 'fallidas'} con lo liberado.
+    """
+    from oci.exceptions import ServiceError
+
+    resultado = {'versiones': 0, 'bytes': 0, 'fallidas': 0}
+    try:
+        versiones = listar_versiones(client, namespace, bucket_name, object_name)
+    except ServiceError as e:
+        print(f"   ⚠️ Error listando versiones: {e.status} {e.message}")
+        return resultado
+
+    por_borrar = versiones_a_borrar(versiones, conservar, dias)
+    if not por_borrar:
+        return resultado
+
+    def _borrar(version):
+        try:
+            client.delete_object(
+                namespace_name=namespace,
+                bucket_name=bucket_name,
+                object_name=version.name,
+                version_id=version.version_id
+            )
+        except ServiceError as e:
+            # 404: otra ejecución ya la borró, no cuenta como liberada
+            if e.status == 404:
+                return version, None
+            print(f"   ⚠️ No se pudo borrar la versión {version.version_id}: {e.status} {e.message}")
+            return version, False
+        return version, True
+
+    with ThreadPoolExecutor(max_workers=max(paralelos, 1)) as pool:
+        for version, borrada in pool.map(_borrar, por_borrar):
+            if borrada:
+                resultado['versiones'] += 1
+                resultado['bytes'] += version.size or 0
+            elif borrada is False:
+                resultado['fallidas'] += 1
+
+    print(f"   🗑️ {resultado['versiones']} versiones eliminadas de {object_name} "
+          f"({resultado['bytes'] / (1024 * 1024):.2f} MB liberados, "
+          f"{len(versiones) - len(por_borrar)} conservadas)")
+    if resultado['fallidas']:
+        print(f"   ⚠️ {resultado['fallidas']} versiones no se pudieron borrar")
+    return resultado
+
+# ============================================================================
+# 🔏 HUELLA DE CONTENIDO (OMITIR SUBIDAS SIN CAMBIOS)
+# ============================================================================
+# La exportación es determinista (mismas filas -> mismo Parquet byte a byte),
+# así que el SHA-256 del archivo se guarda como metadata del objeto y la
+# próxima ejecución compara antes de limpiar versiones y subir.
+
+CLAVE_HUELLA = 'huella-sha256'
+
+def huella_archivo(file_path, bloque=8 * 1024 * 1024):
+    """SHA-256 del archivo, leído por bloques"""
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for trozo in iter(lambda: f.read(bloque), b''):
+            sha.update(trozo)
+    return sha.hexdigest()
+
+def leer_huella(client, namespace, bucket_name, object_name):
+    """Huella guardada en la metadata del objeto (None si no existe o no la tiene)"""
+    from oci.exceptions import ServiceError
+
+    try:
+        respuesta = client.head_object(namespace, bucket_name, object_name)
+    except ServiceError as e:
+        if e.status == 404:
+            return None
+        raise
+    return respuesta.headers.get(f'opc-meta-{CLAVE_HUELLA}')
+
+def sin_cambios(client, namespace, bucket_name, object_name, huella):
+    """True si el objeto en el bucket ya tiene exactamente este contenido"""
+    from oci.exceptions import ServiceError
+
+    try:
+        return leer_huella(client, namespace, bucket_name, object_name) == huella
+    except ServiceError as e:
+        print(f"   ⚠️ No se pudo leer la huella de {object_name}: {e.status} {e.message}")
+        return False
+
+# ============================================================================
+# 📤 SUBIDA MULTIPARTE CON PROGRESO POR BYTES
+# ============================================================================
+
+def subir_archivo(client, namespace, bucket_name, object_name, file_path,
+                  tamano_parte_mb=TAMANO_PARTE_MB, partes_paralelas=PARTES_PARALELAS,
+                  mostrar_progreso=True, huella=None):
+    """Sube file_path con UploadManager (una sola petición si cabe en una parte)"""
+    from oci.object_storage import UploadManager
+    from oci.retry import DEFAULT_RETRY_STRATEGY, NoneRetryStrategy
+    from tqdm import tqdm
+
+    tamano = os.path.getsize(file_path)
+
+    # El reintento del cliente no rebobina bien el lector de cada parte (reenvía
+    # la parte vacía): se apaga en una copia del cliente y el reintento lo hace
+    # UploadManager, que vuelve a leer la parte desde el archivo en cada intento
+    cliente_subida = copy.copy(client)
+    cliente_subida.retry_strategy = NoneRetryStrategy()
+
+    manager = UploadManager(
+        cliente_subida,
+        allow_parallel_uploads=partes_paralelas > 1,
+        parallel_process_count=max(partes_paralelas, 1)
+    )
+    opciones = {'metadata': {CLAVE_HUELLA: huella}} if huella else {}
+    with etapa('subida') as m, tqdm(total=tamano, desc="Subiendo", unit="B", unit_scale=True,
+                                    unit_divisor=1024, ncols=80, disable=not mostrar_progreso) as pbar:
+        m['bytes'] = tamano
+        manager.upload_file(
+            namespace,
+            bucket_name,
+            object_name,
+            file_path,
+            part_size=tamano_parte_mb * 1024 * 1024,
+            progress_callback=pbar.update,
+            retry_strategy=DEFAULT_RETRY_STRATEGY,
+            **opciones
+        )
+
+def upload_to_oci_force_overwrite(client, namespace, bucket_name, object_name, file_path,
+                                  tamano_parte_mb=TAMANO_PARTE_MB, partes_paralelas=PARTES_PARALELAS,
+                                  mostrar_progreso=True, conservar=VERSIONES_CONSERVAR,
+                                  dias=VERSIONES_DIAS, huella=None):
+    """Sube archivo a OCI con sobrescritura REAL (huella queda en la metadata del objeto)"""
+    if not client:
+        return False
+
+    try:
+        if mostrar_progreso:
+            print(f"\n   🧹 Limpiando versiones anteriores...")
+        limpiar_versiones_antiguas(client, namespace, bucket_name, object_name, conservar, dias)
+
+        subir_archivo(client, namespace, bucket_name, object_name, file_path,
+                      tamano_parte_mb, partes_paralelas, mostrar_progreso, huella)
+
+        return True
+
+    except Exception as e:
+        print(f"\n❌ Error al subir: {e}")
+        return False